@@ -0,0 +1,155 @@
+"""
+Read replica routing
+
+Writes and reads go to the `default` database unless a piece of code opts into replica reads: safe requests of the
+views using ReplicaReadMixin and the reminder planner. Those reads are spread over the aliases listed in
+`DATABASE_REPLICAS`.
+
+Reads stick to the primary so that users see their own writes:
+- for the rest of a request or task once it wrote anything;
+- for `REPLICA_PIN_SECONDS` after a write for every scope the write affected (the owners of the changed objects,
+  the "all" scope of superusers and the public feed), longer than the expected replication lag.
+"""
+
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from config import settings
+
+
+class RoutingState:
+    """
+    Routing state of a request or a task.
+
+    Attributes:
+        read_from_replica (bool): Whether reads may go to a replica.
+        wrote (bool): Whether anything was written, which sends all further reads to the primary.
+    """
+
+    __slots__ = ('read_from_replica', 'wrote')
+
+    def __init__(self, read_from_replica=False):
+        self.read_from_replica = read_from_replica
+        self.wrote = False
+
+
+_routing_state = ContextVar('routing_state', default=None)
+
+
+@contextmanager
+def routing_scope(read_from_replica=False):
+    """
+    Runs a block with its own routing state, e.g. a request or a task.
+
+    Yields:
+        RoutingState: The state of the block.
+    """
+    state = RoutingState(read_from_replica)
+    token = _routing_state.set(state)
+    try:
+        yield state
+    finally:
+        _routing_state.reset(token)
+
+
+def read_from_replica():
+    """
+    Runs a block reading from a replica until it writes anything.
+    """
+    return routing_scope(read_from_replica=True)
+
+
+def allow_replica_reads():
+    """
+    Lets the rest of the current request read from a replica, if it has a routing state and wrote nothing yet.
+    """
+    state = _routing_state.get()
+    if state is not None:
+        state.read_from_replica = True
+
+
+def get_pin_key(scope):
+    return f'db:primary_pin:{scope}'
+
+
+def pin_to_primary(scopes):
+    """
+    Sends the reads of the given scopes to the primary for `REPLICA_PIN_SECONDS`.
+
+    Args:
+        scopes (iterable): Scopes changed by a write, e.g. user ids, 'all' or 'public_feed'.
+    """
+    if settings.DATABASE_REPLICAS:
+        cache.set_many({get_pin_key(scope): 1 for scope in scopes}, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(scope):
+    """
+    Checks whether the reads of a scope must go to the primary because of a recent write.
+    """
+    return bool(settings.DATABASE_REPLICAS) and cache.get(get_pin_key(scope)) is not None
+
+
+class ReplicaRouter:
+    """
+    Database router sending opted-in reads to a random replica and everything else to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        """
+        Returns a replica if the current request or task may read from one, the primary otherwise.
+        """
+        state = _routing_state.get()
+        if settings.DATABASE_REPLICAS and state is not None and state.read_from_replica and not state.wrote:
+            return random.choice(settings.DATABASE_REPLICAS)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        """
+        Returns the primary and sends the further reads of the current request or task to it as well.
+        """
+        state = _routing_state.get()
+        if state is not None:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """
+        Allows all relations, the replicas hold the same data as the primary.
+        """
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """
+        Migrates the primary only, the replicas receive the schema through replication.
+        """
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Middleware giving every request its own routing state, the views opt into replica reads.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with routing_scope():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with routing_scope():
+            return await self.get_response(request)
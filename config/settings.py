@@ -66,6 +66,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'config.db_router.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -103,6 +104,17 @@ DATABASES = {
     }
 }
 
+# Read replicas, a comma-separated list of hosts of streaming replicas of the default database
+DATABASE_REPLICAS = []
+for number, host in enumerate(filter(None, os.getenv('POSTGRES_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASE_REPLICAS.append(f'replica_{number}')
+    DATABASES[f'replica_{number}'] = {**DATABASES['default'], 'HOST': host.strip(), 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['config.db_router.ReplicaRouter']
+
+# Number of seconds the reads of data changed by a write are sent to the primary, longer than the replication lag
+REPLICA_PIN_SECONDS = 5
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -155,11 +167,23 @@ SIMPLE_JWT = {
 }
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     )
 }
+
+# Number of seconds the rows of authenticated users are cached for
+AUTH_USER_CACHE_TIMEOUT = 60
 # Telegram token
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+TELEGRAM_URL = os.getenv('TELEGRAM_URL', 'https://api.telegram.org/bot')
+
+# Telegram dispatcher settings (the rate limits are shared by all worker processes through the cache)
+TELEGRAM_CONNECT_TIMEOUT = 3.05
+TELEGRAM_READ_TIMEOUT = 10
+TELEGRAM_DISPATCHER_WORKERS = 16
+TELEGRAM_GLOBAL_RATE_LIMIT = 30
+TELEGRAM_CHAT_RATE_LIMIT = 1
+TELEGRAM_MESSAGE_LIMIT = 4096
 
 # CORS settings
 
@@ -172,6 +196,22 @@ CSRF_TRUSTED_ORIGINS = [
     "https://read-and-write.example.com",
 ]
 
+# Cache settings
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://habit_control_redis_1:6379/1',
+    }
+}
+
+# Public habit feed pages are cached until a public habit changes, or for the timeout (in seconds) at most.
+# A changed or expired page is kept for the stale timeout longer and served while a single request rebuilds it;
+# requests finding no page at all poll the cache every lock wait until the page is built or the lock released.
+PUBLIC_FEED_CACHE_TIMEOUT = 300
+PUBLIC_FEED_CACHE_STALE_TIMEOUT = 60
+PUBLIC_FEED_CACHE_LOCK_TIMEOUT = 5
+PUBLIC_FEED_CACHE_LOCK_WAIT = 0.1
+
 # Celery settings
 CELERY_BROKER_URL = 'redis://habit_control_redis_1:6379/0'
 CELERY_RESULT_BACKEND = 'redis://habit_control_redis_1:6379/0'
@@ -181,5 +221,67 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'habits.tasks.task_send_notification',
         'schedule': timedelta(minutes=1),
     },
+    'purge-notification-deliveries': {
+        'task': 'habits.tasks.task_purge_notification_deliveries',
+        'schedule': timedelta(hours=1),
+    },
+    'drain-notification-outbox': {
+        'task': 'habits.tasks.task_drain_notification_outbox',
+        'schedule': timedelta(minutes=1),
+    },
+    'purge-notification-outbox': {
+        'task': 'habits.tasks.task_purge_notification_outbox',
+        'schedule': timedelta(hours=1),
+    },
+    'purge-tombstones': {
+        'task': 'habits.tasks.task_purge_tombstones',
+        'schedule': timedelta(hours=1),
+    },
 }
 
+# Reminder settings
+NOTIFICATION_CHUNK_SIZE = 500
+NOTIFICATION_BATCH_SIZE = 100
+NOTIFICATION_SUMMARY = True
+NOTIFICATION_DELIVERY_RETENTION = timedelta(days=7)
+NOTIFICATION_OUTBOX_BATCH_SIZE = 500
+NOTIFICATION_OUTBOX_LEASE = timedelta(minutes=5)
+
+# Failed sends are retried with a jittered exponential backoff (in seconds) and dead-lettered afterwards
+NOTIFICATION_MAX_ATTEMPTS = 5
+NOTIFICATION_RETRY_BASE_DELAY = 30
+NOTIFICATION_RETRY_MAX_DELAY = 3600
+
+# Digest mode coalesces reminders of a user due within the window into a single message
+NOTIFICATION_DIGEST = False
+NOTIFICATION_DIGEST_WINDOW = timedelta(minutes=15)
+NOTIFICATION_DIGEST_MAX_ITEMS = 10
+
+# The timing wheel scheduler ('wheel', started with the run_scheduler command) enqueues reminders at the second
+# they are due and replaces the per-minute planning of celery beat ('beat')
+NOTIFICATION_SCHEDULER = 'beat'
+NOTIFICATION_SCHEDULER_REDIS_URL = CELERY_BROKER_URL
+NOTIFICATION_SCHEDULER_CHANNEL = 'habits:schedule'
+# Seconds between the passes of the timing wheel scheduler over the database, scheduling again the habits overdue
+# for longer than that, whose reminders or published changes were lost
+NOTIFICATION_SCHEDULER_SWEEP_INTERVAL = 60
+
+# Maximum number of objects created, updated or deleted by a single bulk request
+BULK_MAX_ITEMS = 500
+
+# Habit and award lists are rendered from .values() rows, skipping the ModelSerializer machinery
+FAST_LIST_SERIALIZATION = False
+
+# Number of rows fetched from the database cursor and sent at once by the export endpoints
+EXPORT_CHUNK_SIZE = 2000
+
+# Habit imports are validated and copied into the database in batches of IMPORT_BATCH_SIZE rows
+IMPORT_BATCH_SIZE = 5000
+IMPORT_MAX_REPORTED_ERRORS = 100
+
+# Incremental sync re-sends the changes of the last SYNC_OVERLAP before a sync token, so writes committed late or
+# stamped by a server with a lagging clock are not missed, and reports deletions for SYNC_TOMBSTONE_RETENTION
+SYNC_OVERLAP = timedelta(seconds=30)
+SYNC_TOMBSTONE_RETENTION = timedelta(days=30)
+# Maximum number of habits, awards and deletions returned by every page of a sync
+SYNC_PAGE_SIZE = 1000
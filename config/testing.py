@@ -0,0 +1,27 @@
+"""
+Test utilities
+
+Shared by the test modules of all apps.
+"""
+
+from unittest import mock
+
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LocalAPITestCase(APITestCase):
+    """
+    Base API test case using an in-memory cache instead of Redis and reading only from the primary database, even if
+    read replicas are configured.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        patcher = mock.patch('config.settings.DATABASE_REPLICAS', [])
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+        super().setUpClass()
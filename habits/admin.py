@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from habits.models import Habit, Award
+from habits.models import Habit, Award, NotificationOutbox
 
 
 @admin.register(Habit)
@@ -13,3 +13,9 @@ class HabitAdmin(admin.ModelAdmin):
 @admin.register(Award)
 class AwardAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'reward',)
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'chat_id', 'status', 'attempts', 'available_at', 'sent_at', 'last_error',)
+    list_filter = ('status',)
@@ -0,0 +1,115 @@
+"""
+Async API Views
+
+Provides read-only endpoints running natively under ASGI. They are plain Django async views, because DRF views are
+synchronous: the requests are authenticated with CachedJWTAuthentication, the rows are fetched with the async ORM
+as `.values()` and converted by a ValuesSerializer, so no thread is held while waiting on the database.
+"""
+
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from habits.api_views.sparse import FIELDS_QUERY_PARAM, parse_sparse_fields
+from habits.filters import OwnerFilterBackend
+from habits.paginators import AsyncHabitPaginator
+from habits.renderers import FastJSONRenderer
+from users.authentication import CachedJWTAuthentication
+
+
+class AsyncReadOnlyAPIView(View):
+    """
+    Base async endpoint returning objects of the requesting user, or of all users for a superuser.
+
+    Errors are answered with the same status codes and bodies as DRF views. The fields of the objects can be
+    narrowed with `?fields=` like on the list endpoints.
+
+    Attributes:
+        queryset (QuerySet): Objects of all users.
+        fast_serializer_class (type): ValuesSerializer building the representation of the objects.
+    """
+
+    http_method_names = ['get', 'options']
+    queryset = None
+    fast_serializer_class = None
+    authentication_class = CachedJWTAuthentication
+    filter_backends = [OwnerFilterBackend]
+    renderer_class = FastJSONRenderer
+
+    async def get(self, request, *args, **kwargs):
+        """
+        Authenticate the request and render the data of the endpoint.
+        """
+        authenticator = self.authentication_class()
+        try:
+            result = await authenticator.aauthenticate(request)
+            if result is None:
+                raise exceptions.NotAuthenticated()
+            request.user = result[0]
+            data = await self.aget_data(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            response = self.render(
+                exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}, exc.status_code
+            )
+            if exc.status_code == 401:
+                response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return response
+        return self.render(data)
+
+    async def aget_data(self, request, *args, **kwargs):
+        """
+        Builds the data of the response.
+        """
+        raise NotImplementedError
+
+    def get_sparse_fields(self, request):
+        """
+        Returns the names of the fields requested with `?fields=`, or None for all fields.
+        """
+        return parse_sparse_fields(request.GET.get(FIELDS_QUERY_PARAM), self.fast_serializer_class)
+
+    def get_queryset(self, request, names=None):
+        """
+        Retrieve the `.values()` rows of the objects visible to the requesting user, with the given fields only.
+        """
+        queryset = self.queryset.all()
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+        return queryset.values(*self.fast_serializer_class.get_lookups(names))
+
+    def render(self, data, status=200):
+        return HttpResponse(self.renderer_class().render(data), status=status, content_type='application/json')
+
+
+class AsyncListAPIView(AsyncReadOnlyAPIView):
+    """
+    Async endpoint returning a page of objects, paginated like HabitPaginator.
+    """
+
+    pagination_class = AsyncHabitPaginator
+
+    async def aget_data(self, request, *args, **kwargs):
+        """
+        Retrieve a page of objects.
+        """
+        names = self.get_sparse_fields(request)
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(self.get_queryset(request, names), Request(request))
+        return paginator.get_paginated_response(self.fast_serializer_class.serialize(page, names)).data
+
+
+class AsyncRetrieveAPIView(AsyncReadOnlyAPIView):
+    """
+    Async endpoint returning a single object by its primary key.
+    """
+
+    async def aget_data(self, request, pk, *args, **kwargs):
+        """
+        Retrieve the object, objects of other users are not found.
+        """
+        names = self.get_sparse_fields(request)
+        row = await self.get_queryset(request, names).filter(pk=pk).afirst()
+        if row is None:
+            raise exceptions.NotFound()
+        return self.fast_serializer_class.serialize([row], names)[0]
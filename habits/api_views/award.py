@@ -8,17 +8,27 @@ from rest_framework import generics
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 
+from habits.api_views.asynchronous import AsyncListAPIView, AsyncRetrieveAPIView
+from habits.api_views.bulk import BulkAPIView
+from habits.api_views.conditional import ConditionalListMixin
+from habits.api_views.export import ExportAPIView
+from habits.api_views.fast import FastListMixin
+from habits.api_views.replica import ReplicaReadMixin
+from habits.api_views.sparse import SparseFieldsMixin
+from habits.filters import OwnerFilterBackend
 from habits.models import Award
 from habits.permissions import IsOwner, IsSuperUser
 from habits.serializers.award import AwardSerializer
+from habits.serializers.fast import FastAwardSerializer
 
 
-class AwardListAPIView(generics.ListAPIView):
+class AwardListAPIView(ReplicaReadMixin, ConditionalListMixin, SparseFieldsMixin, FastListMixin, generics.ListAPIView):
     """
-    API endpoint that allows listing awards.
+    API endpoint that allows listing awards, supporting conditional requests and `?fields=`.
     """
 
     serializer_class = AwardSerializer
+    fast_serializer_class = FastAwardSerializer
     queryset = Award.objects.none()
     permission_classes = [IsAuthenticated | IsOwner | IsSuperUser]
 
@@ -29,13 +39,32 @@ class AwardListAPIView(generics.ListAPIView):
         user = self.request.user
 
         if user.is_authenticated and user.is_superuser:
-            return Award.objects.all()
+            return Award.objects.select_related('user')
         elif user.is_authenticated:
-            return Award.objects.filter(user=user)
+            return Award.objects.filter(user=user).select_related('user')
         else:
             raise PermissionDenied("You do not have permission to access this page")
 
 
+class AwardAsyncListAPIView(AsyncListAPIView):
+    """
+    Async API endpoint that allows retrieving a page of awards of the requesting user, or of all awards for a
+    superuser.
+    """
+
+    queryset = Award.objects.order_by('pk')
+    fast_serializer_class = FastAwardSerializer
+
+
+class AwardAsyncRetrieveAPIView(AsyncRetrieveAPIView):
+    """
+    Async API endpoint that allows retrieving an award of the requesting user, or any award for a superuser.
+    """
+
+    queryset = Award.objects.all()
+    fast_serializer_class = FastAwardSerializer
+
+
 class AwardCreateAPIView(generics.CreateAPIView):
     """
     API endpoint that allows creating new awards.
@@ -58,8 +87,9 @@ class AwardUpdateAPIView(generics.UpdateAPIView):
     """
 
     serializer_class = AwardSerializer
-    queryset = Award.objects.all()
-    permission_classes = [IsOwner | IsSuperUser]
+    queryset = Award.objects.select_related('user')
+    filter_backends = [OwnerFilterBackend]
+    permission_classes = [IsAuthenticated & (IsOwner | IsSuperUser)]
 
 
 class AwardDestroyAPIView(generics.DestroyAPIView):
@@ -68,4 +98,24 @@ class AwardDestroyAPIView(generics.DestroyAPIView):
     """
 
     queryset = Award.objects.all()
-    permission_classes = [IsOwner | IsSuperUser]
+    filter_backends = [OwnerFilterBackend]
+    permission_classes = [IsAuthenticated & (IsOwner | IsSuperUser)]
+
+
+class AwardBulkAPIView(BulkAPIView):
+    """
+    API endpoint that allows creating, updating and deleting lists of awards.
+    """
+
+    serializer_class = AwardSerializer
+    queryset = Award.objects.select_related('user')
+
+
+class AwardExportAPIView(ExportAPIView):
+    """
+    API endpoint that allows exporting awards as NDJSON or CSV.
+    """
+
+    queryset = Award.objects.all()
+    fast_serializer_class = FastAwardSerializer
+    filename = 'awards'
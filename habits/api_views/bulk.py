@@ -0,0 +1,193 @@
+"""
+Bulk API Views
+
+Provides a base API endpoint creating, updating and deleting lists of objects in a single request.
+"""
+
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from config import settings
+from habits.cache import bump_list_versions
+from habits.signals import bulk_deletion, record_tombstones, touch_referencing_habits
+
+
+def is_primary_key(value):
+    """
+    Checks whether a value of a bulk request item can be a primary key.
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class BulkAPIView(generics.GenericAPIView):
+    """
+    Base API endpoint to create, update and delete up to `BULK_MAX_ITEMS` objects of the requesting user at once.
+
+    - POST takes a list of objects to create.
+    - PATCH takes a list of partial objects to update, each one with its `pk`. Owners cannot be changed.
+    - DELETE takes a list of primary keys of the objects to delete.
+
+    All items are validated together, with related objects prefetched by `prefetch` instead of being looked up
+    one by one, and the valid ones are written with a single bulk query in one transaction. The response holds
+    a result with a status code and either the data or the errors for every item, in the order of the request.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Retrieve the objects of the requesting user, or all objects for a superuser.
+        """
+        queryset = super().get_queryset()
+        if self.request.user.is_superuser:
+            return queryset
+        return queryset.filter(user=self.request.user)
+
+    def get_items(self):
+        """
+        Retrieve the list of items of the request, rejecting empty and oversized lists.
+        """
+        items = self.request.data
+        if not isinstance(items, list) or not items:
+            raise ValidationError('Expected a non-empty list of items.')
+        if len(items) > settings.BULK_MAX_ITEMS:
+            raise ValidationError(f'No more than {settings.BULK_MAX_ITEMS} items can be processed at once.')
+        return items
+
+    def prefetch(self, items, instances=()):
+        """
+        Builds the serializer context shared by all items, e.g. objects referenced by the items.
+
+        Args:
+            items (list): Items of the request.
+            instances (iterable): Objects updated by the items.
+
+        Returns:
+            dict: Additional serializer context.
+        """
+        return {}
+
+    def perform_bulk_create(self, objects):
+        """
+        Insert the validated objects with a single query.
+        """
+        self.get_queryset().model.objects.bulk_create(objects)
+        transaction.on_commit(partial(bump_list_versions, {obj.user_id for obj in objects}))
+
+    def perform_bulk_update(self, objects, fields):
+        """
+        Write the given fields of the validated objects and their time of the last change with a single query.
+        """
+        now = timezone.now()
+        for obj in objects:
+            obj.updated_at = now
+        self.get_queryset().model.objects.bulk_update(objects, [*fields, 'updated_at'])
+        transaction.on_commit(partial(bump_list_versions, {obj.user_id for obj in objects}))
+
+    def perform_bulk_destroy(self, queryset, owners):
+        """
+        Delete the objects of the queryset, touching the habits referencing them and recording their tombstones
+        with a query for all objects, and bump the list versions of the owners of both once committed.
+
+        Args:
+            queryset (QuerySet): Objects to delete.
+            owners (dict): Owner ids of the objects by their primary keys.
+        """
+        if not owners:
+            return
+        referencing_user_ids = touch_referencing_habits(queryset.model, owners)
+        with bulk_deletion():
+            queryset.delete()
+        record_tombstones(queryset.model, owners)
+        transaction.on_commit(partial(bump_list_versions, {*owners.values(), *referencing_user_ids}))
+
+    def post(self, request, *args, **kwargs):
+        """
+        Create a list of objects and associate them with the requesting user.
+        """
+        items = self.get_items()
+        context = {**self.get_serializer_context(), **self.prefetch(items)}
+        model = self.get_queryset().model
+
+        results = []
+        objects = []
+        for item in items:
+            serializer = self.get_serializer(data=item, context=context)
+            if serializer.is_valid():
+                objects.append(model(**{**serializer.validated_data, 'user': request.user}))
+                results.append(objects[-1])
+            else:
+                results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors})
+
+        with transaction.atomic():
+            self.perform_bulk_create(objects)
+
+        return Response([
+            result if isinstance(result, dict)
+            else {'status': status.HTTP_201_CREATED, 'data': self.get_serializer(result).data}
+            for result in results
+        ])
+
+    def patch(self, request, *args, **kwargs):
+        """
+        Update a list of objects of the requesting user.
+        """
+        items = self.get_items()
+        instances = self.get_queryset().in_bulk(
+            [item['pk'] for item in items if isinstance(item, dict) and is_primary_key(item.get('pk'))]
+        )
+        context = {**self.get_serializer_context(), **self.prefetch(items, instances.values())}
+
+        results = []
+        objects = {}
+        update_fields = set()
+        for item in items:
+            instance = instances.get(item.get('pk')) if isinstance(item, dict) else None
+            if instance is None:
+                results.append({'status': status.HTTP_404_NOT_FOUND, 'errors': {'pk': ['Not found.']}})
+                continue
+
+            serializer = self.get_serializer(instance, data=item, partial=True, context=context)
+            if serializer.is_valid():
+                serializer.validated_data.pop('user', None)
+                for attr, value in serializer.validated_data.items():
+                    setattr(instance, attr, value)
+                update_fields.update(serializer.validated_data)
+                objects[instance.pk] = instance
+                results.append(instance)
+            else:
+                results.append({'status': status.HTTP_400_BAD_REQUEST, 'errors': serializer.errors})
+
+        if objects and update_fields:
+            with transaction.atomic():
+                self.perform_bulk_update(list(objects.values()), list(update_fields))
+
+        return Response([
+            result if isinstance(result, dict)
+            else {'status': status.HTTP_200_OK, 'data': self.get_serializer(result).data}
+            for result in results
+        ])
+
+    def delete(self, request, *args, **kwargs):
+        """
+        Delete a list of objects of the requesting user.
+        """
+        pks = self.get_items()
+        existing = dict(
+            self.get_queryset().filter(pk__in=[pk for pk in pks if is_primary_key(pk)]).values_list('pk', 'user_id')
+        )
+
+        with transaction.atomic():
+            self.perform_bulk_destroy(self.get_queryset().filter(pk__in=existing), existing)
+
+        return Response([
+            {'status': status.HTTP_204_NO_CONTENT, 'pk': pk} if is_primary_key(pk) and pk in existing
+            else {'status': status.HTTP_404_NOT_FOUND, 'pk': pk}
+            for pk in pks
+        ])
@@ -0,0 +1,42 @@
+"""
+Conditional API Views
+
+Provides conditional GET support for list endpoints based on the list versions of the requesting user.
+"""
+
+import hashlib
+
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from habits.cache import get_list_version
+
+
+class ConditionalListMixin:
+    """
+    Mixin answering list requests with a strong ETag built from the list version of the requesting user.
+
+    The version is bumped on every write of a habit or an award of the user, so a request whose If-None-Match
+    header holds the current ETag gets 304 Not Modified before any query of the list or any serialization.
+    """
+
+    def get_etag(self, request):
+        """
+        Builds the ETag of the response from the list version, the user, the query and the content type.
+        """
+        version = get_list_version(request.user)
+        key = f'{version}:{request.user.pk}:{request.get_full_path()}:{request.accepted_media_type}'
+        return quote_etag(hashlib.sha1(key.encode()).hexdigest())
+
+    def list(self, request, *args, **kwargs):
+        """
+        Retrieve the list, or 304 Not Modified if the client already has the current version of it.
+        """
+        etag = self.get_etag(request)
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
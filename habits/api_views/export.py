@@ -0,0 +1,102 @@
+"""
+Export API Views
+
+Provides a base API endpoint streaming all objects of the requesting user as NDJSON or CSV.
+"""
+
+import csv
+
+import orjson
+from django.http import StreamingHttpResponse
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticated
+
+from config import settings
+
+
+class CSVLineBuffer:
+    """
+    File-like object handing the line written by csv.writer back to the caller instead of storing it.
+    """
+
+    def write(self, value):
+        return value
+
+
+class ExportAPIView(generics.GenericAPIView):
+    """
+    Base API endpoint streaming the objects of the requesting user, or all objects for a superuser.
+
+    The output is selected with `?output=ndjson` (default) or `?output=csv`. Every line holds the representation
+    of `fast_serializer_class`. The rows are read in pages of `EXPORT_CHUNK_SIZE` following the primary key,
+    each page a short query of its own, and every page is sent as soon as it is rendered. The memory of the worker
+    stays constant and the first bytes leave immediately regardless of the size of the export, while no cursor or
+    transaction is held open for a slow client.
+
+    Attributes:
+        fast_serializer_class (type): ValuesSerializer building the representation of the rows.
+        filename (str): Name of the exported file without the extension.
+    """
+
+    permission_classes = [IsAuthenticated]
+    fast_serializer_class = None
+    filename = 'export'
+
+    OUTPUTS = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    def get_queryset(self):
+        """
+        Retrieve the objects of the requesting user, or all objects for a superuser.
+        """
+        queryset = super().get_queryset()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset.order_by('pk')
+
+    def get(self, request, *args, **kwargs):
+        """
+        Stream the objects in the requested output format.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.OUTPUTS:
+            raise ValidationError({'output': [f'Expected one of: {", ".join(self.OUTPUTS)}.']})
+
+        render = self.render_csv if output == 'csv' else self.render_ndjson
+        response = StreamingHttpResponse(render(self.get_queryset()), content_type=self.OUTPUTS[output])
+        response['Content-Disposition'] = f'attachment; filename="{self.filename}.{output}"'
+        return response
+
+    def iter_chunks(self, queryset):
+        """
+        Reads the objects in pages of `EXPORT_CHUNK_SIZE` following the primary key and serializes every page.
+
+        Postgres materializes the whole result of a cursor opened outside a transaction before returning the first
+        row, so every page is a query of its own starting after the last primary key of the previous one.
+        """
+        lookups = dict.fromkeys(['pk', *self.fast_serializer_class.get_lookups()])
+        rows = queryset.values(*lookups)
+        page = rows[:settings.EXPORT_CHUNK_SIZE]
+        while chunk := list(page):
+            yield self.fast_serializer_class.serialize(chunk)
+            page = rows.filter(pk__gt=chunk[-1]['pk'])[:settings.EXPORT_CHUNK_SIZE]
+
+    def render_ndjson(self, queryset):
+        """
+        Renders the objects as JSON objects, one per line.
+        """
+        for chunk in self.iter_chunks(queryset):
+            yield b''.join(orjson.dumps(item) + b'\n' for item in chunk)
+
+    def render_csv(self, queryset):
+        """
+        Renders the objects as CSV with a header line.
+        """
+        writer = csv.writer(CSVLineBuffer())
+        names = [name for name, lookup, converter in self.fast_serializer_class.fields]
+        yield writer.writerow(names).encode()
+        for chunk in self.iter_chunks(queryset):
+            yield ''.join(writer.writerow([item[name] for name in names]) for item in chunk).encode()
@@ -0,0 +1,62 @@
+"""
+Fast list API Views
+
+Provides an opt-in read path rendering list responses from `.values()` rows.
+"""
+
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+
+from config import settings
+from habits.renderers import FastJSONRenderer
+
+
+class FastListMixin:
+    """
+    Mixin serializing list responses with `fast_serializer_class` when `FAST_LIST_SERIALIZATION` is enabled.
+
+    The rows are fetched with `.values()` and converted by a ValuesSerializer instead of the ModelSerializer of
+    the view, and rendered by `fast_renderer_classes`. The response is byte-identical to the one of the regular
+    path, which keeps the renderers of the view.
+
+    Attributes:
+        fast_serializer_class (type): ValuesSerializer equivalent of `serializer_class`.
+        fast_renderer_classes (list): Renderers of the fast read path.
+    """
+
+    fast_serializer_class = None
+    fast_renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get_renderers(self):
+        """
+        Instantiates the renderers of the fast read path if it is enabled, the ones of the view otherwise.
+        """
+        if settings.FAST_LIST_SERIALIZATION:
+            return [renderer() for renderer in self.fast_renderer_classes]
+        return super().get_renderers()
+
+    def list(self, request, *args, **kwargs):
+        """
+        Retrieve the list from `.values()` rows if the fast read path is enabled.
+        """
+        if not settings.FAST_LIST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.get_fast_lookups())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_rows(page))
+        return Response(self.serialize_rows(queryset))
+
+    def get_fast_lookups(self):
+        """
+        Returns the lookups of the `.values()` rows.
+        """
+        return self.fast_serializer_class.get_lookups()
+
+    def serialize_rows(self, rows):
+        """
+        Converts the `.values()` rows with `fast_serializer_class`.
+        """
+        return self.fast_serializer_class.serialize(rows)
@@ -1,31 +1,67 @@
+import io
+from functools import partial
+
+from django.db import transaction
 from rest_framework import generics
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
-
-from ..models import Habit
-from ..paginators import HabitPaginator
+from rest_framework.response import Response
+
+from config import settings
+from .asynchronous import AsyncListAPIView, AsyncRetrieveAPIView
+from .bulk import BulkAPIView, is_primary_key
+from .conditional import ConditionalListMixin
+from .export import ExportAPIView
+from .fast import FastListMixin
+from .replica import ReplicaReadMixin
+from .sparse import SparseFieldsMixin
+from ..cache import get_or_build_public_feed_page, get_public_feed_key, invalidate_public_feed
+from ..filters import OwnerFilterBackend
+from ..importer import IMPORT_FORMATS, HabitImporter, read_rows
+from ..models import Award, Habit
+from ..paginators import HabitCursorPaginator, HabitListPaginator
 from ..permissions import IsOwner, IsSuperUser
+from ..scheduler import publish_schedule_changes
+from ..serializers.fast import FastHabitSerializer
 from ..serializers.habit import HabitSerializer
 
 
-class HabitPublicListAPIView(generics.ListAPIView):
+class HabitPublicListAPIView(ReplicaReadMixin, SparseFieldsMixin, FastListMixin, generics.ListAPIView):
     """
-    API endpoint to retrieve a list of public Habit objects.
+    API endpoint to retrieve a list of public Habit objects, narrowed to the fields of `?fields=` if given.
     """
 
     serializer_class = HabitSerializer
-    queryset = Habit.objects.filter(is_public=True)
-    pagination_class = HabitPaginator
+    fast_serializer_class = FastHabitSerializer
+    queryset = Habit.objects.filter(is_public=True).select_related('user')
+    pagination_class = HabitListPaginator
+    required_lookups = HabitCursorPaginator.ordering
 
+    def get_replica_pin_scope(self, request):
+        return 'public_feed'
 
-class HabitListAPIView(generics.ListAPIView):
+    def list(self, request, *args, **kwargs):
+        """
+        Retrieve a page of public habits from the cache, rendering it on a miss.
+        """
+        page = get_or_build_public_feed_page(
+            get_public_feed_key(request), lambda: super(HabitPublicListAPIView, self).list(request).data
+        )
+        return Response(page)
+
+
+class HabitListAPIView(ReplicaReadMixin, ConditionalListMixin, SparseFieldsMixin, FastListMixin, generics.ListAPIView):
     """
-    API endpoint to retrieve a list of Habit objects based on permissions.
+    API endpoint to retrieve a list of Habit objects based on permissions, supporting conditional requests and
+    `?fields=`.
     """
 
     serializer_class = HabitSerializer
-    queryset = Habit.objects.all()
-    pagination_class = HabitPaginator
+    fast_serializer_class = FastHabitSerializer
+    queryset = Habit.objects.select_related('user').order_by('pk')
+    pagination_class = HabitListPaginator
+    required_lookups = HabitCursorPaginator.ordering
     permission_classes = [IsAuthenticated | IsOwner | IsSuperUser]
 
     def get_queryset(self):
@@ -34,13 +70,31 @@ class HabitListAPIView(generics.ListAPIView):
         """
         user = self.request.user
         if user.is_authenticated and user.is_superuser:
-            return Habit.objects.all()
+            return self.queryset.all()
         elif user.is_authenticated:
-            return Habit.objects.filter(user=user)
+            return self.queryset.filter(user=user)
         else:
             raise PermissionDenied("You are not authenticated.")
 
 
+class HabitAsyncListAPIView(AsyncListAPIView):
+    """
+    Async API endpoint to retrieve a page of habits of the requesting user, or of all habits for a superuser.
+    """
+
+    queryset = Habit.objects.order_by('pk')
+    fast_serializer_class = FastHabitSerializer
+
+
+class HabitAsyncRetrieveAPIView(AsyncRetrieveAPIView):
+    """
+    Async API endpoint to retrieve a habit of the requesting user, or any habit for a superuser.
+    """
+
+    queryset = Habit.objects.all()
+    fast_serializer_class = FastHabitSerializer
+
+
 class HabitCreateAPIView(generics.CreateAPIView):
     """
     API endpoint to create a new Habit object.
@@ -63,8 +117,9 @@ class HabitUpdateAPIView(generics.UpdateAPIView):
     """
 
     serializer_class = HabitSerializer
-    queryset = Habit.objects.all()
-    permission_classes = [IsOwner | IsSuperUser]
+    queryset = Habit.objects.select_related('user')
+    filter_backends = [OwnerFilterBackend]
+    permission_classes = [IsAuthenticated & (IsOwner | IsSuperUser)]
 
 
 class HabitDestroyAPIView(generics.DestroyAPIView):
@@ -73,4 +128,105 @@ class HabitDestroyAPIView(generics.DestroyAPIView):
     """
 
     queryset = Habit.objects.all()
-    permission_classes = [IsOwner | IsSuperUser]
+    filter_backends = [OwnerFilterBackend]
+    permission_classes = [IsAuthenticated & (IsOwner | IsSuperUser)]
+
+
+class HabitBulkAPIView(BulkAPIView):
+    """
+    API endpoint to create, update and delete lists of Habit objects.
+    """
+
+    serializer_class = HabitSerializer
+    queryset = Habit.objects.select_related('user')
+
+    def prefetch(self, items, instances=()):
+        """
+        Fetch the awards and related habits referenced by the items and the habits sharing their awards.
+        """
+        items = [item for item in items if isinstance(item, dict)]
+        award_ids = {item['award'] for item in items if is_primary_key(item.get('award'))}
+        award_ids.update(instance.award_id for instance in instances if instance.award_id)
+        related_habit_ids = {item['related_habit'] for item in items if is_primary_key(item.get('related_habit'))}
+
+        return {
+            'prefetched': {
+                Award: Award.objects.in_bulk(award_ids),
+                Habit: Habit.objects.in_bulk(related_habit_ids),
+            },
+            'unique_together': {
+                ('award', 'is_pleasant'): {
+                    (award_id, is_pleasant): pk for pk, award_id, is_pleasant in
+                    Habit.objects.filter(award_id__in=award_ids).values_list('pk', 'award_id', 'is_pleasant')
+                },
+            },
+        }
+
+    def perform_bulk_create(self, objects):
+        """
+        Create the habits with their next reminder times and publish them like saved habits.
+        """
+        for habit in objects:
+            habit.next_fire_at = habit.get_next_fire_at()
+        super().perform_bulk_create(objects)
+        self.publish_changes(objects, any(habit.is_public for habit in objects))
+
+    def perform_bulk_update(self, objects, fields):
+        """
+        Update the habits and publish them like saved habits. Their next reminder times are recalculated only if the
+        schedule changes, so an update of other fields does not skip a reminder that is due but not yet sent.
+        """
+        was_public = Habit.objects.filter(pk__in=[habit.pk for habit in objects], is_public=True).exists()
+        rescheduled = not {'execution_time', 'frequency'}.isdisjoint(fields)
+        if rescheduled:
+            for habit in objects:
+                habit.next_fire_at = habit.get_next_fire_at()
+            fields = [*fields, 'next_fire_at']
+        super().perform_bulk_update(objects, fields)
+        self.publish_changes(objects, was_public or any(habit.is_public for habit in objects), rescheduled)
+
+    def publish_changes(self, habits, touches_public_feed, rescheduled=True):
+        """
+        Invalidate the public feed and pass the new reminder times to the timing wheel scheduler after commit,
+        since bulk writes do not send the model signals.
+        """
+        if touches_public_feed:
+            transaction.on_commit(invalidate_public_feed)
+        if rescheduled and settings.NOTIFICATION_SCHEDULER == 'wheel':
+            transaction.on_commit(partial(publish_schedule_changes, habits))
+
+
+class HabitExportAPIView(ExportAPIView):
+    """
+    API endpoint to export Habit objects as NDJSON or CSV.
+    """
+
+    queryset = Habit.objects.all()
+    fast_serializer_class = FastHabitSerializer
+    filename = 'habits'
+
+
+class HabitImportAPIView(generics.GenericAPIView):
+    """
+    API endpoint for superusers to import Habit objects from an uploaded NDJSON or CSV file.
+
+    The file is sent in the `file` field of a multipart request, its format is guessed from its extension or given
+    with `?input=ndjson` or `?input=csv`. The response holds the import report.
+    """
+
+    parser_classes = [MultiPartParser]
+    permission_classes = [IsSuperUser]
+
+    def post(self, request, *args, **kwargs):
+        """
+        Import the habits of the uploaded file.
+        """
+        file = request.FILES.get('file')
+        if file is None:
+            raise ValidationError({'file': ['No file was submitted.']})
+        input_format = request.query_params.get('input') or file.name.rsplit('.', 1)[-1].lower()
+        if input_format not in IMPORT_FORMATS:
+            raise ValidationError({'input': [f'Expected one of: {", ".join(IMPORT_FORMATS)}.']})
+
+        rows = read_rows(io.TextIOWrapper(file, encoding='utf-8', newline=''), input_format)
+        return Response(HabitImporter().run(rows).as_dict())
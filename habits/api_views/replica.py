@@ -0,0 +1,32 @@
+"""
+Replica API Views
+
+Lets safe requests of list endpoints read from a read replica.
+"""
+
+from rest_framework.permissions import SAFE_METHODS
+
+from config.db_router import allow_replica_reads, is_pinned_to_primary
+
+
+class ReplicaReadMixin:
+    """
+    Mixin reading safe requests from a replica, unless the data they return changed in the last
+    `REPLICA_PIN_SECONDS`, so users always see their own writes.
+
+    Writes pin the scopes of their list versions: the owners of the changed objects and 'all' for superusers.
+    """
+
+    def get_replica_pin_scope(self, request):
+        """
+        Returns the scope whose recent writes send the request to the primary.
+        """
+        return 'all' if request.user.is_superuser else request.user.pk
+
+    def initial(self, request, *args, **kwargs):
+        """
+        Allow the request to read from a replica once it is authenticated.
+        """
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(self.get_replica_pin_scope(request)):
+            allow_replica_reads()
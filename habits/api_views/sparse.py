@@ -0,0 +1,101 @@
+"""
+Sparse fieldset API Views
+
+Provides the `fields` query parameter narrowing list responses to the requested fields, e.g. `?fields=pk,place`.
+"""
+
+from rest_framework.exceptions import ValidationError
+
+FIELDS_QUERY_PARAM = 'fields'
+
+
+def parse_sparse_fields(value, fast_serializer_class):
+    """
+    Parses the value of the `fields` query parameter.
+
+    Args:
+        value (str): Comma-separated field names, or None if the parameter is missing.
+        fast_serializer_class (type): ValuesSerializer of the endpoint, which lists the available fields.
+
+    Returns:
+        tuple: The requested names in the order of the fields of the serializer, or None for all fields.
+
+    Raises:
+        ValidationError: If a requested field does not exist.
+    """
+    names = {name.strip() for name in (value or '').split(',')} - {''}
+    if not names:
+        return None
+
+    available = [name for name, lookup, converter in fast_serializer_class.fields]
+    unknown = names.difference(available)
+    if unknown:
+        raise ValidationError({FIELDS_QUERY_PARAM: [
+            f'Unknown fields: {", ".join(sorted(unknown))}. Expected any of: {", ".join(available)}.'
+        ]})
+    return tuple(name for name in available if name in names)
+
+
+def narrow_queryset(queryset, lookups):
+    """
+    Loads only the columns of the given `.values()` lookups with `.only()`.
+
+    The join of a related model is kept only if one of its fields is requested, e.g. `user__email`.
+    """
+    relations = {lookup.split('__', 1)[0] for lookup in lookups if '__' in lookup}
+    if not relations:
+        queryset = queryset.select_related(None)
+    return queryset.only(*lookups, *relations)
+
+
+class SparseFieldsMixin:
+    """
+    Mixin narrowing list responses to the fields given in the `fields` query parameter.
+
+    The requested fields are passed to the serializer in the `fields` context and to the ValuesSerializer of the
+    fast read path, and the queryset loads only their columns, without the join of the user unless `user` or
+    `telegram_id` is requested. Requests without the parameter get all fields.
+
+    Attributes:
+        required_lookups (tuple): Lookups loaded even if their fields are not requested, e.g. the ordering of
+            keyset pagination.
+    """
+
+    required_lookups = ()
+
+    def get_sparse_fields(self):
+        """
+        Returns the names of the requested fields, or None for all fields.
+        """
+        return parse_sparse_fields(self.request.query_params.get(FIELDS_QUERY_PARAM), self.fast_serializer_class)
+
+    def get_sparse_lookups(self, names):
+        """
+        Returns the `.values()` lookups of the requested fields and the required lookups.
+        """
+        lookups = self.fast_serializer_class.get_lookups(names)
+        return [*lookups, *(lookup for lookup in self.required_lookups if lookup not in lookups)]
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_sparse_fields()
+        return context
+
+    def filter_queryset(self, queryset):
+        """
+        Filter the queryset and load only the columns of the requested fields.
+        """
+        queryset = super().filter_queryset(queryset)
+        names = self.get_sparse_fields()
+        if names is None:
+            return queryset
+        return narrow_queryset(queryset, self.get_sparse_lookups(names))
+
+    def get_fast_lookups(self):
+        names = self.get_sparse_fields()
+        if names is None:
+            return super().get_fast_lookups()
+        return self.get_sparse_lookups(names)
+
+    def serialize_rows(self, rows):
+        return self.fast_serializer_class.serialize(rows, self.get_sparse_fields())
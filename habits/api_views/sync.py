@@ -0,0 +1,206 @@
+"""
+Sync API Views
+
+Provides an incremental sync endpoint returning the habits and awards of the requesting user changed since the
+previous sync and the ones deleted since then.
+"""
+
+import base64
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from config import settings
+from habits.models import Award, Habit, Tombstone
+from habits.renderers import FastJSONRenderer
+from habits.serializers.fast import FastAwardSerializer, FastHabitSerializer
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+
+def encode_sync_token(moment):
+    """
+    Builds the opaque sync token of a moment, the number of microseconds since the epoch.
+    """
+    return str((moment - EPOCH) // MICROSECOND)
+
+
+def decode_sync_token(token):
+    """
+    Parses a sync token into the moment it was issued at.
+
+    Raises:
+        ValidationError: If the token is malformed.
+    """
+    try:
+        return EPOCH + int(token) * MICROSECOND
+    except (TypeError, ValueError, OverflowError):
+        raise ValidationError({'since': ['Invalid sync token.']})
+
+
+def encode_sync_cursor(until, positions):
+    """
+    Builds the opaque cursor of the next page of a sync.
+
+    Args:
+        until (datetime): Moment the sync was started at, later changes are left to the next sync.
+        positions (dict): Position of the last object of every list with more pages, by the name of the list.
+    """
+    data = json.dumps({'until': encode_sync_token(until), 'positions': positions}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode()
+
+
+def decode_sync_cursor(cursor):
+    """
+    Parses a sync cursor into the moment the sync was started at and the positions of the lists with more pages.
+
+    Raises:
+        ValidationError: If the cursor is malformed.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        until = EPOCH + int(data['until']) * MICROSECOND
+        positions = {name: [int(value) for value in position] for name, position in data['positions'].items()}
+    except (TypeError, ValueError, KeyError, AttributeError, OverflowError):
+        raise ValidationError({'cursor': ['Invalid sync cursor.']})
+    return until, positions
+
+
+class SyncTokenExpired(APIException):
+    """
+    Raised for sync tokens older than the retention of the tombstones, the client has to download everything again.
+    """
+
+    status_code = status.HTTP_410_GONE
+    default_detail = 'The sync token has expired, sync again without it.'
+    default_code = 'sync_token_expired'
+
+
+class SyncAPIView(generics.GenericAPIView):
+    """
+    API endpoint returning the changes of the habits and awards of the requesting user since a sync token.
+
+    The first request, without `since`, returns all habits and awards of the user. Every response holds a `token`
+    to pass as `?since=` on the next request, which then returns only the habits and awards created or changed
+    after it, read through the (`user`, `updated_at`) indexes, and the primary keys of the deleted ones in
+    `deleted`. The cost of a sync depends on the number of changes, not on the size of the account.
+
+    Every list of a response holds at most `SYNC_PAGE_SIZE` objects. While `next` is not null, the sync continues
+    at that URL, whose cursor holds the position of every unfinished list and the moment the sync was started at.
+    Changes made after that moment are left to the next sync, so all pages of a sync return the same `token`, and
+    the sync is complete once `next` is null.
+
+    Changes of the last `SYNC_OVERLAP` before the token are returned again, so writes committed after the previous
+    sync but stamped earlier are not missed: clients apply the changes as upserts and deletions of missing objects
+    are no-ops. Tokens older than `SYNC_TOMBSTONE_RETENTION` are rejected with 410 Gone.
+    """
+
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def get(self, request, *args, **kwargs):
+        """
+        Retrieve a page of the changes since the `since` token, or of everything without it.
+        """
+        now = timezone.now()
+        since = request.query_params.get('since')
+        if since is not None:
+            since = decode_sync_token(since)
+            if since < now - settings.SYNC_TOMBSTONE_RETENTION:
+                raise SyncTokenExpired()
+            since -= settings.SYNC_OVERLAP
+
+        cursor = request.query_params.get('cursor')
+        if cursor is None:
+            until, positions = now, {'habits': [], 'awards': [], **({} if since is None else {'deleted': []})}
+        else:
+            until, positions = decode_sync_cursor(cursor)
+            if since is None:
+                positions.pop('deleted', None)
+
+        habits, awards, deleted = [], [], {'habits': [], 'awards': []}
+        if 'habits' in positions:
+            habits = self.get_changes(Habit, FastHabitSerializer, since, until, positions, 'habits')
+        if 'awards' in positions:
+            awards = self.get_changes(Award, FastAwardSerializer, since, until, positions, 'awards')
+        if 'deleted' in positions:
+            deleted = self.get_deletions(since, until, positions)
+
+        return Response({
+            'token': encode_sync_token(until),
+            'habits': habits,
+            'awards': awards,
+            'deleted': deleted,
+            'next': replace_query_param(
+                request.build_absolute_uri(), 'cursor', encode_sync_cursor(until, positions)
+            ) if positions else None,
+        })
+
+    def get_page(self, queryset, ordering, positions, name):
+        """
+        Reads the next page of a list, at most `SYNC_PAGE_SIZE` rows following the position of the list.
+
+        The position of the list is replaced by the one of the last row, or removed after the last page.
+
+        Args:
+            queryset (QuerySet): `.values()` rows of the list, holding the fields of the ordering.
+            ordering (tuple): A datetime field and `pk`, or `pk` alone.
+            positions (dict): Positions of the unfinished lists, values of the ordering as integers, the datetime
+                in microseconds since the epoch; an empty position for the first page.
+            name (str): Name of the list.
+
+        Returns:
+            list: Rows of the page.
+        """
+        position = positions[name]
+        if len(position) == 2:
+            moment, pk = EPOCH + position[0] * MICROSECOND, position[1]
+            queryset = queryset.filter(Q(**{f'{ordering[0]}__gt': moment}) | Q(**{ordering[0]: moment, 'pk__gt': pk}))
+        elif position:
+            queryset = queryset.filter(pk__gt=position[0])
+
+        rows = list(queryset.order_by(*ordering)[:settings.SYNC_PAGE_SIZE + 1])
+        if len(rows) <= settings.SYNC_PAGE_SIZE:
+            del positions[name]
+            return rows
+
+        rows = rows[:settings.SYNC_PAGE_SIZE]
+        positions[name] = [
+            (rows[-1][field] - EPOCH) // MICROSECOND if field != 'pk' else rows[-1][field] for field in ordering
+        ]
+        return rows
+
+    def get_changes(self, model, fast_serializer_class, since, until, positions, name):
+        """
+        Retrieve the representation of a page of the objects of the user changed between the given moments, of all
+        objects changed before the end without a start.
+        """
+        queryset = model.objects.filter(user=self.request.user, updated_at__lte=until)
+        if since is not None:
+            queryset, ordering = queryset.filter(updated_at__gt=since), ('updated_at', 'pk')
+        else:
+            ordering = ('pk',)
+        rows = queryset.values(*dict.fromkeys([*ordering, *fast_serializer_class.get_lookups()]))
+        return fast_serializer_class.serialize(self.get_page(rows, ordering, positions, name))
+
+    def get_deletions(self, since, until, positions):
+        """
+        Retrieve the primary keys of a page of the habits and awards of the user deleted between the given moments.
+        """
+        deleted = {'habits': [], 'awards': []}
+        kinds = {Tombstone.HABIT: deleted['habits'], Tombstone.AWARD: deleted['awards']}
+        tombstones = Tombstone.objects.filter(
+            user=self.request.user, deleted_at__gt=since, deleted_at__lte=until
+        ).values('pk', 'deleted_at', 'kind', 'object_id')
+        for tombstone in self.get_page(tombstones, ('deleted_at', 'pk'), positions, 'deleted'):
+            kinds[tombstone['kind']].append(tombstone['object_id'])
+        return deleted
@@ -0,0 +1,124 @@
+"""
+Habit caches
+
+Keeps rendered pages of the public habit feed in the cache. Every page is stored with the generation number it
+was built in, which is bumped whenever the feed changes, so every cached page becomes stale at once without
+enumerating keys.
+
+Keeps version counters of the habit and award lists of every user as well, which are used as ETags.
+"""
+
+import hashlib
+import time
+
+from django.core.cache import cache
+
+from config import settings
+from config.db_router import pin_to_primary
+
+PUBLIC_FEED_GENERATION_KEY = 'habits:public_feed:generation'
+PUBLIC_FEED_QUERY_PARAMS = ('pagination', 'page', 'cursor', 'page_size', 'fields')
+
+
+def get_public_feed_generation():
+    """
+    Returns the current generation of the public feed cache.
+    """
+    cache.add(PUBLIC_FEED_GENERATION_KEY, 1, timeout=None)
+    return cache.get(PUBLIC_FEED_GENERATION_KEY, 1)
+
+
+def invalidate_public_feed():
+    """
+    Marks all cached pages of the public feed as stale by starting a new generation.
+
+    The feed is read from the primary until the replicas caught up, so no stale page is cached again.
+    """
+    pin_to_primary(['public_feed'])
+    try:
+        cache.incr(PUBLIC_FEED_GENERATION_KEY)
+    except ValueError:
+        cache.add(PUBLIC_FEED_GENERATION_KEY, 1, timeout=None)
+
+
+def get_public_feed_key(request):
+    """
+    Builds the cache key of a public feed page from the pagination and field parameters of the request.
+
+    The host is a part of the key, because the pages contain absolute links to the next and previous pages.
+    """
+    params = '&'.join(f'{name}={request.query_params.get(name, "")}' for name in PUBLIC_FEED_QUERY_PARAMS)
+    digest = hashlib.md5(f'{request.get_host()}?{params}'.encode()).hexdigest()
+    return f'habits:public_feed:{digest}'
+
+
+def get_or_build_public_feed_page(key, build):
+    """
+    Returns a cached public feed page, building and caching it if it is missing, expired or of an older generation.
+
+    Every page is stored with the time it expires at and kept in the cache for `PUBLIC_FEED_CACHE_STALE_TIMEOUT`
+    seconds longer. Only the request holding the lock of the current generation rebuilds an expired or stale page,
+    concurrent requests get the stale page meanwhile. If there is no page at all, they poll the cache every
+    `PUBLIC_FEED_CACHE_LOCK_WAIT` seconds until the page is built, or the lock is released without it and one of
+    them takes it over.
+
+    Args:
+        key (str): Cache key of the page.
+        build (callable): Builds the data of the page.
+
+    Returns:
+        The data of the page.
+    """
+    generation = get_public_feed_generation()
+    lock_key = f'{key}:{generation}:lock'
+    while True:
+        cached = cache.get(key)
+        if cached is not None and cached[0] == generation and cached[1] > time.time():
+            return cached[2]
+        if cache.add(lock_key, 1, timeout=settings.PUBLIC_FEED_CACHE_LOCK_TIMEOUT):
+            break
+        if cached is not None:
+            return cached[2]
+        time.sleep(settings.PUBLIC_FEED_CACHE_LOCK_WAIT)
+
+    try:
+        data = build()
+        cache.set(
+            key, (generation, time.time() + settings.PUBLIC_FEED_CACHE_TIMEOUT, data),
+            timeout=settings.PUBLIC_FEED_CACHE_TIMEOUT + settings.PUBLIC_FEED_CACHE_STALE_TIMEOUT,
+        )
+    finally:
+        cache.delete(lock_key)
+    return data
+
+
+def get_list_version_key(user_id=None):
+    """
+    Builds the cache key of the version counter of the habits and awards of a user, or of all users.
+    """
+    return f'habits:list_version:{user_id or "all"}'
+
+
+def get_list_version(user):
+    """
+    Returns the version of the habit and award lists visible to a user, all lists for a superuser.
+
+    A missing counter, e.g. after an eviction, starts from the current time in nanoseconds, so a version is
+    never handed out twice for different data.
+    """
+    return cache.get_or_set(get_list_version_key(None if user.is_superuser else user.pk), time.time_ns, timeout=None)
+
+
+def bump_list_versions(user_ids):
+    """
+    Increments the list versions of the given users and of all users.
+
+    The lists of these users are read from the primary until the replicas caught up.
+    """
+    user_ids = set(user_ids)
+    pin_to_primary([*user_ids, 'all'])
+    for key in [get_list_version_key(user_id) for user_id in user_ids] + [get_list_version_key()]:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
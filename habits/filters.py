@@ -0,0 +1,26 @@
+from rest_framework.filters import BaseFilterBackend
+
+
+class OwnerFilterBackend(BaseFilterBackend):
+    """
+    Filter backend limiting a queryset to the objects of the requesting user, superusers get all objects.
+
+    Detail views using it look objects up with `WHERE pk = %s AND user_id = %s`, so the objects of other users
+    are not found instead of being fetched and rejected by a permission check.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        """
+        Filter the queryset by the owner of the objects.
+
+        Args:
+            request: Request object.
+            queryset: Queryset to filter.
+            view: View filtering the queryset.
+
+        Returns:
+            QuerySet: Objects of the requesting user, or all objects for a superuser.
+        """
+        if request.user.is_superuser:
+            return queryset
+        return queryset.filter(user=request.user)
@@ -0,0 +1,291 @@
+"""
+Habit importer
+
+Loads habits from NDJSON or CSV files in batches. Every batch is validated with the rules of HabitSerializer,
+its users, awards and related habits are resolved with a single query each, and the valid rows are written
+with PostgreSQL `COPY FROM STDIN`.
+"""
+
+import csv
+import io
+import time
+from dataclasses import dataclass, field
+
+import orjson
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from config import settings
+from habits import validators
+from habits.cache import bump_list_versions, invalidate_public_feed
+from habits.models import Award, Habit
+from habits.reminders import iter_batches
+from users.models import User
+
+IMPORT_FORMATS = ('ndjson', 'csv')
+
+HABIT_FIELDS = (
+    'place', 'execution_time', 'action', 'is_pleasant', 'frequency', 'time_to_complete', 'is_public',
+)
+HABIT_COLUMNS = ('user', 'award', 'related_habit', *HABIT_FIELDS, 'next_fire_at', 'created_at', 'updated_at')
+
+
+def read_rows(file, input_format):
+    """
+    Reads the rows of an NDJSON or CSV file.
+
+    CSV files must start with a header line holding the field names, e.g. the one of the CSV export.
+
+    Args:
+        file (file): Text file to read.
+        input_format (str): Either 'ndjson' or 'csv'.
+
+    Yields:
+        tuple: Pairs of (line number, dict of the row or None if the line is not a JSON object).
+    """
+    if input_format == 'csv':
+        reader = csv.DictReader(file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            row = orjson.loads(line)
+        except orjson.JSONDecodeError:
+            row = None
+        yield line_number, row if isinstance(row, dict) else None
+
+
+@dataclass
+class ImportReport:
+    """
+    Summary of an import.
+
+    Attributes:
+        read (int): Number of rows read.
+        imported (int): Number of habits created.
+        rejected (int): Number of invalid rows.
+        errors (list): Line numbers and errors of the first `IMPORT_MAX_REPORTED_ERRORS` invalid rows.
+        elapsed (float): Duration of the import in seconds.
+    """
+
+    read: int = 0
+    imported: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        """
+        Number of rows processed per second.
+        """
+        return self.read / self.elapsed if self.elapsed else 0.0
+
+    def reject(self, line_number, errors):
+        self.rejected += 1
+        if len(self.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line_number, 'errors': errors})
+
+    def as_dict(self):
+        return {
+            'read': self.read,
+            'imported': self.imported,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+class HabitBatch:
+    """
+    Objects referenced by a batch of rows, fetched with a single query per model.
+
+    Attributes:
+        users (dict): Users of the rows by email.
+        awards (dict): Awards of the rows by primary key.
+        related_habits (dict): Related habits of the rows by primary key.
+        taken_awards (set): (award id, is_pleasant) pairs already used by habits.
+    """
+
+    def __init__(self, rows):
+        rows = [row for line_number, row in rows if row is not None]
+        users = User.objects.filter(email__in={row.get('user') for row in rows}).only('pk', 'email', 'timezone')
+        self.users = {user.email: user for user in users}
+        self.awards = Award.objects.in_bulk(self.get_ids(rows, 'award'))
+        self.related_habits = Habit.objects.only('pk', 'is_pleasant').in_bulk(self.get_ids(rows, 'related_habit'))
+        self.taken_awards = set(
+            Habit.objects.filter(award_id__in=self.awards).values_list('award_id', 'is_pleasant')
+        )
+
+    @staticmethod
+    def get_ids(rows, name):
+        ids = set()
+        for row in rows:
+            try:
+                ids.add(int(row.get(name)))
+            except (TypeError, ValueError):
+                pass
+        return ids
+
+
+class HabitImporter:
+    """
+    Imports habits in batches of `IMPORT_BATCH_SIZE` rows, every batch in its own transaction.
+
+    The rules of HabitSerializer are applied to every row: the field constraints of the Habit model, the
+    functions of `habits.validators` and the uniqueness of (award, is_pleasant). Rows reference their user by
+    email, like the export, and their award and related habit by primary key.
+
+    Bulk loading sends no model signals, so the list versions and the public feed cache are invalidated per batch.
+    The timing wheel scheduler picks the imported habits up on its next start.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+
+    def run(self, rows):
+        """
+        Imports the rows.
+
+        Args:
+            rows (iterable): Pairs of (line number, dict of the row), as yielded by `read_rows`.
+
+        Returns:
+            ImportReport: Summary of the import.
+        """
+        report = ImportReport()
+        started_at = time.monotonic()
+        for batch in iter_batches(rows, self.batch_size):
+            report.read += len(batch)
+            habits = self.clean_batch(batch, report)
+            if habits:
+                with transaction.atomic():
+                    self.copy(habits)
+                report.imported += len(habits)
+                bump_list_versions({habit.user_id for habit in habits})
+                if any(habit.is_public for habit in habits):
+                    invalidate_public_feed()
+        report.elapsed = time.monotonic() - started_at
+        return report
+
+    def clean_batch(self, batch, report):
+        """
+        Validates a batch of rows, reporting the invalid ones.
+
+        Returns:
+            list: Unsaved Habit objects of the valid rows.
+        """
+        lookups = HabitBatch(batch)
+        habits = []
+        for line_number, row in batch:
+            if row is None:
+                report.reject(line_number, {'non_field_errors': ['Expected a JSON object.']})
+                continue
+            try:
+                habit = self.clean_row(row, lookups)
+            except ValidationError as error:
+                detail = error.detail
+                report.reject(line_number, detail if isinstance(detail, dict) else {'non_field_errors': detail})
+                continue
+            habits.append(habit)
+        return habits
+
+    def clean_row(self, row, lookups):
+        """
+        Validates a row and builds its habit.
+
+        Raises:
+            ValidationError: If the row is invalid, with the errors of every field.
+        """
+        values = {}
+        errors = {}
+        for name in HABIT_FIELDS:
+            model_field = Habit._meta.get_field(name)
+            raw = row.get(name)
+            if raw in (None, '') and model_field.has_default():
+                raw = model_field.get_default()
+            try:
+                values[name] = model_field.clean(raw, None)
+            except DjangoValidationError as error:
+                errors[name] = error.messages
+
+        for name, validator in (
+                ('time_to_complete', validators.time_to_complete_validator),
+                ('frequency', validators.frequency_validator),
+        ):
+            if name in values:
+                try:
+                    validator(values[name])
+                except ValidationError as error:
+                    errors[name] = error.detail
+
+        user = lookups.users.get(row.get('user'))
+        if user is None:
+            errors['user'] = ['User with this email does not exist.']
+        for name, objects in (('award', lookups.awards), ('related_habit', lookups.related_habits)):
+            values[name] = None
+            if row.get(name) not in (None, ''):
+                try:
+                    values[name] = objects[int(row[name])]
+                except (KeyError, TypeError, ValueError):
+                    errors[name] = [f'Invalid pk "{row[name]}" - object does not exist.']
+        if errors:
+            raise ValidationError(errors)
+
+        try:
+            validators.related_habit_validator(values['related_habit'])
+        except ValidationError as error:
+            raise ValidationError({'related_habit': error.detail})
+        validators.exclude_award_and_related_habit_validator(values)
+        validators.not_award_or_related_habit_validator(values)
+
+        if values['award'] is not None:
+            award_key = (values['award'].pk, values['is_pleasant'])
+            if award_key in lookups.taken_awards:
+                raise ValidationError({'non_field_errors': ['The fields award, is_pleasant must make a unique set.']})
+            lookups.taken_awards.add(award_key)
+
+        if timezone.is_naive(values['execution_time']):
+            values['execution_time'] = timezone.make_aware(values['execution_time'])
+        habit = Habit(user=user, **values)
+        habit.next_fire_at = habit.get_next_fire_at()
+        return habit
+
+    def copy(self, habits):
+        """
+        Writes the habits with a single `COPY FROM STDIN` query, stamped with the current time as created and changed.
+        """
+        now = timezone.now()
+        for habit in habits:
+            habit.created_at = habit.updated_at = now
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        fields = [Habit._meta.get_field(name) for name in HABIT_COLUMNS]
+        for habit in habits:
+            writer.writerow([self.to_copy_value(getattr(habit, model_field.attname)) for model_field in fields])
+        buffer.seek(0)
+
+        columns = ', '.join(connection.ops.quote_name(model_field.column) for model_field in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(Habit._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)',
+                buffer,
+            )
+
+    @staticmethod
+    def to_copy_value(value):
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return value
@@ -0,0 +1,60 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management import BaseCommand
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Management command measuring the throughput of a running server under concurrent authenticated requests.
+
+    Used to compare the regular list endpoints served by a WSGI server with the async ones served by an ASGI server,
+    e.g. `/habit/list/` under `uvicorn --interface wsgi config.wsgi:application` against `/habit/async/list/` under
+    `uvicorn config.asgi:application`, both with the same number of workers.
+    """
+
+    help = 'Sends concurrent authenticated GET requests to the given URLs and reports throughput and latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='Absolute URLs to request, e.g. http://localhost:8000/habit/list/')
+        parser.add_argument('--email', required=True, help='Email of the user to issue the access token for')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of requests in flight')
+        parser.add_argument('--requests', type=int, default=2000, help='Number of measured requests per URL')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution.
+        """
+
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(User.objects.get(email=options["email"]))}'}
+        sessions = threading.local()
+
+        def fetch(url):
+            if not hasattr(sessions, 'session'):
+                sessions.session = requests.Session()
+                sessions.session.headers.update(headers)
+            started_at = time.perf_counter()
+            response = sessions.session.get(url)
+            return response.status_code, time.perf_counter() - started_at
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            for url in options['urls']:
+                list(executor.map(fetch, [url] * options['concurrency']))
+
+                started_at = time.perf_counter()
+                results = list(executor.map(fetch, [url] * options['requests']))
+                elapsed = time.perf_counter() - started_at
+
+                latencies = sorted(latency for status_code, latency in results)
+                errors = sum(status_code != 200 for status_code, latency in results)
+                self.stdout.write(
+                    f'{url}: {len(results) / elapsed:.0f} requests/s, '
+                    f'p50 {statistics.median(latencies) * 1000:.1f} ms, '
+                    f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f} ms, {errors} errors'
+                )
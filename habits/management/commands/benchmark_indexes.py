@@ -0,0 +1,178 @@
+import json
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from config import settings
+from habits.models import Habit, get_minute_bucket
+from habits.paginators import HabitPaginator
+from habits.reminders import REMINDER_FIELDS
+from users.models import User
+
+ACCESS_PATH_INDEXES = (
+    'habit_reminder_scan_idx', 'habit_public_feed_idx', 'habit_user_pk_idx', 'habit_user_exec_time_pk_idx',
+)
+
+
+class Command(BaseCommand):
+    """
+    Management command comparing the plans and latency of the main habit queries without and with the access path
+    indexes.
+
+    Seeds users and habits, drops the indexes, measures the queries, creates the indexes again and measures the
+    queries once more. The seeded rows are deleted and missing indexes are restored at the end, even on failure.
+    The indexes are dropped and created without CONCURRENTLY, so run the command on a scratch database.
+    """
+
+    help = 'Seeds habits and shows EXPLAIN plans and latency of the reminder, public feed and owner list queries ' \
+           'before and after creating the access path indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=2_000_000, help='Number of seeded habits')
+        parser.add_argument('--users', type=int, default=10_000, help='Number of seeded users')
+        parser.add_argument('--repeat', type=int, default=20, help='Number of measured runs of every query')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution.
+        """
+
+        indexes = [index for index in Habit._meta.indexes if index.name in ACCESS_PATH_INDEXES]
+        user_ids = []
+        try:
+            user_ids = self.seed(options['rows'], options['users'])
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.remove_index(Habit, index)
+            self.vacuum()
+            before = self.measure('Before', user_ids, options['repeat'])
+
+            with connection.schema_editor() as schema_editor:
+                for index in indexes:
+                    schema_editor.add_index(Habit, index)
+            self.vacuum()
+            after = self.measure('After', user_ids, options['repeat'])
+        finally:
+            self.restore_indexes(indexes)
+            self.delete_seeded(user_ids)
+
+        self.stdout.write(f'\nExecution time, best of {options["repeat"]} runs:')
+        for name in before:
+            self.stdout.write(
+                f'{name}: {before[name]:.2f} ms -> {after[name]:.2f} ms ({before[name] / after[name]:.1f}x)'
+            )
+
+    def seed(self, rows, users):
+        """
+        Inserts users and habits with a spread of owners, schedules and visibility.
+
+        Every 8th habit does not recur and has no next reminder, every 20th habit is public.
+
+        Returns:
+            list: Primary keys of the seeded users.
+        """
+        started_at = timezone.now()
+        user_ids = [
+            user.pk for user in User.objects.bulk_create(
+                User(email=f'benchmark-{number}@example.com', password='') for number in range(users)
+            )
+        ]
+
+        columns = ', '.join(
+            connection.ops.quote_name(Habit._meta.get_field(name).column) for name in (
+                'user', 'place', 'execution_time', 'action', 'is_pleasant', 'frequency', 'time_to_complete',
+                'is_public', 'next_fire_at', 'created_at', 'updated_at',
+            )
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                INSERT INTO {connection.ops.quote_name(Habit._meta.db_table)} ({columns})
+                SELECT (%(user_ids)s::bigint[])[1 + number %% %(users)s], 'Park',
+                       %(now)s - number * interval '1 minute', 'run', false, number %% 8, 60, number %% 20 = 0,
+                       CASE WHEN number %% 8 = 0 THEN NULL
+                            ELSE date_trunc('minute', %(now)s) + (number %% 10080) * interval '1 minute' END,
+                       %(now)s, %(now)s
+                FROM generate_series(1, %(rows)s) AS number
+                ''',
+                {'user_ids': user_ids, 'users': users, 'now': started_at, 'rows': rows},
+            )
+        self.stdout.write(f'Seeded {rows} habits of {users} users in {timezone.now() - started_at}')
+        return user_ids
+
+    @staticmethod
+    def vacuum():
+        """
+        Refreshes the statistics and the visibility map of the tables, so the planner sees the seeded rows.
+        """
+        with connection.cursor() as cursor:
+            for model in (User, Habit):
+                cursor.execute(f'VACUUM ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+    @staticmethod
+    def restore_indexes(indexes):
+        """
+        Creates the indexes missing after a failed run.
+        """
+        with connection.cursor() as cursor:
+            existing = connection.introspection.get_constraints(cursor, Habit._meta.db_table)
+        with connection.schema_editor() as schema_editor:
+            for index in indexes:
+                if index.name not in existing:
+                    schema_editor.add_index(Habit, index)
+
+    @staticmethod
+    def delete_seeded(user_ids):
+        """
+        Deletes the seeded habits with a single query, then their users.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(Habit._meta.db_table)} '
+                f'WHERE {connection.ops.quote_name(Habit._meta.get_field("user").column)} = ANY(%s)',
+                [user_ids],
+            )
+        User.objects.filter(pk__in=user_ids).delete()
+
+    @staticmethod
+    def get_queries(user_ids):
+        """
+        Builds the querysets of the access paths, the same way the digest reminder tasks and the list views do.
+        """
+        due_before = get_minute_bucket(timezone.now()) + settings.NOTIFICATION_DIGEST_WINDOW
+        first_user_id, last_user_id = user_ids[0], user_ids[len(user_ids) // 100]
+        page_size = HabitPaginator.page_size
+        return {
+            'Reminder planner': (
+                Habit.objects.filter(next_fire_at__lt=due_before)
+                .order_by('user_id').values_list('user_id', flat=True).distinct()
+            ),
+            'Reminder shard': (
+                Habit.objects.filter(user_id__gte=first_user_id, user_id__lte=last_user_id, next_fire_at__lt=due_before)
+                .order_by('user_id', 'pk').values_list(*REMINDER_FIELDS)
+            ),
+            'Public feed page': Habit.objects.filter(is_public=True).order_by('execution_time', 'pk')[:page_size],
+            'Owner list page': Habit.objects.filter(user_id=user_ids[-1]).order_by('pk')[:page_size],
+            'Owner cursor page': (
+                Habit.objects.filter(user_id=user_ids[-1], execution_time__gt=timezone.now() - timedelta(days=7))
+                .order_by('execution_time', 'pk')[:page_size]
+            ),
+        }
+
+    def measure(self, title, user_ids, repeat):
+        """
+        Prints the plans of the queries and returns their best execution time in milliseconds.
+
+        The execution time is taken from `EXPLAIN ANALYZE`, so it covers the work of the database only and not the
+        round trip and the construction of model instances, which the indexes do not change.
+        """
+        self.stdout.write(f'\n=== {title} ===')
+        latency = {}
+        for name, queryset in self.get_queries(user_ids).items():
+            self.stdout.write(f'\n{name}:\n{queryset.explain(analyze=True)}')
+            latency[name] = min(
+                json.loads(queryset.explain(format='json', analyze=True))[0]['Execution Time'] for _ in range(repeat)
+            )
+        return latency
@@ -0,0 +1,69 @@
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from django.core.management import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from habits.models import Habit
+from habits.renderers import FastJSONRenderer
+from habits.serializers.fast import FastHabitSerializer
+from habits.serializers.habit import HabitSerializer
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Management command comparing the regular and the fast read path of habit list responses.
+
+    Serializes and renders in-memory habits, so the database is not involved.
+    """
+
+    help = 'Measures the time needed to serialize and render 1,000 habits with HabitSerializer and FastHabitSerializer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help='Number of habits in a response')
+        parser.add_argument('--repeat', type=int, default=20, help='Number of measured runs of every path')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution.
+        """
+
+        rows = options['rows']
+        user = User(pk=1, email='benchmark@example.com', telegram_id=42)
+        started_at = datetime(2024, 1, 6, 20, 18, 47, tzinfo=timezone.utc)
+        habits = [
+            Habit(
+                pk=number, user=user, award_id=number if number % 2 else None, place='Парк', action='run_in_gym',
+                execution_time=started_at + timedelta(minutes=number), is_pleasant=False, frequency=1,
+                time_to_complete=100, is_public=True,
+            )
+            for number in range(1, rows + 1)
+        ]
+        values = [
+            {
+                'pk': habit.pk, 'user__email': user.email, 'award': habit.award_id, 'place': habit.place,
+                'execution_time': habit.execution_time, 'action': habit.action, 'is_pleasant': habit.is_pleasant,
+                'related_habit': None, 'frequency': habit.frequency, 'time_to_complete': habit.time_to_complete,
+                'is_public': habit.is_public, 'user__telegram_id': user.telegram_id,
+            }
+            for habit in habits
+        ]
+
+        def regular():
+            return JSONRenderer().render(HabitSerializer(habits, many=True).data)
+
+        def fast():
+            return FastJSONRenderer().render(FastHabitSerializer.serialize(values))
+
+        if regular() != fast():
+            self.stderr.write('The fast path renders different bytes than the regular one')
+            return
+
+        results = {}
+        for name, path in (('HabitSerializer + JSONRenderer', regular), ('FastHabitSerializer + orjson', fast)):
+            results[name] = min(timeit.repeat(path, number=1, repeat=options['repeat'])) / rows * 1000
+            self.stdout.write(f'{name}: {results[name] * 1000:.2f} ms per 1,000 rows')
+
+        regular_time, fast_time = results.values()
+        self.stdout.write(f'Speedup: {regular_time / fast_time:.1f}x')
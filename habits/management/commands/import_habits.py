@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management import BaseCommand, CommandError
+
+from habits.importer import IMPORT_FORMATS, HabitImporter, read_rows
+
+
+class Command(BaseCommand):
+    """
+    Management command for importing habits from an NDJSON or CSV file through PostgreSQL COPY.
+    """
+
+    help = 'Imports habits from an NDJSON or CSV file, e.g. one made by the habit export'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path of the file, "-" to read from the standard input')
+        parser.add_argument('--input', choices=IMPORT_FORMATS, help='Format of the file, guessed from its extension')
+        parser.add_argument('--batch-size', type=int, help='Number of rows validated and copied at once')
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution.
+        """
+
+        path = options['path']
+        input_format = options['input'] or path.rsplit('.', 1)[-1].lower()
+        if input_format not in IMPORT_FORMATS:
+            raise CommandError(f'Cannot guess the format of {path}, use --input')
+
+        if path == '-':
+            report = HabitImporter(options['batch_size']).run(read_rows(sys.stdin, input_format))
+        else:
+            with open(path, encoding='utf-8', newline='') as file:
+                report = HabitImporter(options['batch_size']).run(read_rows(file, input_format))
+
+        for error in report.errors:
+            self.stderr.write(f'Line {error["line"]}: {error["errors"]}')
+        self.stdout.write(
+            f'Imported {report.imported} of {report.read} rows ({report.rejected} rejected) '
+            f'in {report.elapsed:.2f} s: {report.rows_per_second:.0f} rows/s'
+        )
@@ -0,0 +1,21 @@
+from django.core.management import BaseCommand
+
+from habits.models import Habit
+
+
+class Command(BaseCommand):
+    """
+    Management command for recalculating the next reminder time of all habits.
+
+    Should be run after an update of the time zone database changes the UTC offsets or DST rules of a zone.
+    """
+
+    help = 'Recalculates the next reminder time of all habits in the time zones of their users'
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution.
+        """
+
+        processed = Habit.objects.all().rebuild_schedule()
+        self.stdout.write(f'The schedule of {processed} habits has been rebuilt')
@@ -0,0 +1,108 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:39
+
+from datetime import timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+
+def fill_next_fire_at(apps, schema_editor):
+    Habit = apps.get_model('habits', 'Habit')
+    now = timezone.now()
+    habits = Habit.objects.filter(frequency__gt=0).only('execution_time', 'frequency').iterator(chunk_size=1000)
+    while chunk := list(islice(habits, 1000)):
+        for habit in chunk:
+            habit.next_fire_at = habit.execution_time
+            if habit.execution_time < now:
+                period = timedelta(days=habit.frequency)
+                periods_passed, remainder = divmod(now - habit.execution_time, period)
+                habit.next_fire_at += (periods_passed + bool(remainder)) * period
+        Habit.objects.bulk_update(chunk, ['next_fire_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('habits', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='award',
+            options={'verbose_name': 'Award', 'verbose_name_plural': 'Awards'},
+        ),
+        migrations.AlterModelOptions(
+            name='habit',
+            options={'verbose_name': 'Habit', 'verbose_name_plural': 'Habits'},
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='next_fire_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Date and time of the next reminder'),
+        ),
+        migrations.AlterField(
+            model_name='award',
+            name='reward',
+            field=models.TextField(verbose_name='Reward'),
+        ),
+        migrations.AlterField(
+            model_name='award',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='action',
+            field=models.TextField(verbose_name='Action'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='award',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='habits.award', verbose_name='Reward'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='execution_time',
+            field=models.DateTimeField(verbose_name='Date and time of habit execution'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='frequency',
+            field=models.PositiveIntegerField(default=1, verbose_name='Frequency in days'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='is_pleasant',
+            field=models.BooleanField(default=False, verbose_name='Flag indicating a pleasant habit'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='is_public',
+            field=models.BooleanField(default=False, verbose_name='Public habit flag'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='place',
+            field=models.CharField(max_length=200, verbose_name='Location of habit execution'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='related_habit',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='related_habits', to='habits.habit', verbose_name='Related habit'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='time_to_complete',
+            field=models.PositiveIntegerField(verbose_name='Time to complete (in seconds)'),
+        ),
+        migrations.AlterField(
+            model_name='habit',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='habits', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.RunPython(fill_next_fire_at, migrations.RunPython.noop),
+    ]
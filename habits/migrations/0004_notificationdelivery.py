@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0003_habit_next_fire_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('occurrence', models.DateTimeField(verbose_name='Date and time of the habit occurrence')),
+                ('delivered_at', models.DateTimeField(verbose_name='Date and time of the delivery')),
+                ('habit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='habits.habit', verbose_name='Habit')),
+            ],
+            options={
+                'verbose_name': 'Notification delivery',
+                'verbose_name_plural': 'Notification deliveries',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='notificationdelivery',
+            constraint=models.UniqueConstraint(fields=('habit', 'occurrence'), name='unique_habit_occurrence_delivery'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:45
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0004_notificationdelivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chat_id', models.BigIntegerField(verbose_name='Telegram chat id')),
+                ('text', models.TextField(verbose_name='Text')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('sent', 'Sent')], default='pending', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date and time of creation')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date and time the message may be sent')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Date and time of sending')),
+            ],
+            options={
+                'verbose_name': 'Outbox message',
+                'verbose_name_plural': 'Outbox messages',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx')],
+            },
+        ),
+    ]
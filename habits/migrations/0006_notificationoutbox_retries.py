@@ -0,0 +1,28 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('habits', '0005_notificationoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0, verbose_name='Number of failed attempts'),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='last_error',
+            field=models.TextField(blank=True, verbose_name='Last error'),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('sent', 'Sent'), ('dead', 'Dead')], default='pending', max_length=20, verbose_name='Status'),
+        ),
+    ]
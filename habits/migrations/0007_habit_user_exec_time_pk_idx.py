@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:53
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('habits', '0006_notificationoutbox_retries'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='habit',
+            index=models.Index(fields=['user', 'execution_time', 'id'], name='habit_user_exec_time_pk_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.9 on 2026-10-18 10:07
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('habits', '0007_habit_user_exec_time_pk_idx'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('next_fire_at__isnull', False)), fields=['next_fire_at', 'user', 'id'], name='habit_reminder_scan_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='habit',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['execution_time', 'id'], name='habit_public_feed_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='habit',
+            index=models.Index(fields=['user', 'id'], name='habit_user_pk_idx'),
+        ),
+    ]
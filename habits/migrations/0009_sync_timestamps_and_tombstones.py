@@ -0,0 +1,61 @@
+# Generated by Django 4.2.9 on 2026-10-18 10:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('habits', '0008_habit_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('habit', 'Habit'), ('award', 'Award')], max_length=20, verbose_name='Kind of the deleted object')),
+                ('object_id', models.BigIntegerField(verbose_name='Primary key of the deleted object')),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Date and time of the deletion')),
+            ],
+            options={
+                'verbose_name': 'Tombstone',
+                'verbose_name_plural': 'Tombstones',
+            },
+        ),
+        migrations.AddField(
+            model_name='award',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Date and time of creation'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='award',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Date and time of the last change'),
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now, verbose_name='Date and time of creation'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='habit',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Date and time of the last change'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_at_idx'),
+        ),
+    ]
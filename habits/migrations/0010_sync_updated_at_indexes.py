@@ -0,0 +1,23 @@
+# Generated by Django 4.2.9 on 2026-10-18 10:36
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('habits', '0009_sync_timestamps_and_tombstones'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='award',
+            index=models.Index(fields=['user', 'updated_at'], name='award_user_updated_at_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='habit',
+            index=models.Index(fields=['user', 'updated_at'], name='habit_user_updated_at_idx'),
+        ),
+    ]
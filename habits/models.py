@@ -1,10 +1,53 @@
-from django.db import models
+from datetime import timedelta, timezone as dt_timezone
+from itertools import islice
+
+from django.db import connections, models, transaction
 from django.utils import timezone
 
 from config import settings
 from users.models import NULLABLE
 
 
+def get_minute_bucket(moment):
+    """
+    Truncates a moment to the start of its minute, the granularity reminders are scheduled with.
+    """
+    return moment.replace(second=0, microsecond=0)
+
+
+def get_next_occurrence(execution_time, frequency, after, tz=dt_timezone.utc):
+    """
+    Calculates the minute bucket of the nearest occurrence of a habit that is not earlier than the given moment.
+
+    Occurrences repeat at the same wall-clock time in the time zone of the user, so a habit keeps its local time
+    across DST transitions. A local time skipped by a transition is shifted forward by the size of the gap.
+    :param execution_time: date and time of the first occurrence of the habit
+    :param frequency: number of days between occurrences
+    :param after: moment to start searching from
+    :param tz: time zone of the user
+    :return: UTC datetime of the start of the minute of the next occurrence, or None if the habit does not recur
+    """
+    if not frequency:
+        return None
+
+    after = get_minute_bucket(after)
+    start = get_minute_bucket(execution_time.astimezone(tz)).replace(tzinfo=None)
+    period = timedelta(days=frequency)
+
+    periods_passed = 0
+    local_after = after.astimezone(tz).replace(tzinfo=None)
+    if start < local_after:
+        periods_passed, remainder = divmod(local_after - start, period)
+        if remainder:
+            periods_passed += 1
+
+    while True:
+        occurrence = (start + periods_passed * period).replace(tzinfo=tz).astimezone(dt_timezone.utc)
+        if occurrence >= after:
+            return occurrence
+        periods_passed += 1
+
+
 class Award(models.Model):
     """
     Model representing an award given to a user for a particular achievement or habit.
@@ -12,6 +55,8 @@ class Award(models.Model):
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, verbose_name='User')
     reward = models.TextField(verbose_name='Reward')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date and time of creation')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date and time of the last change')
 
     def __str__(self):
         """
@@ -22,6 +67,34 @@ class Award(models.Model):
     class Meta:
         verbose_name = 'Award'
         verbose_name_plural = 'Awards'
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='award_user_updated_at_idx'),
+        ]
+
+
+class HabitQuerySet(models.QuerySet):
+    """
+    QuerySet of Habit objects.
+    """
+
+    def rebuild_schedule(self, batch_size=1000):
+        """
+        Recalculates the next reminder time of the habits, e.g. after their user changed the time zone.
+        :param batch_size: number of habits fetched and updated at once
+        :return: number of habits processed
+        """
+        now = timezone.now()
+        rows = self.values_list('pk', 'execution_time', 'frequency', 'user__timezone').iterator(chunk_size=batch_size)
+
+        processed = 0
+        while batch := list(islice(rows, batch_size)):
+            self.model.objects.bulk_update(
+                [Habit(pk=pk, next_fire_at=get_next_occurrence(execution_time, frequency, now, tz))
+                 for pk, execution_time, frequency, tz in batch],
+                ['next_fire_at'],
+            )
+            processed += len(batch)
+        return processed
 
 
 class Habit(models.Model):
@@ -41,15 +114,31 @@ class Habit(models.Model):
     frequency = models.PositiveIntegerField(default=1, verbose_name='Frequency in days')
     time_to_complete = models.PositiveIntegerField(verbose_name='Time to complete (in seconds)')
     is_public = models.BooleanField(default=False, verbose_name='Public habit flag')
+    next_fire_at = models.DateTimeField(verbose_name='Date and time of the next reminder', editable=False,
+                                        **NULLABLE)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date and time of creation')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Date and time of the last change')
 
-    def should_execute_today(self):
+    objects = HabitQuerySet.as_manager()
+
+    def get_next_fire_at(self, after=None):
         """
-        Determines if the habit should be executed today based on the defined frequency.
-        :return: True if the habit should be executed today, False otherwise
+        Calculates the minute bucket of the nearest occurrence of the habit that is not earlier than the given moment.
+        :param after: moment to start searching from, defaults to the current minute
+        :return: UTC datetime of the next occurrence or None if the habit does not recur
         """
-        today = timezone.now()
-        days_passed = (today - self.execution_time).days
-        return days_passed % self.frequency == 0 and self.execution_time.date() <= today.date()
+        execution_time = self._meta.get_field('execution_time').to_python(self.execution_time)
+        return get_next_occurrence(execution_time, self.frequency, after or timezone.now(), self.user.timezone)
+
+    def save(self, *args, **kwargs):
+        """
+        Saves the habit, keeping the precomputed time of the next reminder and the time of the last change up to date.
+        """
+        self.next_fire_at = self.get_next_fire_at()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'next_fire_at', 'updated_at'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         """
@@ -60,3 +149,174 @@ class Habit(models.Model):
     class Meta:
         verbose_name = 'Habit'
         verbose_name_plural = 'Habits'
+        indexes = [
+            models.Index(fields=['next_fire_at', 'user', 'id'], name='habit_reminder_scan_idx',
+                         condition=models.Q(next_fire_at__isnull=False)),
+            models.Index(fields=['execution_time', 'id'], name='habit_public_feed_idx',
+                         condition=models.Q(is_public=True)),
+            models.Index(fields=['user', 'id'], name='habit_user_pk_idx'),
+            models.Index(fields=['user', 'updated_at'], name='habit_user_updated_at_idx'),
+            models.Index(fields=['user', 'execution_time', 'id'], name='habit_user_exec_time_pk_idx'),
+        ]
+
+
+class Tombstone(models.Model):
+    """
+    Model representing a deleted habit or award, which incremental sync reports to the clients.
+
+    Tombstones are kept for `SYNC_TOMBSTONE_RETENTION`, clients that did not sync for longer download everything
+    again. The user is not a database constraint, so the deletions cascading from a deleted user can be recorded.
+    """
+
+    HABIT = 'habit'
+    AWARD = 'award'
+
+    KIND_CHOICES = (
+        (HABIT, 'Habit'),
+        (AWARD, 'Award'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False,
+                             verbose_name='User', related_name='+')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Kind of the deleted object')
+    object_id = models.BigIntegerField(verbose_name='Primary key of the deleted object')
+    deleted_at = models.DateTimeField(default=timezone.now, verbose_name='Date and time of the deletion')
+
+    def __str__(self):
+        """
+        String representation of the Tombstone object.
+        """
+        return f'{self.kind} {self.object_id} at {self.deleted_at}'
+
+    class Meta:
+        verbose_name = 'Tombstone'
+        verbose_name_plural = 'Tombstones'
+        indexes = [
+            models.Index(fields=['user', 'deleted_at'], name='tombstone_user_deleted_at_idx'),
+        ]
+
+
+class NotificationDeliveryManager(models.Manager):
+    """
+    Manager recording reminder deliveries in bulk.
+    """
+
+    def claim(self, occurrences):
+        """
+        Records deliveries of the given habit occurrences with a single query.
+        :param occurrences: iterable of (habit_id, occurrence) pairs
+        :return: set of pairs that had not been recorded before and may be sent now
+        """
+        occurrences = list(occurrences)
+        if not occurrences:
+            return set()
+
+        now = timezone.now()
+        values = ', '.join(['(%s, %s, %s)'] * len(occurrences))
+        params = [value for habit_id, occurrence in occurrences for value in (habit_id, occurrence, now)]
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.model._meta.db_table} (habit_id, occurrence, delivered_at) VALUES {values} '
+                f'ON CONFLICT (habit_id, occurrence) DO NOTHING RETURNING habit_id, occurrence',
+                params,
+            )
+            return set(cursor.fetchall())
+
+
+class NotificationDelivery(models.Model):
+    """
+    Model representing a reminder sent for a particular occurrence of a habit.
+    """
+
+    habit = models.ForeignKey(Habit, on_delete=models.CASCADE, verbose_name='Habit', related_name='deliveries')
+    occurrence = models.DateTimeField(verbose_name='Date and time of the habit occurrence')
+    delivered_at = models.DateTimeField(verbose_name='Date and time of the delivery')
+
+    objects = NotificationDeliveryManager()
+
+    def __str__(self):
+        """
+        String representation of the NotificationDelivery object.
+        """
+        return f'{self.habit_id} at {self.occurrence}'
+
+    class Meta:
+        verbose_name = 'Notification delivery'
+        verbose_name_plural = 'Notification deliveries'
+        constraints = [
+            models.UniqueConstraint(fields=['habit', 'occurrence'], name='unique_habit_occurrence_delivery'),
+        ]
+
+
+class NotificationOutboxManager(models.Manager):
+    """
+    Manager handing out outbox messages to concurrent drainers.
+    """
+
+    def claim(self, size, lease):
+        """
+        Locks a batch of messages ready to be sent, skipping rows locked by other drainers, and leases them.
+
+        A leased message is not handed out again until the lease expires, so messages of a drainer
+        that crashed before marking them are picked up by another one later.
+        :param size: maximum number of messages to claim
+        :param lease: timedelta for which the claimed messages are reserved
+        :return: list of (pk, chat_id, text, attempts) tuples
+        """
+        now = timezone.now()
+        with transaction.atomic(using=self.db):
+            rows = list(
+                self.select_for_update(skip_locked=True)
+                .filter(status__in=(NotificationOutbox.PENDING, NotificationOutbox.PROCESSING), available_at__lte=now)
+                .order_by('available_at')
+                .values_list('pk', 'chat_id', 'text', 'attempts')[:size]
+            )
+            self.filter(pk__in=[row[0] for row in rows]).update(
+                status=NotificationOutbox.PROCESSING, available_at=now + lease
+            )
+        return rows
+
+
+class NotificationOutbox(models.Model):
+    """
+    Model representing a rendered Telegram message waiting to be sent.
+
+    Messages that failed permanently or ran out of attempts stay in the outbox with the DEAD status
+    and serve as the dead-letter store.
+    """
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    SENT = 'sent'
+    DEAD = 'dead'
+
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (SENT, 'Sent'),
+        (DEAD, 'Dead'),
+    )
+
+    chat_id = models.BigIntegerField(verbose_name='Telegram chat id')
+    text = models.TextField(verbose_name='Text')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING, verbose_name='Status')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Date and time of creation')
+    available_at = models.DateTimeField(default=timezone.now, verbose_name='Date and time the message may be sent')
+    sent_at = models.DateTimeField(verbose_name='Date and time of sending', **NULLABLE)
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Number of failed attempts')
+    last_error = models.TextField(blank=True, verbose_name='Last error')
+
+    objects = NotificationOutboxManager()
+
+    def __str__(self):
+        """
+        String representation of the NotificationOutbox object.
+        """
+        return f'{self.chat_id}: {self.status}'
+
+    class Meta:
+        verbose_name = 'Outbox message'
+        verbose_name_plural = 'Outbox messages'
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
@@ -1,4 +1,9 @@
-from rest_framework.pagination import PageNumberPagination
+from datetime import datetime
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
 
 
 class HabitPaginator(PageNumberPagination):
@@ -14,3 +19,191 @@ class HabitPaginator(PageNumberPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 10
+
+
+class AsyncHabitPaginator(HabitPaginator):
+    """
+    HabitPaginator for async views, counting and fetching the page with the async ORM.
+    """
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Paginates the queryset like `paginate_queryset`, without blocking the event loop.
+
+        Args:
+            queryset (QuerySet): Queryset to paginate.
+            request (Request): DRF request wrapping the request of the async view.
+
+        Returns:
+            list: Objects of the requested page.
+        """
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        self.page.object_list = [obj async for obj in self.page.object_list.aiterator()]
+        self.request = request
+        return self.page.object_list
+
+
+class HabitCursorPaginator(CursorPagination):
+    """
+    Keyset pagination class for the Habit List API views.
+
+    Pages are selected by the position of an opaque cursor in the (`execution_time`, `pk`) order instead of an
+    offset, and no count query is made, so every page costs the same regardless of its depth. The cursor holds both
+    values of the last habit, and the following page starts right after them, so habits sharing an execution time
+    are sought by their primary key instead of being skipped with an offset. The order is indexed for the habits of
+    a user by (`user`, `execution_time`, `id`) and for the public feed by a partial index.
+
+    Attributes:
+        page_size (int): Number of items displayed per page.
+        page_size_query_param (str): URL query parameter to control the page size.
+        max_page_size (int): Maximum limit for page size allowed.
+        ordering (tuple): Fields the habits are ordered by.
+    """
+
+    page_size = HabitPaginator.page_size
+    page_size_query_param = HabitPaginator.page_size_query_param
+    max_page_size = HabitPaginator.max_page_size
+    ordering = ('execution_time', 'pk')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Returns the page following or preceding the position of the cursor, like CursorPagination but seeking on
+        both ordering fields.
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*(f'-{field}' for field in self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.get_position_filter(current_position, reverse))
+
+        # Positions are unique, so the links always carry a zero offset; it is honoured for hand-made cursors only.
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = self._get_position_from_instance(results[-1], self.ordering) \
+            if len(results) > len(self.page) else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None or offset > 0
+            self.has_previous = following_position is not None
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.has_previous = current_position is not None or offset > 0
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_position_filter(self, position, reverse):
+        """
+        Builds the filter selecting the habits after the position, or before it for a reverse cursor.
+
+        Args:
+            position (str): Position of a cursor, as built by `_get_position_from_instance`.
+            reverse (bool): Whether the cursor points to the previous page.
+
+        Returns:
+            Q: Condition on the execution time and the primary key.
+        """
+        try:
+            execution_time, pk = position.rsplit('|', 1)
+            execution_time, pk = datetime.fromisoformat(execution_time), int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        lookup = 'lt' if reverse else 'gt'
+        return (
+            Q(**{f'execution_time__{lookup}': execution_time})
+            | Q(execution_time=execution_time, **{f'pk__{lookup}': pk})
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        """
+        Returns the position of a habit, holding its execution time and primary key.
+
+        Overrides the private hook of CursorPagination building the position of the first ordering field only.
+        """
+        execution_time, pk = (
+            instance[field] if isinstance(instance, dict) else getattr(instance, field) for field in ordering
+        )
+        return f'{execution_time.isoformat()}|{pk}'
+
+
+class HabitListPaginator(BasePagination):
+    """
+    Pagination class for the Habit List API views supporting both pagination modes.
+
+    Keyset pagination (HabitCursorPaginator) is used when it is requested with `?pagination=cursor` or a cursor
+    is passed, page-number pagination (HabitPaginator) is used otherwise.
+
+    Attributes:
+        mode_query_param (str): URL query parameter to select the pagination mode.
+    """
+
+    mode_query_param = 'pagination'
+
+    def __init__(self):
+        self.paginator = HabitPaginator()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Paginates the queryset in the mode requested by the client.
+        """
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or HabitCursorPaginator.cursor_query_param in request.query_params):
+            self.paginator = HabitCursorPaginator()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    @property
+    def display_page_controls(self):
+        return getattr(self.paginator, 'display_page_controls', False)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.paginator.get_paginated_response_schema(schema)
+
+    def to_html(self):
+        return self.paginator.to_html()
+
+    def get_results(self, data):
+        return self.paginator.get_results(data)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Pagination mode, "cursor" for keyset pagination.',
+                'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+            },
+            *HabitPaginator().get_schema_operation_parameters(view),
+            *[
+                parameter for parameter in HabitCursorPaginator().get_schema_operation_parameters(view)
+                if parameter['name'] == HabitCursorPaginator.cursor_query_param
+            ],
+        ]
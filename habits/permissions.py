@@ -39,7 +39,9 @@ class IsOwner(BasePermission):
 
     def has_object_permission(self, request, view, obj):
         """
-        Check whether the requesting user is the owner of the object.
+        Check whether the requesting user is the owner of the object, or the object itself for users.
+
+        The owner is compared by its id, so the user of the object is not fetched.
 
         Args:
             request: Request object.
@@ -49,6 +51,6 @@ class IsOwner(BasePermission):
         Returns:
             bool: True if the user is the owner, False otherwise.
         """
-        if request.user == obj:
+        if request.user.pk is not None and request.user.pk == getattr(obj, 'user_id', obj.pk):
             return True
         return False
@@ -0,0 +1,183 @@
+"""
+Reminder pipeline
+
+Streams due habits from the database as lightweight records and renders them into Telegram messages.
+"""
+
+from collections import defaultdict
+from datetime import timedelta, tzinfo
+from typing import NamedTuple, Optional
+
+from habits.models import Habit, get_next_occurrence
+
+
+class Reminder(NamedTuple):
+    """
+    A due occurrence of a habit with only the data needed to notify its user.
+    """
+
+    habit_id: int
+    occurrence: object
+    execution_time: object
+    frequency: int
+    action: str
+    place: str
+    time_to_complete: int
+    chat_id: Optional[int]
+    timezone: tzinfo
+    reward: Optional[str]
+
+    def get_next_occurrence(self, now):
+        """
+        Calculates the occurrence following this one, skipping the ones that are already in the past.
+        :param now: current date and time
+        :return: UTC datetime of the next occurrence or None if the habit does not recur
+        """
+        return get_next_occurrence(
+            self.execution_time, self.frequency, max(self.occurrence, now) + timedelta(minutes=1), self.timezone
+        )
+
+
+REMINDER_FIELDS = (
+    'pk', 'next_fire_at', 'execution_time', 'frequency', 'action', 'place', 'time_to_complete',
+    'user__telegram_id', 'user__timezone', 'award__reward',
+)
+
+
+def iter_due_reminders(first_key, last_key, due_before, chunk_size, shard_field='pk'):
+    """
+    Streams due habits of a pk or user-id range through a server-side cursor, ordered by the range field.
+
+    Only the columns of REMINDER_FIELDS are selected, the user and the award are joined in the same query.
+
+    Args:
+        first_key (int): Primary key or user id of the first habit of the range.
+        last_key (int): Primary key or user id of the last habit of the range.
+        due_before (datetime): End of the planning window.
+        chunk_size (int): Number of rows fetched from the cursor at once.
+        shard_field (str): Field the range is bounded by, either 'pk' or 'user_id'.
+
+    Returns:
+        iterator: Reminder records of the due occurrences.
+    """
+    habits = Habit.objects.filter(
+        **{f'{shard_field}__gte': first_key, f'{shard_field}__lte': last_key}, next_fire_at__lt=due_before
+    ).order_by(shard_field, 'pk')
+    return iter_reminders(habits, chunk_size)
+
+
+def iter_reminders(habits, chunk_size):
+    """
+    Streams habits of a queryset through a server-side cursor as Reminder records.
+
+    Args:
+        habits (QuerySet): Habits due for a reminder.
+        chunk_size (int): Number of rows fetched from the cursor at once.
+
+    Yields:
+        Reminder: Due occurrence of a habit.
+    """
+    for row in habits.values_list(*REMINDER_FIELDS).iterator(chunk_size=chunk_size):
+        yield Reminder._make(row)
+
+
+def iter_batches(iterable, size, key=None):
+    """
+    Splits an iterable into lists of `size` items without materializing it.
+
+    When `key` is given, consecutive items with equal keys are never split between batches,
+    so a batch may exceed `size` to keep them together.
+
+    Yields:
+        list: Next batch of items.
+    """
+    batch = []
+    for item in iterable:
+        if len(batch) >= size and (key is None or key(item) != key(batch[-1])):
+            yield batch
+            batch = []
+        batch.append(item)
+    if batch:
+        yield batch
+
+
+def render_reminder(reminder):
+    """
+    Renders the text of the Telegram message for a reminder.
+
+    Args:
+        reminder (Reminder): Due occurrence of a habit.
+
+    Returns:
+        str: The text of the message.
+    """
+    return f'Reminder\n{render_reminder_details(reminder)}'
+
+
+def render_reminder_details(reminder):
+    """
+    Renders the description of a habit occurrence shared by single reminders and digests.
+    """
+    text = (
+        f'To Do: {reminder.action}\n'
+        f'At: {reminder.occurrence.astimezone(reminder.timezone)}\n'
+        f'Place: {reminder.place}\n'
+        f'Time to Complete: {reminder.time_to_complete} sec.'
+    )
+    if reminder.reward:
+        text += f'\nYou can get {reminder.reward} as a reward.'
+    return text
+
+
+def render_digests(reminders, max_items, max_length):
+    """
+    Coalesces reminders of the same Telegram chat into digest messages.
+
+    Every digest holds at most `max_items` reminders and is split further so that no message exceeds
+    `max_length` characters.
+
+    Args:
+        reminders (iterable): Reminders to coalesce.
+        max_items (int): Maximum number of reminders in a single digest.
+        max_length (int): Maximum length of a single message.
+
+    Yields:
+        tuple: Pairs of (chat_id, text) to send.
+    """
+    reminders_by_chat = defaultdict(list)
+    for reminder in reminders:
+        reminders_by_chat[reminder.chat_id].append(reminder)
+
+    for chat_id, chat_reminders in reminders_by_chat.items():
+        for start in range(0, len(chat_reminders), max_items):
+            digest = chat_reminders[start:start + max_items]
+            if len(digest) == 1:
+                blocks = [render_reminder(digest[0])]
+            else:
+                blocks = [f'Reminders ({len(digest)})'] + [render_reminder_details(reminder) for reminder in digest]
+            for text in split_message(blocks, max_length):
+                yield chat_id, text
+
+
+def split_message(blocks, max_length, separator='\n\n'):
+    """
+    Joins text blocks into messages no longer than `max_length`, cutting blocks that do not fit on their own.
+
+    Yields:
+        str: Text of the next message.
+    """
+    message = ''
+    for block in blocks:
+        candidate = f'{message}{separator}{block}' if message else block
+        if len(candidate) <= max_length:
+            message = candidate
+            continue
+
+        if message:
+            yield message
+        while len(block) > max_length:
+            yield block[:max_length]
+            block = block[max_length:]
+        message = block
+    if message:
+        yield message
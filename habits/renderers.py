@@ -0,0 +1,25 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding compact responses with orjson.
+
+    The output is byte-identical to JSONRenderer for data made of strings, integers, booleans, None, lists and
+    dicts with string keys, which is what serializers return. Other objects are passed to the encoder of
+    JSONRenderer, and indented or ASCII-only output is left to JSONRenderer itself.
+    """
+
+    OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """
+        Render `data` into compact JSON, returning a bytestring.
+        """
+        if (data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder_class().default, option=self.OPTIONS)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,233 @@
+"""
+Timing wheel scheduler
+
+Keeps the upcoming occurrences of habits in memory and enqueues reminders at the second they are due.
+Changes of the schedule are received through a Redis channel, so the database is read on startup and otherwise
+only swept for overdue habits once in a while.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timezone as dt_timezone
+from math import prod
+
+import redis
+
+from config import settings
+from habits.models import Habit
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+
+
+def get_redis_client():
+    """
+    Returns the Redis client shared by the process.
+    """
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.NOTIFICATION_SCHEDULER_REDIS_URL)
+    return _redis_client
+
+
+def publish_schedule_changes(habits):
+    """
+    Publishes new reminder times of habits to the timing wheel scheduler.
+    :param habits: iterable of Habit objects, habits without `next_fire_at` are removed from the schedule
+    """
+    changes = [
+        [habit.pk, habit.next_fire_at.isoformat() if habit.next_fire_at else None] for habit in habits
+    ]
+    if changes:
+        get_redis_client().publish(settings.NOTIFICATION_SCHEDULER_CHANNEL, json.dumps(changes))
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel with a resolution of one second.
+
+    Every level consists of `size` slots, each one covering the whole span of the level below it. With the
+    default sizes the levels hold the seconds of a minute, the minutes of an hour, the hours of a day and the
+    days of a week and a day. A timer is kept at the lowest level able to hold it and cascades down as the wheel
+    turns, so scheduling, cancelling and expiring a timer take constant time. Timers beyond the reach of the top
+    level wait in an overflow bucket until they come within reach.
+
+    Attributes:
+        current (int): Timestamp in seconds the wheel has turned to.
+        sizes (tuple): Number of slots of every level.
+        spans (list): Number of seconds covered by a single slot of every level.
+    """
+
+    def __init__(self, current, sizes=(60, 60, 24, 8)):
+        self.current = int(current)
+        self.sizes = sizes
+        self.spans = [prod(sizes[:level]) for level in range(len(sizes))]
+        self._slots = [[{} for _ in range(size)] for size in sizes]
+        self._overflow = {}
+        self._expired = {}
+        self._locations = {}
+
+    def __len__(self):
+        return len(self._locations)
+
+    def __contains__(self, key):
+        return key in self._locations
+
+    def schedule(self, key, timestamp):
+        """
+        Schedules a timer, replacing the one scheduled with the same key before.
+        :param key: identifier of the timer
+        :param timestamp: moment the timer expires at, in seconds
+        """
+        self.cancel(key)
+        self._place(key, int(timestamp))
+
+    def cancel(self, key):
+        """
+        Cancels a timer if it is scheduled.
+        :param key: identifier of the timer
+        """
+        bucket = self._locations.pop(key, None)
+        if bucket is not None:
+            del bucket[key]
+
+    def advance(self, now):
+        """
+        Turns the wheel up to the given moment.
+        :param now: current timestamp in seconds
+        :return: list of (key, timestamp) pairs of the expired timers
+        """
+        expired = []
+        while self.current < int(now):
+            self.current += 1
+            for level in range(len(self.sizes) - 1, 0, -1):
+                if self.current % self.spans[level] == 0:
+                    self._cascade(self._slots[level], (self.current // self.spans[level]) % self.sizes[level])
+            if self.current % (self.spans[-1] * self.sizes[-1]) == 0:
+                overflow, self._overflow = self._overflow, {}
+                for key, timestamp in overflow.items():
+                    self._place(key, timestamp)
+
+            expired.extend(self._pop(self._slots[0], self.current % self.sizes[0]).items())
+
+        expired.extend(self._expired.items())
+        for key in self._expired:
+            del self._locations[key]
+        self._expired = {}
+        return expired
+
+    def _place(self, key, timestamp):
+        if timestamp <= self.current:
+            bucket = self._expired
+        else:
+            for size, span, slots in zip(self.sizes, self.spans, self._slots):
+                if timestamp // span - self.current // span < size:
+                    bucket = slots[(timestamp // span) % size]
+                    break
+            else:
+                bucket = self._overflow
+        bucket[key] = timestamp
+        self._locations[key] = bucket
+
+    def _pop(self, slots, slot):
+        bucket, slots[slot] = slots[slot], {}
+        for key in bucket:
+            del self._locations[key]
+        return bucket
+
+    def _cascade(self, slots, slot):
+        for key, timestamp in self._pop(slots, slot).items():
+            self._place(key, timestamp)
+
+
+class WheelScheduler:
+    """
+    Long-running scheduler enqueueing reminders of habits at the second they are due.
+
+    On startup the next occurrence of every habit is loaded into a TimingWheel. Afterwards the scheduler
+    listens to `NOTIFICATION_SCHEDULER_CHANNEL`, where habit changes and the reminder times advanced after every
+    send are published, and turns the wheel every second. A habit leaves the wheel when it is enqueued, so every
+    `NOTIFICATION_SCHEDULER_SWEEP_INTERVAL` seconds the habits left overdue in the database, e.g. by a lost task
+    or publish, or by a change made without publishing it, are scheduled again.
+
+    Attributes:
+        enqueue (callable): Called with a list of due habit ids and the ISO formatted moment they are due before.
+        wheel (TimingWheel): Upcoming occurrences of habits keyed by habit id.
+    """
+
+    def __init__(self, enqueue, clock=time.time):
+        self.enqueue = enqueue
+        self.clock = clock
+        self.wheel = TimingWheel(clock())
+        self.swept_at = clock()
+
+    def load(self):
+        """
+        Loads the next occurrence of every scheduled habit into the wheel.
+        """
+        habits = Habit.objects.filter(next_fire_at__isnull=False).values_list('pk', 'next_fire_at')
+        for pk, next_fire_at in habits.iterator(chunk_size=settings.NOTIFICATION_BATCH_SIZE):
+            self.wheel.schedule(pk, next_fire_at.timestamp())
+        logger.info('Loaded %s habits into the timing wheel', len(self.wheel))
+
+    def apply_changes(self, payload):
+        """
+        Applies schedule changes published by `publish_schedule_changes`.
+        :param payload: JSON list of [habit id, ISO formatted next reminder time or null] pairs
+        """
+        for pk, next_fire_at in json.loads(payload):
+            if next_fire_at is None:
+                self.wheel.cancel(pk)
+            else:
+                self.wheel.schedule(pk, datetime.fromisoformat(next_fire_at).timestamp())
+
+    def sweep(self):
+        """
+        Schedules again the habits overdue for longer than `NOTIFICATION_SCHEDULER_SWEEP_INTERVAL`, so they expire
+        on the next turn of the wheel.
+        :return: number of habits scheduled again
+        """
+        self.swept_at = self.clock()
+        overdue_before = datetime.fromtimestamp(
+            self.swept_at - settings.NOTIFICATION_SCHEDULER_SWEEP_INTERVAL, dt_timezone.utc
+        )
+        habits = Habit.objects.filter(next_fire_at__lt=overdue_before).values_list('pk', 'next_fire_at')
+        count = 0
+        for pk, next_fire_at in habits.iterator(chunk_size=settings.NOTIFICATION_BATCH_SIZE):
+            self.wheel.schedule(pk, next_fire_at.timestamp())
+            count += 1
+        if count:
+            logger.warning('Scheduled %s overdue habits again', count)
+        return count
+
+    def tick(self):
+        """
+        Turns the wheel to the current second and enqueues the reminders of the expired habits, sweeping the
+        database for overdue habits first when the sweep interval has passed.
+        :return: number of habits enqueued
+        """
+        if self.clock() - self.swept_at >= settings.NOTIFICATION_SCHEDULER_SWEEP_INTERVAL:
+            self.sweep()
+        habit_ids = [pk for pk, timestamp in self.wheel.advance(self.clock())]
+        due_before = datetime.fromtimestamp(self.wheel.current + 1, dt_timezone.utc).isoformat()
+        chunk_size = settings.NOTIFICATION_CHUNK_SIZE
+        for start in range(0, len(habit_ids), chunk_size):
+            self.enqueue(habit_ids[start:start + chunk_size], due_before)
+        return len(habit_ids)
+
+    def run(self):
+        """
+        Runs the scheduler until the process is stopped.
+        """
+        pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(settings.NOTIFICATION_SCHEDULER_CHANNEL)
+        self.load()
+
+        while True:
+            message = pubsub.get_message(timeout=max(0.0, self.wheel.current + 1 - self.clock()))
+            while message is not None:
+                self.apply_changes(message['data'])
+                message = pubsub.get_message()
+            self.tick()
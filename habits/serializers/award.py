@@ -2,10 +2,11 @@ from rest_framework import serializers
 from rest_framework.relations import SlugRelatedField
 
 from habits.models import Award
+from habits.serializers.sparse import SparseFieldsSerializerMixin
 from users.models import User
 
 
-class AwardSerializer(serializers.ModelSerializer):
+class AwardSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer to convert Award model instances into Python data types and vice versa.
 
@@ -14,6 +15,8 @@ class AwardSerializer(serializers.ModelSerializer):
         - user: SlugRelatedField to represent the associated User by email.
         - reward: The reward associated with the Award.
 
+    Only the fields given in the `fields` context are kept, if it is set.
+
     Attributes:
         user: SlugRelatedField linked to the 'email' field of the User model, allowing retrieval and
               representation of User objects through email.
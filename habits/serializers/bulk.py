@@ -0,0 +1,68 @@
+from rest_framework import serializers
+from rest_framework.validators import UniqueTogetherValidator
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField resolving primary keys from objects prefetched for a bulk request.
+
+    The prefetched objects are given in the `prefetched` serializer context as a dict mapping models to the
+    result of `in_bulk()`. Without them the field looks the object up in the database as usual.
+    """
+
+    def to_internal_value(self, data):
+        """
+        Returns the prefetched object with the given primary key.
+        """
+        prefetched = self.context.get('prefetched', {}).get(self.queryset.model)
+        if prefetched is None or isinstance(data, bool):
+            return super().to_internal_value(data)
+
+        try:
+            return prefetched[int(data)]
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+
+class PrefetchedUniqueTogetherValidator(UniqueTogetherValidator):
+    """
+    UniqueTogetherValidator checking the values against rows prefetched for a bulk request.
+
+    The prefetched rows are given in the `unique_together` serializer context as a dict mapping the tuple of
+    validated fields to a dict of {values: primary key}. The values of every validated item are added to it,
+    so duplicates inside a single request are rejected as well. Without them the database is queried as usual.
+    """
+
+    def __call__(self, attrs, serializer):
+        taken = serializer.context.get('unique_together', {}).get(tuple(self.fields))
+        if taken is None:
+            return super().__call__(attrs, serializer)
+
+        self.enforce_required_fields(attrs, serializer)
+        sources = [serializer.fields[field_name].source for field_name in self.fields]
+        if None in [attrs[source] for source in sources if source in attrs]:
+            return
+
+        instance = serializer.instance
+        values = tuple(
+            getattr(attrs[source], 'pk', attrs[source]) if source in attrs else self.get_column_value(instance, source)
+            for source in sources
+        )
+        owner = taken.get(values)
+        if owner is not None and (instance is None or owner != instance.pk):
+            raise serializers.ValidationError(self.message.format(field_names=', '.join(self.fields)), code='unique')
+
+        if instance is not None:
+            previous_values = tuple(self.get_column_value(instance, source) for source in sources)
+            if taken.get(previous_values) == instance.pk:
+                del taken[previous_values]
+        taken[values] = instance.pk if instance is not None else object()
+
+    @staticmethod
+    def get_column_value(instance, source):
+        """
+        Returns the stored value of a field, the primary key for relations, without fetching related objects.
+        """
+        return getattr(instance, instance._meta.get_field(source).attname)
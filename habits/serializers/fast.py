@@ -0,0 +1,103 @@
+"""
+Fast read-only serializers
+
+Build the representation of HabitSerializer and AwardSerializer directly from `.values()` rows, skipping the
+field binding and per-field dispatch of ModelSerializer.
+"""
+
+from django.utils import timezone
+
+
+def datetime_converter(tz):
+    """
+    Builds a converter formatting datetimes like DateTimeField of DRF in the given time zone.
+    """
+    def convert(value):
+        if value is None:
+            return None
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+class ValuesSerializer:
+    """
+    Read-only serializer turning `.values()` rows into the representation of a ModelSerializer.
+
+    Attributes:
+        fields (tuple): Triples of (name in the representation, lookup of `.values()`, converter factory or None),
+            in the order of the fields of the ModelSerializer. A converter factory is called with the current time
+            zone once per serialization and returns the function converting a value.
+    """
+
+    fields = ()
+
+    @classmethod
+    def get_fields(cls, names=None):
+        """
+        Returns the triples of the fields with the given names, all fields if no names are given.
+        """
+        if names is None:
+            return cls.fields
+        return tuple(field for field in cls.fields if field[0] in names)
+
+    @classmethod
+    def get_lookups(cls, names=None):
+        """
+        Returns the lookups to pass to `.values()` for the fields with the given names, all fields by default.
+        """
+        return [lookup for name, lookup, converter in cls.get_fields(names)]
+
+    @classmethod
+    def serialize(cls, rows, names=None):
+        """
+        Converts `.values()` rows into the representation of the ModelSerializer.
+
+        Args:
+            rows (iterable): Dicts returned by a `.values(*get_lookups(names))` queryset.
+            names (iterable): Names of the fields to include, all fields if None.
+
+        Returns:
+            list: Representation of every row.
+        """
+        tz = timezone.get_current_timezone()
+        fields = [(name, lookup, converter and converter(tz)) for name, lookup, converter in cls.get_fields(names)]
+        return [
+            {name: convert(row[lookup]) if convert else row[lookup] for name, lookup, convert in fields}
+            for row in rows
+        ]
+
+
+class FastHabitSerializer(ValuesSerializer):
+    """
+    Read-only equivalent of HabitSerializer.
+    """
+
+    fields = (
+        ('pk', 'pk', None),
+        ('user', 'user__email', None),
+        ('award', 'award', None),
+        ('place', 'place', None),
+        ('execution_time', 'execution_time', datetime_converter),
+        ('action', 'action', None),
+        ('is_pleasant', 'is_pleasant', None),
+        ('related_habit', 'related_habit', None),
+        ('frequency', 'frequency', None),
+        ('time_to_complete', 'time_to_complete', None),
+        ('is_public', 'is_public', None),
+        ('telegram_id', 'user__telegram_id', None),
+    )
+
+
+class FastAwardSerializer(ValuesSerializer):
+    """
+    Read-only equivalent of AwardSerializer.
+    """
+
+    fields = (
+        ('pk', 'pk', None),
+        ('user', 'user__email', None),
+        ('reward', 'reward', None),
+    )
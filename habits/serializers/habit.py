@@ -1,20 +1,21 @@
 from rest_framework import serializers
 from rest_framework.relations import SlugRelatedField
-from rest_framework.validators import UniqueTogetherValidator
 
 from habits import validators
-from habits.models import Habit
+from habits.models import Award, Habit
+from habits.serializers.bulk import PrefetchedPrimaryKeyRelatedField, PrefetchedUniqueTogetherValidator
+from habits.serializers.sparse import SparseFieldsSerializerMixin
 from users.models import User
 
 
-class HabitSerializer(serializers.ModelSerializer):
+class HabitSerializer(SparseFieldsSerializerMixin, serializers.ModelSerializer):
     """
     Serializer to convert Habit model instances into Python data types and vice versa.
 
     Serializer Fields:
         - pk: Primary key of the Habit.
         - user: SlugRelatedField to represent the associated User by email.
-        - award: The Award associated with the Habit.
+        - award: PrimaryKeyRelatedField linked to the Award associated with the Habit.
         - place: The place where the Habit is to be executed.
         - execution_time: Date and time when the Habit is scheduled for execution.
         - action: The action related to the Habit.
@@ -25,10 +26,14 @@ class HabitSerializer(serializers.ModelSerializer):
         - is_public: Boolean indicating if the Habit is public or not.
         - telegram_id: SerializerMethodField to retrieve the telegram_id of the associated User.
 
+    Only the fields given in the `fields` context are kept, if it is set.
+
     Attributes:
         time_to_complete: IntegerField with a custom validator for time_to_complete.
         frequency: IntegerField with a custom validator for frequency.
-        related_habit: PrimaryKeyRelatedField linked to Habit objects with custom validators.
+        award: PrimaryKeyRelatedField linked to Award objects, resolved from prefetched awards in bulk requests.
+        related_habit: PrimaryKeyRelatedField linked to Habit objects with custom validators, resolved from
+            prefetched habits in bulk requests.
         user: SlugRelatedField linked to the 'email' field of the User model for retrieval and representation.
         telegram_id: SerializerMethodField to retrieve the telegram_id of the User associated with the Habit.
     """
@@ -36,7 +41,8 @@ class HabitSerializer(serializers.ModelSerializer):
     time_to_complete = serializers.IntegerField(validators=[validators.time_to_complete_validator])
     frequency = serializers.IntegerField(validators=[validators.frequency_validator])
 
-    related_habit = serializers.PrimaryKeyRelatedField(
+    award = PrefetchedPrimaryKeyRelatedField(queryset=Award.objects.all(), allow_null=True, required=False)
+    related_habit = PrefetchedPrimaryKeyRelatedField(
         queryset=Habit.objects.all(),
         validators=[validators.related_habit_validator],
         allow_null=True,
@@ -57,7 +63,7 @@ class HabitSerializer(serializers.ModelSerializer):
         )
 
         validators = [
-            UniqueTogetherValidator(
+            PrefetchedUniqueTogetherValidator(
                 queryset=Habit.objects.all(),
                 fields=['award', 'is_pleasant'],
             ),
@@ -0,0 +1,17 @@
+class SparseFieldsSerializerMixin:
+    """
+    ModelSerializer mixin keeping only the fields named in the `fields` serializer context.
+
+    The context is set by the views using SparseFieldsMixin for the `fields` query parameter. Without it the
+    serializer has all of its fields.
+    """
+
+    def get_fields(self):
+        """
+        Returns the requested fields, in the order of `Meta.fields`.
+        """
+        fields = super().get_fields()
+        names = self.context.get('fields')
+        if names is None:
+            return fields
+        return {name: field for name, field in fields.items() if name in names}
@@ -1,7 +1,21 @@
+import logging
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Optional
+
 import requests
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
 
 from config import settings
 
+logger = logging.getLogger(__name__)
+
 
 class TelegramNotificationBot:
     """
@@ -10,28 +24,318 @@ class TelegramNotificationBot:
     Attributes:
         URL (str): The base URL for Telegram API.
         TOKEN (str): The authentication token for the Telegram bot.
+        TIMEOUT (tuple): Number of seconds to wait for a connection to and a response from the Telegram API.
 
     Methods:
+        get_session(cls) -> requests.Session: Returns the HTTP session shared by all sends of the process.
+        post_message(cls, text, chat_id) -> requests.Response: Sends a message and returns the API response.
         send_telegram_message(cls, text, chat_id) -> None: Sends a message via Telegram.
     """
 
-    URL = 'https://api.telegram.org/bot'
+    URL = settings.TELEGRAM_URL
     TOKEN = settings.TELEGRAM_TOKEN
+    TIMEOUT = (settings.TELEGRAM_CONNECT_TIMEOUT, settings.TELEGRAM_READ_TIMEOUT)
+
+    _session = None
+    _session_lock = threading.Lock()
 
     @classmethod
-    def send_telegram_message(cls, text, chat_id) -> None:
+    def get_session(cls) -> requests.Session:
         """
-        Sends a message using the Telegram Bot API.
+        Returns a persistent HTTP session, so that consecutive sends reuse pooled TLS connections.
+
+        The session is created lazily to make sure every forked worker process gets its own connection pool.
+        """
+        with cls._session_lock:
+            if cls._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=settings.TELEGRAM_DISPATCHER_WORKERS)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                cls._session = session
+        return cls._session
+
+    @classmethod
+    def post_message(cls, text, chat_id) -> requests.Response:
+        """
+        Sends a message using the Telegram Bot API over the shared session.
 
         Args:
             cls: Class object.
             text (str): The text content of the message.
             chat_id (int or str): The chat ID to which the message will be sent.
+
+        Returns:
+            requests.Response: The response of the Telegram Bot API.
         """
-        requests.post(
+        return cls.get_session().post(
             url=f'{cls.URL}{cls.TOKEN}/sendMessage',
             data={
                 'chat_id': chat_id,
                 'text': text
-            }
+            },
+            timeout=cls.TIMEOUT,
+        )
+
+    @classmethod
+    def send_telegram_message(cls, text, chat_id) -> None:
+        """
+        Sends a message using the Telegram Bot API.
+
+        Args:
+            cls: Class object.
+            text (str): The text content of the message.
+            chat_id (int or str): The chat ID to which the message will be sent.
+        """
+        cls.post_message(text, chat_id)
+
+
+@dataclass
+class SendOutcome:
+    """
+    Result of an attempt to send a single message.
+
+    Attributes:
+        status (str): DELIVERED, RETRYABLE for failures worth another attempt, or PERMANENT otherwise.
+        retry_after (float): Number of seconds Telegram asked to wait before the next attempt, if any.
+        error (str): Description of the failure.
+    """
+
+    DELIVERED = 'delivered'
+    RETRYABLE = 'retryable'
+    PERMANENT = 'permanent'
+
+    status: str
+    retry_after: Optional[float] = None
+    error: str = ''
+
+    @property
+    def is_sent(self) -> bool:
+        """
+        Whether the message was accepted by the Telegram API.
+        """
+        return self.status == self.DELIVERED
+
+
+def classify_response(response) -> SendOutcome:
+    """
+    Classifies a response of the Telegram Bot API.
+
+    Rate limiting (429) and server errors (5xx) are retryable, any other error such as a bad request (400)
+    or a bot blocked by the user (403) is permanent.
+
+    Args:
+        response (requests.Response): The response of the Telegram Bot API.
+
+    Returns:
+        SendOutcome: The result of the send.
+    """
+    if response.ok:
+        return SendOutcome(SendOutcome.DELIVERED)
+
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = {}
+    error = f'{response.status_code}: {payload.get("description", response.reason)}'
+
+    if response.status_code == 429:
+        retry_after = payload.get('parameters', {}).get('retry_after') or response.headers.get('Retry-After')
+        return SendOutcome(SendOutcome.RETRYABLE, retry_after=float(retry_after) if retry_after else None,
+                           error=error)
+    if response.status_code >= 500:
+        return SendOutcome(SendOutcome.RETRYABLE, error=error)
+    return SendOutcome(SendOutcome.PERMANENT, error=error)
+
+
+def get_retry_delay(attempts, retry_after=None) -> timedelta:
+    """
+    Calculates a jittered exponential backoff delay before the next attempt to send a message.
+
+    Args:
+        attempts (int): Number of attempts made so far.
+        retry_after (float): Number of seconds Telegram asked to wait, used as the lower bound.
+
+    Returns:
+        timedelta: Delay before the next attempt.
+    """
+    delay = min(settings.NOTIFICATION_RETRY_MAX_DELAY, settings.NOTIFICATION_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    delay = delay / 2 + random.uniform(0, delay / 2)
+    return timedelta(seconds=max(delay, retry_after or 0))
+
+
+class SharedTokenBucket:
+    """
+    A token bucket holding a single token, shared by all threads and worker processes through the cache.
+
+    A token is released every 1 / rate seconds on a grid common to all workers, and a token that is not taken
+    until the next one is released is dropped, so consecutive actions of all workers are at least 1 / rate seconds
+    apart, and an idle bucket makes the first action wait for the next release. The tokens of about a second are
+    grouped into a window whose counter is incremented with `cache.incr`, so a token is reserved atomically with a
+    single round trip and no per-token keys. Tokens released before the moment of a reservation are skipped by
+    the same counter. The workers are expected to have synchronised clocks.
+
+    Attributes:
+        key (str): Prefix of the cache keys of the windows.
+        rate (float): Number of tokens released per second.
+        window_size (int): Number of tokens of a window.
+    """
+
+    def __init__(self, key, rate):
+        self.key = key
+        self.rate = rate
+        self.window_size = max(1, math.ceil(rate))
+        self._next_window = 0
+        self._next_window_lock = threading.Lock()
+
+    def reserve(self, not_before=None) -> float:
+        """
+        Reserves the first free token released not before the given moment, nor before now.
+
+        Args:
+            not_before (float): Timestamp the token may not be released before.
+
+        Returns:
+            float: Timestamp of the token, the moment the action may be performed at.
+        """
+        not_before = max(time.time(), not_before or 0.0)
+        with self._next_window_lock:
+            window = max(self._next_window, int(not_before * self.rate / self.window_size))
+
+        while True:
+            start = window * self.window_size / self.rate
+            released = min(self.window_size, max(0, math.ceil((not_before - start) * self.rate - 1e-6)))
+            key = f'{self.key}:{window}'
+            timeout = math.ceil(max(0.0, (window + 1) * self.window_size / self.rate - time.time())) + 1
+            cache.add(key, released, timeout=timeout)
+            try:
+                token = cache.incr(key)
+                if token <= released:
+                    token = cache.incr(key, released + 1 - token)
+            except ValueError:
+                # The counter expired between adding and incrementing it
+                continue
+            if token <= self.window_size:
+                return start + (token - 1) / self.rate
+
+            window += 1
+            with self._next_window_lock:
+                self._next_window = max(self._next_window, window)
+
+
+@dataclass
+class DispatchReport:
+    """
+    Summary of a batch of messages sent by TelegramDispatcher.
+
+    Attributes:
+        sent (int): Number of messages accepted by the Telegram API.
+        failed (int): Number of messages that could not be delivered.
+        elapsed (float): Wall-clock duration of the batch in seconds.
+        latencies (list): Duration of every single API call in seconds.
+        outcomes (list): SendOutcome of every message, in the order the messages were given.
+    """
+
+    sent: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    latencies: list = field(default_factory=list)
+    outcomes: list = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        """
+        Number of messages processed per second.
+        """
+        return (self.sent + self.failed) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def average_latency(self) -> float:
+        """
+        Average duration of a single API call in seconds.
+        """
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0.0
+
+
+class TelegramDispatcher:
+    """
+    Sends batches of messages concurrently through TelegramNotificationBot.
+
+    Messages are sent by a bounded thread pool over the pooled session of TelegramNotificationBot. Every message
+    is given a send time by reserving a token of its chat, and then a token of the global bucket not released
+    before it. The buckets are shared through the cache by all dispatchers of all worker processes, so the Telegram
+    limits on the total and per-chat number of messages per second are respected however many outbox drainers run
+    in parallel. The messages are handed to the pool at their send times, so the threads never wait for a token.
+
+    Attributes:
+        workers (int): Number of threads sending messages simultaneously.
+        global_bucket (SharedTokenBucket): Token bucket of the total number of messages per second.
+        chat_rate (float): Number of messages per second allowed for a single chat.
+    """
+
+    RATE_LIMIT_KEY = 'telegram:rate_limit'
+
+    def __init__(self, workers=None, global_rate=None, chat_rate=None):
+        self.workers = workers or settings.TELEGRAM_DISPATCHER_WORKERS
+        self.global_bucket = SharedTokenBucket(
+            f'{self.RATE_LIMIT_KEY}:global', global_rate or settings.TELEGRAM_GLOBAL_RATE_LIMIT
         )
+        self.chat_rate = chat_rate or settings.TELEGRAM_CHAT_RATE_LIMIT
+        self._chat_buckets = {}
+
+    def dispatch(self, messages) -> DispatchReport:
+        """
+        Sends all messages and waits until every one of them is either delivered or failed.
+
+        Args:
+            messages (iterable): Pairs of (chat_id, text) to send.
+
+        Returns:
+            DispatchReport: Latency and throughput figures of the batch.
+        """
+        report = DispatchReport()
+        started_at = time.monotonic()
+        messages = list(messages)
+        schedule = sorted((self._reserve(chat_id), index) for index, (chat_id, text) in enumerate(messages))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [None] * len(messages)
+            for send_at, index in schedule:
+                delay = send_at - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                futures[index] = executor.submit(self._send, messages[index])
+
+            for outcome, latency in (future.result() for future in futures):
+                if outcome.is_sent:
+                    report.sent += 1
+                else:
+                    report.failed += 1
+                report.latencies.append(latency)
+                report.outcomes.append(outcome)
+
+        report.elapsed = time.monotonic() - started_at
+        logger.info(
+            'Dispatched %s messages (%s failed) in %.3f s: %.1f msg/s, average latency %.3f s',
+            report.sent, report.failed, report.elapsed, report.throughput, report.average_latency,
+        )
+        return report
+
+    def _reserve(self, chat_id) -> float:
+        if chat_id not in self._chat_buckets:
+            self._chat_buckets[chat_id] = SharedTokenBucket(f'{self.RATE_LIMIT_KEY}:chat:{chat_id}', self.chat_rate)
+        return self.global_bucket.reserve(not_before=self._chat_buckets[chat_id].reserve())
+
+    def _send(self, message):
+        chat_id, text = message
+        started_at = time.monotonic()
+        try:
+            outcome = classify_response(TelegramNotificationBot.post_message(text, chat_id))
+        except (requests.Timeout, requests.ConnectionError) as error:
+            outcome = SendOutcome(SendOutcome.RETRYABLE, error=str(error))
+        except requests.RequestException as error:
+            outcome = SendOutcome(SendOutcome.PERMANENT, error=str(error))
+
+        if not outcome.is_sent:
+            logger.warning('Failed to send a Telegram message to chat %s: %s', chat_id, outcome.error)
+        return outcome, time.monotonic() - started_at
@@ -0,0 +1,217 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from config import settings
+from habits.cache import bump_list_versions, invalidate_public_feed
+from habits.models import Award, Habit, Tombstone
+from habits.scheduler import publish_schedule_changes
+from users.models import User
+
+
+# Fields of the user shown in the representation of their habits and awards
+LISTED_USER_FIELDS = ('email', 'telegram_id')
+
+REFERENCING_FIELDS = {Award: 'award', Habit: 'related_habit'}
+TOMBSTONE_KINDS = {Award: Tombstone.AWARD, Habit: Tombstone.HABIT}
+
+_bulk_deletion = ContextVar('bulk_deletion', default=False)
+
+
+@contextmanager
+def bulk_deletion():
+    """
+    Runs a deletion of many habits or awards whose referencing habits and tombstones are handled by the caller with
+    a query for all of them, so the per-object handlers skip them.
+    """
+    token = _bulk_deletion.set(True)
+    try:
+        yield
+    finally:
+        _bulk_deletion.reset(token)
+
+
+def touch_referencing_habits(model, pks):
+    """
+    Marks the habits referencing the given habits or awards as changed for incremental sync, the deletion clears the
+    reference with a query update instead of saving them. The cached public feed is invalidated once the deletion is
+    committed if any of them is public.
+
+    Args:
+        model (type): Habit or Award.
+        pks (iterable): Primary keys of the deleted objects.
+
+    Returns:
+        set: Owner ids of the referencing habits, whose lists change by the deletion too.
+    """
+    referencing_habits = Habit.objects.filter(**{f'{REFERENCING_FIELDS[model]}__in': list(pks)})
+    rows = set(referencing_habits.values_list('user_id', 'is_public'))
+    if rows:
+        referencing_habits.update(updated_at=timezone.now())
+    if any(is_public for user_id, is_public in rows):
+        transaction.on_commit(invalidate_public_feed)
+    return {user_id for user_id, is_public in rows}
+
+
+def record_tombstones(model, owners):
+    """
+    Records the deletions of habits or awards for incremental sync with a single query.
+
+    Args:
+        model (type): Habit or Award.
+        owners (dict): Owner ids of the deleted objects by their primary keys.
+    """
+    kind = TOMBSTONE_KINDS[model]
+    Tombstone.objects.bulk_create(
+        Tombstone(user_id=user_id, kind=kind, object_id=pk) for pk, user_id in owners.items()
+    )
+
+
+@receiver(pre_save, sender=User)
+def remember_previous_values(sender, instance, update_fields=None, **kwargs):
+    """
+    Remembers the time zone and the listed fields the user had before saving, so that changes of them can be detected.
+    """
+    instance._previous_values = {}
+    names = [name for name in ('timezone', *LISTED_USER_FIELDS) if update_fields is None or name in update_fields]
+    if instance.pk and names:
+        instance._previous_values = User.objects.filter(pk=instance.pk).values(*names).first() or {}
+
+
+@receiver(post_save, sender=User)
+def rebuild_schedule_on_timezone_change(sender, instance, created, **kwargs):
+    """
+    Recalculates the reminder times of the user's habits when the user moves to another time zone.
+    """
+    previous_timezone = getattr(instance, '_previous_values', {}).get('timezone')
+    if not created and previous_timezone is not None and str(previous_timezone) != str(instance.timezone):
+        habits = Habit.objects.filter(user=instance)
+        habits.rebuild_schedule()
+        if settings.NOTIFICATION_SCHEDULER == 'wheel':
+            transaction.on_commit(partial(publish_schedule_changes, habits.only('pk', 'next_fire_at')))
+
+
+@receiver(post_save, sender=Habit)
+def publish_habit_schedule(sender, instance, **kwargs):
+    """
+    Passes the new reminder time of a saved habit to the timing wheel scheduler once the transaction commits.
+    """
+    if settings.NOTIFICATION_SCHEDULER == 'wheel':
+        habit = Habit(pk=instance.pk, next_fire_at=instance.next_fire_at)
+        transaction.on_commit(partial(publish_schedule_changes, [habit]))
+
+
+@receiver(post_delete, sender=Habit)
+def unpublish_habit_schedule(sender, instance, **kwargs):
+    """
+    Removes a deleted habit from the timing wheel scheduler once the transaction commits.
+    """
+    if settings.NOTIFICATION_SCHEDULER == 'wheel':
+        transaction.on_commit(partial(publish_schedule_changes, [Habit(pk=instance.pk, next_fire_at=None)]))
+
+
+@receiver(pre_save, sender=Habit)
+def remember_previous_visibility(sender, instance, **kwargs):
+    """
+    Remembers whether the habit was public before saving, so that hiding it invalidates the public feed too.
+    """
+    instance._previous_is_public = False
+    if instance.pk and not instance.is_public:
+        instance._previous_is_public = bool(
+            Habit.objects.filter(pk=instance.pk).values_list('is_public', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Habit)
+def invalidate_public_feed_on_save(sender, instance, **kwargs):
+    """
+    Invalidates the cached public feed once a public habit, or a habit that has just been hidden, is committed.
+    """
+    if instance.is_public or getattr(instance, '_previous_is_public', False):
+        transaction.on_commit(invalidate_public_feed)
+
+
+@receiver(post_delete, sender=Habit)
+def invalidate_public_feed_on_delete(sender, instance, **kwargs):
+    """
+    Invalidates the cached public feed once the deletion of a public habit is committed.
+    """
+    if instance.is_public:
+        transaction.on_commit(invalidate_public_feed)
+
+
+@receiver(pre_delete, sender=Award)
+@receiver(pre_delete, sender=Habit)
+def remember_referencing_users(sender, instance, **kwargs):
+    """
+    Remembers the owners of the habits referencing the deleted object, whose lists change by the deletion too, and
+    marks the habits as changed for incremental sync.
+    """
+    if not _bulk_deletion.get():
+        instance._referencing_user_ids = touch_referencing_habits(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Award)
+@receiver(post_delete, sender=Habit)
+def record_tombstone(sender, instance, **kwargs):
+    """
+    Records the deletion of a habit or an award for incremental sync, in the transaction of the deletion.
+    """
+    if not _bulk_deletion.get():
+        record_tombstones(sender, {instance.pk: instance.user_id})
+
+
+@receiver(post_save, sender=Award)
+@receiver(post_save, sender=Habit)
+@receiver(post_delete, sender=Award)
+@receiver(post_delete, sender=Habit)
+def bump_list_versions_on_change(sender, instance, **kwargs):
+    """
+    Bumps the list versions of the owner of a changed habit or award once the change is committed.
+    """
+    user_ids = {instance.user_id, *getattr(instance, '_referencing_user_ids', ())}
+    transaction.on_commit(partial(bump_list_versions, user_ids))
+
+
+@receiver(post_save, sender=User)
+def bump_list_versions_on_user_change(sender, instance, created, **kwargs):
+    """
+    Bumps the list versions of a user once a change of the user, shown in the lists as well, is committed.
+    """
+    if not created:
+        transaction.on_commit(partial(bump_list_versions, [instance.pk]))
+
+
+def listed_user_fields_changed(user):
+    """
+    Returns whether a field of the saved user shown in their habits and awards has changed.
+    """
+    previous_values = getattr(user, '_previous_values', {})
+    return any(name in previous_values and previous_values[name] != getattr(user, name) for name in LISTED_USER_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def invalidate_public_feed_on_user_change(sender, instance, **kwargs):
+    """
+    Invalidates the cached public feed once a change of a field shown in it is committed for a user with public
+    habits.
+    """
+    if listed_user_fields_changed(instance) and Habit.objects.filter(user=instance, is_public=True).exists():
+        transaction.on_commit(invalidate_public_feed)
+
+
+@receiver(post_save, sender=User)
+def touch_habits_and_awards_on_user_change(sender, instance, **kwargs):
+    """
+    Marks the habits and awards of a user as changed for incremental sync when a field of the user shown in them
+    changes.
+    """
+    if listed_user_fields_changed(instance):
+        now = timezone.now()
+        Habit.objects.filter(user=instance).update(updated_at=now)
+        Award.objects.filter(user=instance).update(updated_at=now)
@@ -1,45 +1,293 @@
-from datetime import timedelta
+import logging
+from datetime import datetime, timedelta
+from functools import partial
+from operator import attrgetter
 
-from celery import shared_task
+from celery import chord, group, shared_task
+from django.db import transaction
 from django.utils import timezone
 
-from habits.models import Habit
-from habits.services import TelegramNotificationBot
+from config import settings
+from config.db_router import read_from_replica
+from habits.models import Habit, NotificationDelivery, NotificationOutbox, Tombstone, get_minute_bucket
+from habits.reminders import iter_batches, iter_due_reminders, iter_reminders, render_digests, render_reminder
+from habits.scheduler import publish_schedule_changes
+from habits.services import SendOutcome, TelegramDispatcher, get_retry_delay
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_LOOKAHEAD = timedelta(minutes=1)
 
 
 @shared_task
 def task_send_notification():
     """
-    A Celery task to send notifications/reminders for habits scheduled within the next two hours.
+    A Celery task planning notifications/reminders for habits due within the next minute.
+
+    Splits the habits whose precomputed `next_fire_at` minute bucket is not later than the current minute into
+    pk-range chunks and fans them out to the workers as `task_send_notification_chunk` subtasks.
 
-    Fetches habits due for execution within the next two hours and sends a notification to the respective users
-    via TelegramNotificationBot if the habit should be executed today.
+    - Fetches primary keys of due habits with a single range query over the indexed `next_fire_at` column, from a
+      read replica if any is configured. The chunks read their habits from the primary again, so a lagging replica
+      only delays a reminder to the next run and never sends one twice.
+    - Cuts them into chunks of `NOTIFICATION_CHUNK_SIZE` habits, each described by its first and last pk.
+    - Sends the chunks as a group, or as a chord ending with `task_notification_summary`
+      when `NOTIFICATION_SUMMARY` is enabled.
 
-    - Fetches habits with execution times between current time and the next two hours.
-    - Checks if the habit should be executed today using the `should_execute_today()` method from the Habit model.
-    - Constructs a notification message with habit details and sends it to the associated Telegram user.
+    In digest mode (`NOTIFICATION_DIGEST`) the planning window is extended to `NOTIFICATION_DIGEST_WINDOW`
+    and the habits are split into user-id ranges instead, so all reminders of a user end up in the same chunk.
 
     Usage:
-    This task should be executed periodically to send timely reminders for scheduled habits.
-    """
-    current_datetime = timezone.now()
-
-    habits = Habit.objects.filter(
-        execution_time__gte=current_datetime,
-        execution_time__lte=current_datetime + timedelta(hours=2),
-        frequency__gt=0
-    )
-
-    for habit in habits:
-        if habit.should_execute_today():
-            text_to_send = (
-                f'Reminder\n'
-                f'To Do: {habit.action}\n'
-                f'At: {habit.execution_time}\n'
-                f'Place: {habit.place}\n'
-                f'Time to Complete: {habit.time_to_complete} sec.'
+    This task should be executed every minute to send timely reminders for scheduled habits. It does nothing
+    when the timing wheel scheduler (`NOTIFICATION_SCHEDULER = 'wheel'`) enqueues the reminders instead.
+
+    Returns:
+        int: Number of chunks scheduled.
+    """
+    if settings.NOTIFICATION_SCHEDULER == 'wheel':
+        return 0
+
+    if settings.NOTIFICATION_DIGEST:
+        due_before = get_minute_bucket(timezone.now()) + settings.NOTIFICATION_DIGEST_WINDOW
+        shard_field = 'user_id'
+    else:
+        due_before = get_minute_bucket(timezone.now()) + NOTIFICATION_LOOKAHEAD
+        shard_field = 'pk'
+
+    with read_from_replica():
+        shard_keys = list(
+            Habit.objects.filter(next_fire_at__lt=due_before)
+            .order_by(shard_field).values_list(shard_field, flat=True).distinct()
+        )
+    chunk_size = settings.NOTIFICATION_CHUNK_SIZE
+    subtasks = [
+        task_send_notification_chunk.s(chunk[0], chunk[-1], due_before.isoformat(), shard_field)
+        for chunk in (shard_keys[start:start + chunk_size] for start in range(0, len(shard_keys), chunk_size))
+    ]
+    if not subtasks:
+        return 0
+
+    if settings.NOTIFICATION_SUMMARY:
+        chord(subtasks)(task_notification_summary.s())
+    else:
+        group(subtasks).apply_async()
+    return len(subtasks)
+
+
+@shared_task
+def task_send_notification_chunk(first_key, last_key, due_before, shard_field='pk'):
+    """
+    A Celery task queueing reminders for the due habits of a single pk or user-id range.
+
+    Due habits are streamed from a server-side cursor and queued by `queue_reminders`.
+
+    Args:
+        first_key (int): Primary key or user id of the first habit of the chunk.
+        last_key (int): Primary key or user id of the last habit of the chunk.
+        due_before (str): ISO formatted end of the planning window.
+        shard_field (str): Field the chunk is bounded by, either 'pk' or 'user_id'.
+
+    Returns:
+        dict: Number of reminders and messages queued.
+    """
+    return queue_reminders(iter_due_reminders(
+        first_key, last_key, datetime.fromisoformat(due_before), settings.NOTIFICATION_BATCH_SIZE, shard_field
+    ))
+
+
+@shared_task
+def task_send_habit_notifications(habit_ids, due_before):
+    """
+    A Celery task queueing reminders for the given habits, enqueued by the timing wheel scheduler.
+
+    Args:
+        habit_ids (list): Primary keys of the habits due at this second.
+        due_before (str): ISO formatted moment the habits are due before.
+
+    Returns:
+        dict: Number of reminders and messages queued.
+    """
+    habits = Habit.objects.filter(pk__in=habit_ids, next_fire_at__lt=datetime.fromisoformat(due_before))
+    return queue_reminders(iter_reminders(habits.order_by('user_id', 'pk'), settings.NOTIFICATION_BATCH_SIZE))
+
+
+def queue_reminders(reminders):
+    """
+    Queues notification messages for a stream of due reminders.
+
+    Reminders are handled in batches of `NOTIFICATION_BATCH_SIZE`, so the memory of the worker stays flat
+    and every batch costs a constant number of queries. Every batch is handled in a single transaction:
+
+    - Locks the habits of the batch and skips the ones whose `next_fire_at` has changed since the reminders were
+      read, e.g. by an edit of the habit or a lagging replica, so a newer reminder time is never overwritten.
+    - Records the due occurrences in the delivery ledger with a single query and skips the ones
+      that have already been queued by an overlapping or retried task.
+    - Renders a notification message with habit details for the associated Telegram user, or a single
+      digest message per user in digest mode.
+    - Inserts the messages into the notification outbox with a single bulk insert.
+    - Advances `next_fire_at` of every habit of the batch by its frequency with a single query
+      and, when the timing wheel scheduler is used, publishes the new reminder times to it.
+
+    Once messages are queued, `task_drain_notification_outbox` is started to send them.
+
+    Args:
+        reminders (iterable): Reminder records of the due occurrences.
+
+    Returns:
+        dict: Number of reminders and messages queued.
+    """
+    result = {'reminders': 0, 'queued': 0}
+
+    for batch in iter_batches(reminders, settings.NOTIFICATION_BATCH_SIZE, key=attrgetter('chat_id')):
+        with transaction.atomic():
+            current_fire_times = dict(
+                Habit.objects.filter(pk__in=[reminder.habit_id for reminder in batch])
+                .select_for_update().order_by('pk').values_list('pk', 'next_fire_at')
+            )
+            batch = [reminder for reminder in batch if current_fire_times.get(reminder.habit_id) == reminder.occurrence]
+            claimed_occurrences = NotificationDelivery.objects.claim(
+                (reminder.habit_id, reminder.occurrence) for reminder in batch
+            )
+            claimed_reminders = [
+                reminder for reminder in batch
+                if reminder.chat_id and (reminder.habit_id, reminder.occurrence) in claimed_occurrences
+            ]
+            if settings.NOTIFICATION_DIGEST:
+                messages = list(render_digests(
+                    claimed_reminders, settings.NOTIFICATION_DIGEST_MAX_ITEMS, settings.TELEGRAM_MESSAGE_LIMIT
+                ))
+            else:
+                messages = [(reminder.chat_id, render_reminder(reminder)) for reminder in claimed_reminders]
+            NotificationOutbox.objects.bulk_create(
+                [NotificationOutbox(chat_id=chat_id, text=text) for chat_id, text in messages]
             )
-            if habit.award:
-                text_to_send += f'\nYou can get {habit.award.reward} as a reward.'
 
-            TelegramNotificationBot.send_telegram_message(text_to_send, habit.user.telegram_id)
+            current_datetime = timezone.now()
+            habits = [
+                Habit(pk=reminder.habit_id, next_fire_at=reminder.get_next_occurrence(current_datetime))
+                for reminder in batch
+            ]
+            Habit.objects.bulk_update(habits, ['next_fire_at'])
+            if settings.NOTIFICATION_SCHEDULER == 'wheel':
+                transaction.on_commit(partial(publish_schedule_changes, habits))
+
+        result['reminders'] += len(claimed_reminders)
+        result['queued'] += len(messages)
+
+    if result['queued']:
+        task_drain_notification_outbox.delay()
+    return result
+
+
+@shared_task
+def task_drain_notification_outbox():
+    """
+    A Celery task sending the messages of the notification outbox.
+
+    Claims batches of `NOTIFICATION_OUTBOX_BATCH_SIZE` messages with `SELECT ... FOR UPDATE SKIP LOCKED`,
+    sends them through TelegramDispatcher and marks them in bulk until no message is ready to be sent.
+    Any number of drainers may run in parallel, each of them gets its own messages.
+
+    Failed sends never block the drainer:
+
+    - Retryable failures (429, 5xx, timeouts) are returned to the outbox with a jittered exponential backoff,
+      honouring `retry_after` of the Telegram API.
+    - Permanent failures (e.g. 400, or 403 for a blocked bot) and messages that failed
+      `NOTIFICATION_MAX_ATTEMPTS` times are moved to the dead-letter status.
+
+    Returns:
+        dict: Number of sent and failed messages and the time spent on sending them.
+    """
+    dispatcher = TelegramDispatcher()
+    result = {'sent': 0, 'failed': 0, 'elapsed': 0.0}
+
+    while rows := NotificationOutbox.objects.claim(
+            settings.NOTIFICATION_OUTBOX_BATCH_SIZE, settings.NOTIFICATION_OUTBOX_LEASE
+    ):
+        report = dispatcher.dispatch([(chat_id, text) for pk, chat_id, text, attempts in rows])
+
+        now = timezone.now()
+        sent_ids = []
+        failed_messages = []
+        for (pk, chat_id, text, attempts), outcome in zip(rows, report.outcomes):
+            if outcome.is_sent:
+                sent_ids.append(pk)
+                continue
+
+            message = NotificationOutbox(pk=pk, attempts=attempts + 1, last_error=outcome.error)
+            if outcome.status == SendOutcome.RETRYABLE and message.attempts < settings.NOTIFICATION_MAX_ATTEMPTS:
+                message.status = NotificationOutbox.PENDING
+                message.available_at = now + get_retry_delay(message.attempts, outcome.retry_after)
+            else:
+                message.status = NotificationOutbox.DEAD
+                message.available_at = now
+            failed_messages.append(message)
+
+        NotificationOutbox.objects.filter(pk__in=sent_ids).update(status=NotificationOutbox.SENT, sent_at=now)
+        NotificationOutbox.objects.bulk_update(failed_messages, ['status', 'attempts', 'last_error', 'available_at'])
+
+        result['sent'] += report.sent
+        result['failed'] += report.failed
+        result['elapsed'] += report.elapsed
+
+    return result
+
+
+@shared_task
+def task_notification_summary(results):
+    """
+    A Celery task summarising the chunks of a single planning run.
+
+    Args:
+        results (list): Return values of `task_send_notification_chunk` subtasks.
+
+    Returns:
+        dict: Total number of due reminders and queued messages.
+    """
+    summary = {
+        'chunks': len(results),
+        'reminders': sum(result['reminders'] for result in results),
+        'queued': sum(result['queued'] for result in results),
+    }
+    logger.info('Reminders planned: %(reminders)s, messages queued: %(queued)s in %(chunks)s chunks', summary)
+    return summary
+
+
+@shared_task
+def task_purge_notification_deliveries():
+    """
+    A Celery task removing delivery ledger records of occurrences older than `NOTIFICATION_DELIVERY_RETENTION`.
+
+    Returns:
+        int: Number of removed records.
+    """
+    deleted, _ = NotificationDelivery.objects.filter(
+        occurrence__lt=timezone.now() - settings.NOTIFICATION_DELIVERY_RETENTION
+    ).delete()
+    return deleted
+
+
+@shared_task
+def task_purge_notification_outbox():
+    """
+    A Celery task removing sent outbox messages older than `NOTIFICATION_DELIVERY_RETENTION`.
+
+    Returns:
+        int: Number of removed messages.
+    """
+    deleted, _ = NotificationOutbox.objects.filter(
+        status=NotificationOutbox.SENT, sent_at__lt=timezone.now() - settings.NOTIFICATION_DELIVERY_RETENTION
+    ).delete()
+    return deleted
+
+
+@shared_task
+def task_purge_tombstones():
+    """
+    A Celery task removing tombstones of deletions older than `SYNC_TOMBSTONE_RETENTION`.
+
+    Returns:
+        int: Number of removed tombstones.
+    """
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=timezone.now() - settings.SYNC_TOMBSTONE_RETENTION).delete()
+    return deleted
@@ -1,16 +1,69 @@
+import csv
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs
+from zoneinfo import ZoneInfo
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from rest_framework import status
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-from habits.models import Habit, Award
+from config import celery_app, settings
+from config.db_router import ReplicaRouter, read_from_replica, routing_scope
+from config.testing import LOCMEM_CACHES, LocalAPITestCase
+from habits.cache import get_or_build_public_feed_page, invalidate_public_feed
+from habits.models import Habit, Award, NotificationDelivery, NotificationOutbox, Tombstone, get_next_occurrence
+from habits.renderers import FastJSONRenderer
+from habits.reminders import Reminder, iter_due_reminders, render_digests
+from habits.scheduler import TimingWheel, WheelScheduler
+from habits.services import (
+    DispatchReport, SendOutcome, SharedTokenBucket, TelegramDispatcher, TelegramNotificationBot,
+)
+from habits.tasks import (
+    queue_reminders, task_drain_notification_outbox, task_purge_tombstones, task_send_habit_notifications,
+    task_send_notification, task_send_notification_chunk,
+)
 from users.models import User
 
 
-class HabitTestCase(APITestCase):
+def create_habit(user, **overrides):
+    """
+    Creates a daily habit of the user with the usual test values, replaced by the given ones.
+    """
+    return Habit.objects.create(**{
+        'place': 'test_place',
+        'execution_time': '2024-01-06T23:18:47+03:00',
+        'action': 'run_in_gym',
+        'frequency': 1,
+        'time_to_complete': 100,
+        **overrides,
+        'user': user,
+    })
+
+
+class HabitTestCase(LocalAPITestCase):
 
     def setUp(self):
         """
         Set up the test environment by creating a test user, a test client, and a sample Habit object.
         """
+        cache.clear()
         existing_user = User.objects.filter(email='test@gmail.com').first()
 
         if existing_user:
@@ -24,17 +77,7 @@ class HabitTestCase(APITestCase):
         self.client = APIClient()
         self.client.force_authenticate(user=self.user)
 
-        self.habit = Habit.objects.create(
-            user=self.user,
-            place="test_place",
-            execution_time="2024-01-06T23:18:47+03:00",
-            action="run_in_gym",
-            is_pleasant=False,
-            related_habit=None,
-            frequency=1,
-            time_to_complete=100,
-            is_public=False
-        )
+        self.habit = create_habit(self.user)
 
     def test_habit_create(self):
         """
@@ -144,10 +187,1177 @@ class HabitTestCase(APITestCase):
             status.HTTP_204_NO_CONTENT
         )
 
+    def test_habit_public_list_cursor_pagination(self):
+        """
+        Test that the public habit list is paginated by cursors in execution time order without a count query.
+        """
+        habits = [
+            create_habit(self.user, execution_time=f"2024-01-0{day}T08:00:00+03:00", is_public=True)
+            for day in (5, 3, 1, 4, 2)
+        ]
+
+        url = '/habit/list/public/?pagination=cursor&page_size=3'
+        pages = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.json())
+            self.assertFalse([query for query in queries if 'COUNT(' in query['sql']])
+            pages.append([habit['pk'] for habit in response.json()['results']])
+            url = response.json()['next']
+
+        self.assertEqual(pages, [
+            [habits[2].pk, habits[4].pk, habits[1].pk],
+            [habits[3].pk, habits[0].pk],
+        ])
+
+        response = self.client.get('/habit/list/public/?page=2&page_size=3')
+        self.assertEqual(response.json()['count'], 5)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_cursor_pages_seek_past_equal_execution_times(self):
+        """
+        Test that habits sharing an execution time are paged by their primary key in both directions, without an
+        offset.
+        """
+        habits = [create_habit(self.user, execution_time="2024-01-05T08:00:00+03:00") for _ in range(5)]
+        habits.append(self.habit)
+
+        url = '/habit/list/?pagination=cursor&page_size=2'
+        pages = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertFalse([query for query in queries if 'OFFSET' in query['sql']])
+            pages.append([habit['pk'] for habit in response.json()['results']])
+            previous, url = response.json()['previous'], response.json()['next']
+        self.assertEqual(pages, [[habit.pk for habit in habits[start:start + 2]] for start in (0, 2, 4)])
+
+        self.assertEqual([habit['pk'] for habit in self.client.get(previous).json()['results']], pages[1])
+        response = self.client.get('/habit/list/?cursor=bogus')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_owner_cursor_pages_seek_the_owner_index(self):
+        """
+        Test that a later keyset page of a user's habits is read from the (user, execution_time, id) index in order,
+        without a sort.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        now = timezone.now()
+        after_position = Q(execution_time__gt=now) | Q(execution_time=now, pk__gt=self.habit.pk)
+        plan = (
+            Habit.objects.filter(after_position, user=self.user)
+            .order_by('execution_time', 'pk')[:3].explain()
+        )
+        self.assertIn('habit_user_exec_time_pk_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+
+class PublicFeedCacheTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up an empty cache and a user with a public habit.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='feed@gmail.com', password='test')
+        self.habit = self.create_habit(is_public=True)
+
+    def create_habit(self, is_public):
+        with self.captureOnCommitCallbacks(execute=True):
+            return create_habit(self.user, is_public=is_public)
+
+    def get_feed_count(self):
+        response = self.client.get('/habit/list/public/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['count']
+
+    def test_public_feed_is_cached_until_a_public_habit_changes(self):
+        """
+        Test that feed pages are served from the cache and invalidated only by changes of public habits.
+        """
+        self.assertEqual(self.get_feed_count(), 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_feed_count(), 1)
+
+        private_habit = self.create_habit(is_public=False)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_feed_count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            private_habit.is_public = True
+            private_habit.save()
+        self.assertEqual(self.get_feed_count(), 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.is_public = False
+            self.habit.save()
+        self.assertEqual(self.get_feed_count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            private_habit.delete()
+        self.assertEqual(self.get_feed_count(), 0)
+
+    def test_public_feed_is_invalidated_by_changes_shown_in_it(self):
+        """
+        Test that deleting an award or a pleasant habit referenced by a public habit, alone or in bulk, and changing
+        a shown field of its owner invalidate the cached public feed.
+        """
+        award = Award.objects.create(user=self.user, reward='reward')
+        pleasant_habit = create_habit(self.user, action='take_a_bath', is_pleasant=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.filter(pk=self.habit.pk).update(award=award)
+            invalidate_public_feed()
+        self.assertEqual(self.client.get('/habit/list/public/').json()['results'][0]['award'], award.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            award.delete()
+        self.assertIsNone(self.client.get('/habit/list/public/').json()['results'][0]['award'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Habit.objects.filter(pk=self.habit.pk).update(related_habit=pleasant_habit)
+            invalidate_public_feed()
+        results = self.client.get('/habit/list/public/').json()['results']
+        self.assertEqual(results[0]['related_habit'], pleasant_habit.pk)
+
+        self.client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete('/habit/bulk/', [pleasant_habit.pk], format='json')
+        self.assertEqual(response.json(), [{'status': status.HTTP_204_NO_CONTENT, 'pk': pleasant_habit.pk}])
+        self.assertIsNone(self.client.get('/habit/list/public/').json()['results'][0]['related_habit'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.telegram_id = 42
+            self.user.save()
+        self.assertEqual(self.client.get('/habit/list/public/').json()['results'][0]['telegram_id'], 42)
+
+    def get_pages_concurrently(self, build, count=5):
+        pages = []
+        threads = [
+            threading.Thread(target=lambda: pages.append(get_or_build_public_feed_page('feed-page', build)))
+            for _ in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return pages
+
+    @mock.patch('config.settings.PUBLIC_FEED_CACHE_LOCK_WAIT', 1)
+    def test_concurrent_misses_are_collapsed(self):
+        """
+        Test that a page missing from the cache is built once for concurrent requests.
+        """
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return {'results': []}
+
+        self.assertEqual(self.get_pages_concurrently(build), [{'results': []}] * 5)
+        self.assertEqual(len(builds), 1)
+
+    @mock.patch('config.settings.PUBLIC_FEED_CACHE_LOCK_WAIT', 0.05)
+    def test_slow_builds_are_polled_for(self):
+        """
+        Test that requests finding no page poll the cache until a slow build finishes instead of building it too.
+        """
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.3)
+            return {'results': []}
+
+        self.assertEqual(self.get_pages_concurrently(build), [{'results': []}] * 5)
+        self.assertEqual(len(builds), 1)
+
+    def test_expired_page_is_served_while_rebuilt(self):
+        """
+        Test that an expired page is rebuilt by a single request while the others get the expired page.
+        """
+        with mock.patch('config.settings.PUBLIC_FEED_CACHE_TIMEOUT', 0):
+            get_or_build_public_feed_page('feed-page', lambda: {'results': ['old']})
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return {'results': ['new']}
+
+        pages = self.get_pages_concurrently(build)
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(sorted(page['results'][0] for page in pages), ['new'] + ['old'] * 4)
+
+    def test_stale_page_is_served_while_rebuilt(self):
+        """
+        Test that the page of the previous generation is served without waiting while one request rebuilds it.
+        """
+        get_or_build_public_feed_page('feed-page', lambda: {'results': ['old']})
+        invalidate_public_feed()
+        builds = []
+
+        def build():
+            builds.append(1)
+            time.sleep(0.2)
+            return {'results': ['new']}
+
+        started_at = time.monotonic()
+        pages = self.get_pages_concurrently(build)
+        self.assertEqual(len(builds), 1)
+        self.assertEqual(sorted(page['results'][0] for page in pages), ['new'] + ['old'] * 4)
+        self.assertLess(time.monotonic() - started_at, 0.4)
+        self.assertEqual(get_or_build_public_feed_page('feed-page', build), {'results': ['new']})
+        self.assertEqual(len(builds), 1)
+
+
+class QueryBudgetMixin:
+    """
+    Mixin failing a test when an API request runs more queries than its declared budget.
+    """
+
+    def assertQueryBudget(self, budget, method, url, data=None, expected_status=status.HTTP_200_OK):
+        """
+        Sends a request and asserts its status and that it ran at most `budget` queries.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertEqual(response.status_code, expected_status, response.content)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{method.upper()} {url} ran {len(queries)} queries, its budget is {budget}:\n'
+            + '\n'.join(query['sql'] for query in queries)
+        )
+        return response
+
+
+class QueryBudgetTestCase(QueryBudgetMixin, LocalAPITestCase):
+    """
+    Query budgets of the habit and award endpoints, which must not depend on the number of rows.
+    """
+
+    LIST_QUERY_BUDGETS = {
+        '/habit/list/?page_size=10': 2,
+        '/habit/list/?pagination=cursor&page_size=10': 1,
+        '/habit/list/public/?page_size=10': 2,
+        '/habit/list/public/?pagination=cursor&page_size=10': 1,
+        '/award/list/': 1,
+    }
+
+    def setUp(self):
+        """
+        Set up a superuser with a Telegram account and an empty cache.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='budget@gmail.com', password='test', telegram_id=42, is_superuser=True)
+        self.client.force_authenticate(user=self.user)
+
+    def create_habits(self, count):
+        for number in range(count):
+            award = Award.objects.create(user=self.user, reward=f'reward_{number}')
+            create_habit(self.user, award=award, action=f"action_{number}", is_public=True)
+
+    def test_list_endpoints_stay_within_budget(self):
+        """
+        Test that a page of every list endpoint costs the same number of queries for one and for many rows.
+        """
+        for count in (1, 9):
+            self.create_habits(count)
+            cache.clear()
+            for url, budget in self.LIST_QUERY_BUDGETS.items():
+                with self.subTest(url=url, habits=count):
+                    self.assertQueryBudget(budget, 'get', url)
+
+    def test_detail_endpoints_stay_within_budget(self):
+        """
+        Test that creating, updating and deleting a habit stays within its query budget.
+        """
+        response = self.assertQueryBudget(1, 'post', '/habit/create/', {
+            'place': 'test_place',
+            'execution_time': '2024-01-06T23:18:47+03:00',
+            'action': 'run_in_gym',
+            'award': None,
+            'is_pleasant': False,
+            'frequency': 1,
+            'time_to_complete': 100,
+        }, expected_status=status.HTTP_201_CREATED)
+        pk = response.json()['pk']
+
+        self.assertQueryBudget(3, 'patch', f'/habit/update/{pk}/', {'place': 'new_place'})
+        self.assertQueryBudget(6, 'delete', f'/habit/delete/{pk}/', expected_status=status.HTTP_204_NO_CONTENT)
+
+
+class OwnershipScopeTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up a habit and an award of another user.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='owner@gmail.com', password='test')
+        self.other = User.objects.create(email='other@gmail.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.award = Award.objects.create(user=self.other, reward='foreign_reward')
+        self.habit = create_habit(self.other)
+
+    def test_objects_of_other_users_are_not_found(self):
+        """
+        Test that habits and awards of other users can be neither updated nor deleted.
+        """
+        for method, url, data in (
+                ('patch', f'/habit/update/{self.habit.pk}/', {'place': 'new_place'}),
+                ('delete', f'/habit/delete/{self.habit.pk}/', None),
+                ('patch', f'/award/update/{self.award.pk}/', {'reward': 'new_reward'}),
+                ('delete', f'/award/delete/{self.award.pk}/', None),
+        ):
+            with self.subTest(method=method, url=url):
+                response = getattr(self.client, method)(url, data)
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        self.habit.refresh_from_db()
+        self.award.refresh_from_db()
+        self.assertEqual(self.habit.place, 'test_place')
+        self.assertEqual(self.award.reward, 'foreign_reward')
+
+    def test_lookup_is_scoped_to_the_owner(self):
+        """
+        Test that the object is looked up by its primary key and owner with a single query.
+        """
+        self.habit.user = self.user
+        self.habit.save()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(f'/habit/update/{self.habit.pk}/', {'place': 'new_place'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('"user_id" = %s' % self.user.pk, queries.captured_queries[0]['sql'])
+
+    def test_superuser_is_not_scoped(self):
+        """
+        Test that a superuser can update and delete objects of other users.
+        """
+        self.user.is_superuser = True
+        self.user.save()
+
+        response = self.client.patch(f'/award/update/{self.award.pk}/', {'reward': 'new_reward'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.delete(f'/habit/delete/{self.habit.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Habit.objects.filter(pk=self.habit.pk).exists())
+
+
+class BulkAPITestCase(QueryBudgetMixin, LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up a user with two awards and a pleasant habit.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='bulk@gmail.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.awards = [Award.objects.create(user=self.user, reward=f'reward_{number}') for number in range(2)]
+        self.pleasant_habit = create_habit(self.user, action="take_a_bath", is_pleasant=True)
+
+    def get_habit_data(self, **kwargs):
+        return {
+            'place': 'test_place',
+            'execution_time': '2024-01-06T23:18:47+03:00',
+            'action': 'run_in_gym',
+            'award': None,
+            'is_pleasant': False,
+            'frequency': 1,
+            'time_to_complete': 100,
+            **kwargs,
+        }
+
+    def test_bulk_create_validates_items_together(self):
+        """
+        Test that valid habits are created with a constant number of queries and invalid ones are reported.
+        """
+        items = [self.get_habit_data(related_habit=self.pleasant_habit.pk) for _ in range(20)] + [
+            self.get_habit_data(award=self.awards[0].pk),
+            self.get_habit_data(award=self.awards[0].pk),
+            self.get_habit_data(time_to_complete=500),
+            self.get_habit_data(award=999),
+        ]
+        response = self.assertQueryBudget(6, 'post', '/habit/bulk/', items)
+
+        statuses = [result['status'] for result in response.json()]
+        self.assertEqual(statuses, [201] * 21 + [400] * 3)
+        self.assertEqual(Habit.objects.filter(user=self.user, is_pleasant=False).count(), 21)
+        self.assertFalse(Habit.objects.filter(next_fire_at__isnull=True).exists())
+        self.assertEqual(response.json()[0]['data']['related_habit'], self.pleasant_habit.pk)
+
+    def test_bulk_update_and_delete(self):
+        """
+        Test that habits are updated and deleted in bulk with a result for every item.
+        """
+        habits = [
+            create_habit(self.user, **self.get_habit_data(award=None, is_public=True))
+            for _ in range(3)
+        ]
+        self.client.get('/habit/list/public/')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.assertQueryBudget(7, 'patch', '/habit/bulk/', [
+                {'pk': habits[0].pk, 'place': 'new_place', 'frequency': 2},
+                {'pk': habits[1].pk, 'is_public': False, 'award': self.awards[1].pk},
+                {'pk': habits[2].pk, 'time_to_complete': 500},
+                {'pk': 999, 'place': 'new_place'},
+            ])
+        self.assertEqual([result['status'] for result in response.json()], [200, 200, 400, 404])
+        habits[0].refresh_from_db()
+        self.assertEqual((habits[0].place, habits[0].next_fire_at), ('new_place', habits[0].get_next_fire_at()))
+        self.assertEqual(self.client.get('/habit/list/public/').json()['count'], 2)
+
+        response = self.client.delete('/habit/bulk/', [habits[0].pk, 999], format='json')
+        self.assertEqual([result['status'] for result in response.json()], [204, 404])
+        self.assertFalse(Habit.objects.filter(pk=habits[0].pk).exists())
+
+    def test_bulk_update_keeps_the_schedule_of_unscheduled_changes(self):
+        """
+        Test that a bulk update of fields other than the schedule keeps the pending reminder time of a habit.
+        """
+        habit = create_habit(self.user, **self.get_habit_data(award=None))
+        overdue = timezone.now().replace(second=0, microsecond=0) - timedelta(minutes=5)
+        Habit.objects.filter(pk=habit.pk).update(next_fire_at=overdue)
+
+        response = self.client.patch('/habit/bulk/', [{'pk': habit.pk, 'place': 'new_place'}], format='json')
+        self.assertEqual(response.json()[0]['status'], 200)
+        habit.refresh_from_db()
+        self.assertEqual((habit.place, habit.next_fire_at), ('new_place', overdue))
+
+        self.client.patch('/habit/bulk/', [{'pk': habit.pk, 'frequency': 2}], format='json')
+        habit.refresh_from_db()
+        self.assertEqual(habit.next_fire_at, habit.get_next_fire_at())
+
+    def test_bulk_delete_touches_referencing_habits(self):
+        """
+        Test that deleting habits in bulk clears and touches the habits of other users referencing them.
+        """
+        stranger = User.objects.create(email='stranger@gmail.com', password='test')
+        pleasant_habits = [self.pleasant_habit, *Habit.objects.bulk_create(
+            Habit(user=self.user, **self.get_habit_data(is_pleasant=True)) for _ in range(3)
+        )]
+        referencing_habits = Habit.objects.bulk_create(
+            Habit(user=stranger, **self.get_habit_data(related_habit=habit)) for habit in pleasant_habits
+        )
+        touched_after = timezone.now()
+
+        self.client.delete('/habit/bulk/', [habit.pk for habit in pleasant_habits], format='json')
+
+        self.assertEqual(
+            list(Habit.objects.filter(pk__in=[habit.pk for habit in referencing_habits])
+                 .values_list('related_habit', flat=True).distinct()),
+            [None],
+        )
+        self.assertEqual(
+            Habit.objects.filter(user=stranger, updated_at__gt=touched_after).count(), len(referencing_habits)
+        )
+
+    def test_bulk_delete_budget_does_not_grow_with_the_items(self):
+        """
+        Test that deleting one referenced habit and many in bulk runs the same queries and records their tombstones.
+        """
+        stranger = User.objects.create(email='stranger@gmail.com', password='test')
+        habits = Habit.objects.bulk_create(
+            Habit(user=self.user, **self.get_habit_data(is_pleasant=True)) for _ in range(21)
+        )
+        Habit.objects.bulk_create(Habit(user=stranger, **self.get_habit_data(related_habit=habit)) for habit in habits)
+
+        for pks in ([habits[0].pk], [habit.pk for habit in habits[1:]]):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.assertQueryBudget(10, 'delete', '/habit/bulk/', pks)
+            self.assertEqual([result['status'] for result in response.json()], [204] * len(pks))
+
+        self.assertEqual(
+            sorted(Tombstone.objects.filter(user=self.user, kind=Tombstone.HABIT).values_list('object_id', flat=True)),
+            [habit.pk for habit in habits],
+        )
+
+    def test_bulk_requests_are_limited_to_own_objects(self):
+        """
+        Test that awards of other users cannot be changed, and that oversized requests are rejected.
+        """
+        stranger = User.objects.create(email='stranger@gmail.com', password='test')
+        award = Award.objects.create(user=stranger, reward='reward')
+
+        response = self.client.patch('/award/bulk/', [{'pk': award.pk, 'reward': 'stolen'}], format='json')
+        self.assertEqual(response.json(), [{'status': 404, 'errors': {'pk': ['Not found.']}}])
+
+        response = self.client.post('/award/bulk/', [{'reward': 'first'}, {'reward': 'second'}], format='json')
+        self.assertEqual([result['data']['user'] for result in response.json()], [self.user.email] * 2)
+
+        with mock.patch('config.settings.BULK_MAX_ITEMS', 1):
+            response = self.client.post('/award/bulk/', [{'reward': 'first'}, {'reward': 'second'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalListTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up an empty cache and a user with a habit.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='etag@gmail.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.habit = create_habit(self.user)
+
+    def test_unchanged_list_is_not_modified(self):
+        """
+        Test that a list with the ETag of the client is answered with 304 without any query.
+        """
+        for url in ('/habit/list/', '/award/list/'):
+            etag = self.client.get(url)['ETag']
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+            self.assertNotEqual(self.client.get(f'{url}?page=1')['ETag'], etag)
+
+    def test_writes_of_the_user_change_the_etag(self):
+        """
+        Test that saving, bulk creating and deleting objects of the user change the ETag, unlike other users' writes.
+        """
+        etag = self.client.get('/habit/list/')['ETag']
+
+        stranger = User.objects.create(email='stranger@gmail.com', password='test')
+        with self.captureOnCommitCallbacks(execute=True):
+            Award.objects.create(user=stranger, reward='reward')
+        self.assertEqual(self.client.get('/habit/list/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.place = 'new_place'
+            self.habit.save()
+        response = self.client.get('/habit/list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'][0]['place'], 'new_place')
+
+        etag = self.client.get('/award/list/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/award/bulk/', [{'reward': 'reward'}], format='json')
+        self.assertEqual(self.client.get('/award/list/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/award/list/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Award.objects.filter(user=self.user).delete()
+        self.assertEqual(self.client.get('/award/list/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FastListSerializationTestCase(LocalAPITestCase):
+
+    URLS = (
+        '/habit/list/?page_size=10',
+        '/habit/list/?pagination=cursor&page_size=2',
+        '/habit/list/public/',
+        '/award/list/',
+    )
+
+    def setUp(self):
+        """
+        Set up a superuser with awards and habits holding characters that need escaping in JSON.
+        """
+        self.user = User.objects.create(email='fast@gmail.com', password='test', telegram_id=42, is_superuser=True)
+        self.client.force_authenticate(user=self.user)
+        award = Award.objects.create(user=self.user, reward='Кофе "латте"\n\u2028')
+        for number, execution_time in enumerate(('2024-01-06T23:18:47.123456+03:00', '2024-03-31T01:00:00Z')):
+            create_habit(
+                self.user,
+                award=award if number else None,
+                place="Парк\t\u2029",
+                execution_time=execution_time,
+                action="run_in_gym 🏃",
+                is_public=True,
+            )
+
+    def get_contents(self, fast):
+        cache.clear()
+        with mock.patch('config.settings.FAST_LIST_SERIALIZATION', fast):
+            return [self.client.get(url).content for url in self.URLS]
+
+    def test_fast_path_is_byte_identical(self):
+        """
+        Test that the fast read path renders exactly the same bytes as the serializers, in any time zone.
+        """
+        for time_zone in ('Europe/Moscow', 'UTC'):
+            with self.subTest(time_zone=time_zone), timezone.override(ZoneInfo(time_zone)):
+                self.assertEqual(self.get_contents(fast=True), self.get_contents(fast=False))
+
+    def test_fast_renderer_is_used_only_by_the_fast_path(self):
+        """
+        Test that the lists are rendered by FastJSONRenderer only while the fast read path is enabled.
+        """
+        for fast in (True, False):
+            with self.subTest(fast=fast), mock.patch('config.settings.FAST_LIST_SERIALIZATION', fast):
+                renderer = self.client.get('/award/list/').accepted_renderer
+                self.assertEqual(isinstance(renderer, FastJSONRenderer), fast)
+
+
+class SparseFieldsTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up an authenticated user, their award and public habits.
+        """
+        self.user = User.objects.create(email='sparse@gmail.com', password='test', telegram_id=42)
+        self.client.force_authenticate(user=self.user)
+        self.award = Award.objects.create(user=self.user, reward='sparse_reward')
+        self.habits = [
+            create_habit(self.user, execution_time=f"2024-01-0{day}T08:00:00+03:00", is_public=True)
+            for day in range(3, 0, -1)
+        ]
+
+    def get(self, url, fast):
+        cache.clear()
+        with mock.patch('config.settings.FAST_LIST_SERIALIZATION', fast), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.content)
+        return response.json(), [query['sql'] for query in queries]
+
+    def test_only_requested_fields_are_returned(self):
+        """
+        Test that both read paths return the requested fields only, in the order of the serializers.
+        """
+        for fast in (True, False):
+            with self.subTest(fast=fast):
+                data, _ = self.get('/habit/list/?fields=place, pk', fast)
+                self.assertEqual(
+                    [list(habit.items()) for habit in data['results']],
+                    [[('pk', habit.pk), ('place', 'test_place')] for habit in self.habits],
+                )
+
+                data, _ = self.get('/habit/list/public/?fields=telegram_id,user', fast)
+                self.assertEqual(data['results'], [{'user': self.user.email, 'telegram_id': 42}] * 3)
+
+                data, _ = self.get('/award/list/?fields=reward', fast)
+                self.assertEqual(data, [{'reward': 'sparse_reward'}])
+
+                data, _ = self.get('/habit/list/?fields=action', fast)
+                self.assertEqual(data, self.get('/habit/list/', fast)[0] | {
+                    'results': [{'action': 'run_in_gym'}] * 3,
+                })
+
+    def test_keyset_pagination_without_ordering_fields(self):
+        """
+        Test that keyset pages are linked correctly when the fields of the ordering are not requested.
+        """
+        for fast in (True, False):
+            with self.subTest(fast=fast):
+                url, pks = '/habit/list/?pagination=cursor&page_size=2&fields=pk', []
+                while url:
+                    data, queries = self.get(url, fast)
+                    self.assertEqual(len(queries), 1)
+                    pks.extend(habit['pk'] for habit in data['results'])
+                    url = data['next']
+                self.assertEqual(pks, [habit.pk for habit in reversed(self.habits)])
+
+    def test_only_requested_columns_are_selected(self):
+        """
+        Test that the habits are selected without the unrequested columns, and without the join of the user
+        unless a field of the user is requested.
+        """
+        action = connection.ops.quote_name('action')
+        for fast in (True, False):
+            with self.subTest(fast=fast):
+                sql = self.get('/habit/list/?fields=pk,place', fast)[1][-1]
+                self.assertNotIn('JOIN', sql)
+                self.assertNotIn(action, sql)
+
+                sql = self.get('/habit/list/?fields=telegram_id', fast)[1][-1]
+                self.assertIn('JOIN', sql)
+                self.assertNotIn(action, sql)
+
+                sql = self.get('/habit/list/', fast)[1][-1]
+                self.assertIn(action, sql)
+
+    def test_async_endpoints(self):
+        """
+        Test that the async endpoints narrow the objects like the list endpoints.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        expected = self.client.get('/habit/list/?fields=is_public,pk').json()['results']
+        self.assertEqual(self.client.get('/habit/async/list/?fields=pk,is_public').json()['results'], expected)
+
+        response = self.client.get(f'/award/async/{self.award.pk}/?fields=reward')
+        self.assertEqual(response.json(), {'reward': 'sparse_reward'})
+
+    def test_unknown_fields_are_rejected(self):
+        """
+        Test that requesting a field the endpoint does not have is a validation error.
+        """
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        for url in ('/award/list/?fields=reward,place', '/award/async/list/?fields=reward,place'):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(
+                    response.json(), {'fields': ['Unknown fields: place. Expected any of: pk, user, reward.']}
+                )
+
+
+class AsyncReadOnlyAPITestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up a user authenticated with an access token, their habits and award, and a habit of another user.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='async@gmail.com', password='test', telegram_id=42)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        self.award = Award.objects.create(user=self.user, reward='async_reward')
+        self.habits = [
+            create_habit(self.user, execution_time=f"2024-01-0{day}T08:00:00+03:00") for day in range(1, 6)
+        ]
+        self.foreign_habit = create_habit(
+            User.objects.create(email='other@gmail.com', password='test'), execution_time="2024-01-06T08:00:00+03:00"
+        )
+
+    def test_list_matches_sync_list(self):
+        """
+        Test that the async habit list returns the same pages as the regular one.
+        """
+        for query in ('', '?page=2&page_size=2', '?page=last&page_size=2'):
+            with self.subTest(query=query):
+                response = self.client.get(f'/habit/async/list/{query}')
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                expected = self.client.get(f'/habit/list/{query}').json()
+                self.assertEqual(
+                    response.json(),
+                    {**expected, **{
+                        name: expected[name] and expected[name].replace('/habit/list/', '/habit/async/list/')
+                        for name in ('next', 'previous')
+                    }},
+                )
+
+    def test_retrieve(self):
+        """
+        Test that a habit and an award of the user are retrieved, and a habit of another user is not found.
+        """
+        response = self.client.get(f'/habit/async/{self.habits[0].pk}/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), self.client.get('/habit/list/').json()['results'][0])
+
+        response = self.client.get(f'/award/async/{self.award.pk}/')
+        self.assertEqual(response.json(), {'pk': self.award.pk, 'user': self.user.email, 'reward': 'async_reward'})
+
+        response = self.client.get(f'/habit/async/{self.foreign_habit.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), {'detail': 'Not found.'})
+
+    def test_errors(self):
+        """
+        Test that requests without credentials and requests of missing pages are answered like DRF does.
+        """
+        response = self.client.get('/award/async/list/?page=2')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.json(), {'detail': 'Invalid page.'})
+
+        self.client.credentials()
+        response = self.client.get('/award/async/list/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+
+class ReplicaRoutingTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up a user with a habit and an empty cache.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='replica@gmail.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        self.habit = create_habit(self.user)
+
+    def test_router(self):
+        """
+        Test that only opted-in reads go to a replica, and only until something is written.
+        """
+        router = ReplicaRouter()
+        with mock.patch('config.settings.DATABASE_REPLICAS', ['replica_1']):
+            self.assertEqual(router.db_for_read(Habit), 'default')
+            with routing_scope():
+                self.assertEqual(router.db_for_read(Habit), 'default')
+            with read_from_replica():
+                self.assertEqual(router.db_for_read(Habit), 'replica_1')
+                self.assertEqual(router.db_for_write(Habit), 'default')
+                self.assertEqual(router.db_for_read(Habit), 'default')
+            self.assertFalse(router.allow_migrate('replica_1', 'habits'))
+            self.assertTrue(router.allow_migrate('default', 'habits'))
+
+        with mock.patch('config.settings.DATABASE_REPLICAS', []), read_from_replica():
+            self.assertEqual(router.db_for_read(Habit), 'default')
+
+    def test_safe_list_requests_read_from_replica_until_the_user_writes(self):
+        """
+        Test that list requests read from a replica, except right after a write of the user.
+        """
+        with mock.patch('config.settings.DATABASE_REPLICAS', ['default']), \
+                mock.patch('config.db_router.random.choice', wraps=random.choice) as choose_replica:
+            for url in ('/habit/list/', '/habit/list/public/', '/award/list/'):
+                with self.subTest(url=url):
+                    choose_replica.reset_mock()
+                    self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+                    self.assertTrue(choose_replica.called)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.patch(f'/habit/update/{self.habit.pk}/', {'place': 'new_place'})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            choose_replica.reset_mock()
+            self.assertEqual(self.client.get('/habit/list/').json()['results'][0]['place'], 'new_place')
+            self.assertFalse(choose_replica.called)
+
+            self.client.force_authenticate(user=User.objects.create(email='reader@gmail.com', password='test'))
+            self.client.get('/habit/list/')
+            self.assertTrue(choose_replica.called)
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'No read replica is configured (POSTGRES_REPLICA_HOSTS)')
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReplicaDatabaseTestCase(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        """
+        Set up a user with a habit and an empty cache.
+        """
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create(email='replica@gmail.com', password='test')
+        self.client.force_authenticate(user=self.user)
+
+    def count_queries(self, method, url, data=None):
+        replica = settings.DATABASE_REPLICAS[0]
+        with mock.patch('config.settings.DATABASE_REPLICAS', [replica]), \
+                CaptureQueriesContext(connections[replica]) as replica_queries, \
+                CaptureQueriesContext(connection) as primary_queries:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertLess(response.status_code, 400)
+        return len(primary_queries), len(replica_queries)
+
+    def test_lists_are_read_from_replica_after_the_replication_window(self):
+        """
+        Test that a list is read from the replica, from the primary right after a write, and from the replica again
+        once the pin expires.
+        """
+        primary, replica = self.count_queries('get', '/habit/list/')
+        self.assertGreater(replica, 0)
+
+        primary, replica = self.count_queries('post', '/habit/create/', {
+            'place': 'test_place',
+            'execution_time': '2024-01-06T23:18:47+03:00',
+            'action': 'run_in_gym',
+            'award': None,
+            'is_pleasant': False,
+            'frequency': 1,
+            'time_to_complete': 100,
+        })
+        self.assertEqual(replica, 0)
+
+        primary, replica = self.count_queries('get', '/habit/list/')
+        self.assertEqual(replica, 0)
+
+        cache.clear()
+        primary, replica = self.count_queries('get', '/habit/list/')
+        self.assertGreater(replica, 0)
+
+
+class ExportTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up two users with habits and awards.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='export@gmail.com', password='test', telegram_id=42)
+        self.stranger = User.objects.create(email='stranger@gmail.com', password='test')
+        self.client.force_authenticate(user=self.user)
+        for user, count in ((self.user, 5), (self.stranger, 2)):
+            for number in range(count):
+                Award.objects.create(user=user, reward=f'reward, "{number}"')
+                create_habit(user, action=f"action_{number}")
+
+    def get_lines(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode().splitlines()
+
+    @mock.patch('config.settings.EXPORT_CHUNK_SIZE', 2)
+    def test_export_streams_ndjson_in_chunks(self):
+        """
+        Test that habits of the user are exported as NDJSON in chunks, one object per line.
+        """
+        response = self.client.get('/habit/export/')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        chunks = list(response.streaming_content)
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [2, 2, 1])
+
+        habits = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual([habit['action'] for habit in habits], [f'action_{number}' for number in range(5)])
+        self.assertEqual(habits[0]['user'], self.user.email)
+        self.assertEqual(habits[0]['execution_time'], '2024-01-06T23:18:47+03:00')
+        self.assertEqual(habits[0]['telegram_id'], 42)
+
+    @mock.patch('config.settings.EXPORT_CHUNK_SIZE', 2)
+    def test_first_chunk_is_sent_before_the_rest_is_read(self):
+        """
+        Test that the first chunk is produced by a query reading only its own rows.
+        """
+        content = iter(self.client.get('/habit/export/').streaming_content)
+        with CaptureQueriesContext(connection) as queries:
+            first = next(content)
+        self.assertEqual(first.count(b'\n'), 2)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 2', queries[0]['sql'])
+
+    def test_export_csv(self):
+        """
+        Test that awards are exported as CSV with a header, and that a superuser exports the awards of all users.
+        """
+        lines = self.get_lines('/award/export/?output=csv')
+        self.assertEqual(lines[0], 'pk,user,reward')
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[1].endswith(f',{self.user.email},"reward, ""0"""'))
+
+        self.user.is_superuser = True
+        self.assertEqual(len(self.get_lines('/award/export/?output=csv')), 8)
+        self.assertEqual(self.client.get('/award/export/?output=xml').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class HabitImportTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up a superuser with an award and a pleasant habit to reference, and an import mixing invalid rows.
+        """
+        self.user = User.objects.create(email='import@gmail.com', password='test', is_superuser=True)
+        self.award = Award.objects.create(user=self.user, reward='reward')
+        self.pleasant_habit = create_habit(self.user, action="take_a_bath", is_pleasant=True)
+        row = {
+            'user': self.user.email,
+            'place': 'test_place',
+            'execution_time': '2024-01-06T23:18:47+03:00',
+            'action': 'run_in_gym',
+            'time_to_complete': 100,
+        }
+        self.rows = [
+            row,
+            {**row, 'award': self.award.pk, 'is_public': True},
+            {**row, 'award': self.award.pk},
+            {**row, 'related_habit': self.pleasant_habit.pk, 'frequency': 7},
+            {**row, 'user': 'nobody@gmail.com', 'time_to_complete': 500},
+            {**row, 'frequency': 8},
+            {**row, 'award': self.award.pk, 'related_habit': self.pleasant_habit.pk, 'is_pleasant': False},
+            {**row, 'place': ''},
+        ]
+
+    def test_import_ndjson_command(self):
+        """
+        Test that the valid rows of an NDJSON file are copied into the database and the invalid ones reported.
+        """
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as file:
+            file.write('\n'.join(json.dumps(row) for row in self.rows) + '\n[1]\n')
+        self.addCleanup(os.remove, file.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_habits', file.name, batch_size=3, stdout=stdout, stderr=stderr)
+
+        self.assertIn('Imported 3 of 9 rows (6 rejected)', stdout.getvalue())
+        self.assertEqual(
+            [line.split(':')[0] for line in stderr.getvalue().splitlines()],
+            ['Line 3', 'Line 5', 'Line 6', 'Line 7', 'Line 8', 'Line 9'],
+        )
+        imported = Habit.objects.filter(action='run_in_gym').order_by('pk')
+        self.assertEqual(
+            [(habit.award_id, habit.related_habit_id, habit.frequency, habit.is_public) for habit in imported],
+            [(None, None, 1, False), (self.award.pk, None, 1, True), (None, self.pleasant_habit.pk, 7, False)],
+        )
+        self.assertEqual([habit.next_fire_at for habit in imported], [habit.get_next_fire_at() for habit in imported])
+
+    def test_import_csv_endpoint(self):
+        """
+        Test that superusers import CSV files exported by the export endpoint, unlike other users.
+        """
+        file = StringIO()
+        writer = csv.DictWriter(file, fieldnames=['user', 'award', 'place', 'execution_time', 'action',
+                                                  'is_pleasant', 'related_habit', 'frequency', 'time_to_complete',
+                                                  'is_public'])
+        writer.writeheader()
+        writer.writerows(self.rows)
+        upload = SimpleUploadedFile('habits.csv', file.getvalue().encode())
+
+        self.client.force_authenticate(user=User.objects.create(email='user@gmail.com', password='test'))
+        self.assertEqual(self.client.post('/habit/import/', {'file': upload}).status_code, status.HTTP_403_FORBIDDEN)
+
+        upload.seek(0)
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post('/habit/import/', {'file': upload})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.json()['imported'], response.json()['rejected']), (3, 5))
+        self.assertEqual(response.json()['errors'][0], {
+            'line': 4, 'errors': {'non_field_errors': ['The fields award, is_pleasant must make a unique set.']}
+        })
 
-class AwardTestCase(APITestCase):
+
+@mock.patch('config.settings.SYNC_OVERLAP', timedelta(0))
+class SyncTestCase(QueryBudgetMixin, LocalAPITestCase):
 
     def setUp(self):
+        """
+        Set up an authenticated user with an award and habits, and a habit of another user.
+        """
+        self.user = User.objects.create(email='sync@gmail.com', password='test', telegram_id=42)
+        self.client.force_authenticate(user=self.user)
+        self.award = Award.objects.create(user=self.user, reward='sync_reward')
+        self.habits = [
+            create_habit(
+                self.user, award=self.award if number == 0 else None, execution_time="2024-01-01T08:00:00+03:00"
+            )
+            for number in range(3)
+        ]
+        create_habit(
+            User.objects.create(email='other@gmail.com', password='test'), execution_time="2024-01-01T08:00:00+03:00"
+        )
+
+    def sync(self, token=None):
+        response = self.assertQueryBudget(3, 'get', '/sync/' if token is None else f'/sync/?since={token}')
+        return response.json()
+
+    def get_changes(self, data):
+        return (
+            sorted(habit['pk'] for habit in data['habits']),
+            sorted(award['pk'] for award in data['awards']),
+            data['deleted'],
+        )
+
+    def test_first_sync_returns_everything(self):
+        """
+        Test that a sync without a token returns all habits and awards of the user, like the lists do.
+        """
+        data = self.sync()
+        self.assertEqual(data['habits'], self.client.get('/habit/list/?page_size=10').json()['results'])
+        self.assertEqual(data['awards'], self.client.get('/award/list/').json())
+        self.assertEqual(data['deleted'], {'habits': [], 'awards': []})
+
+        self.assertEqual(self.get_changes(self.sync(data['token'])), ([], [], {'habits': [], 'awards': []}))
+
+    def test_sync_returns_changes_since_the_token(self):
+        """
+        Test that a sync returns the objects created, updated and deleted after the token only.
+        """
+        token = self.sync()['token']
+
+        habit = create_habit(self.user, place="new_place", execution_time="2024-01-01T08:00:00+03:00", action="read")
+        self.habits[1].place = 'changed_place'
+        self.habits[1].save(update_fields=['place'])
+        self.client.patch('/award/bulk/', [{'pk': self.award.pk, 'reward': 'changed_reward'}], format='json')
+        self.client.delete('/habit/bulk/', [self.habits[2].pk], format='json')
+
+        data = self.sync(token)
+        self.assertEqual(
+            self.get_changes(data),
+            (sorted([habit.pk, self.habits[1].pk]), [self.award.pk], {'habits': [self.habits[2].pk], 'awards': []}),
+        )
+        self.assertEqual(data['awards'][0]['reward'], 'changed_reward')
+
+        self.assertEqual(self.get_changes(self.sync(data['token'])), ([], [], {'habits': [], 'awards': []}))
+
+    def sync_pages(self, url):
+        pages = []
+        while url:
+            pages.append(self.assertQueryBudget(3, 'get', url).json())
+            url = pages[-1]['next']
+        self.assertEqual({page['token'] for page in pages}, {pages[0]['token']})
+        return pages
+
+    @mock.patch('config.settings.SYNC_PAGE_SIZE', 2)
+    def test_syncs_are_paginated(self):
+        """
+        Test that the first sync and a sync of changes sharing a single timestamp are split into pages, and that
+        changes made during a paginated sync are left to the next one.
+        """
+        first_page = self.sync()
+        new_habit = create_habit(self.user, execution_time="2024-01-01T08:00:00+03:00")
+        pages = [first_page, *self.sync_pages(first_page['next'])]
+        self.assertEqual([len(page['habits']) for page in pages], [2, 1])
+        self.assertEqual([habit['pk'] for page in pages for habit in page['habits']], [h.pk for h in self.habits])
+        self.assertEqual([len(page['awards']) for page in pages], [1, 0])
+        self.assertEqual(self.get_changes(self.sync(first_page['token']))[0], [new_habit.pk])
+
+        Habit.objects.filter(user=self.user).update(updated_at=timezone.now())
+        pages = self.sync_pages(f'/sync/?since={first_page["token"]}')
+        self.assertEqual([len(page['habits']) for page in pages], [2, 2])
+        self.assertEqual(len({habit['pk'] for page in pages for habit in page['habits']}), 4)
+
+        self.client.delete('/habit/bulk/', [new_habit.pk, *(habit.pk for habit in self.habits[1:])], format='json')
+        pages = self.sync_pages(f'/sync/?since={pages[0]["token"]}')
+        self.assertEqual([len(page['deleted']['habits']) for page in pages], [2, 1])
+        self.assertEqual(self.client.get('/sync/?cursor=bogus').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_indirect_changes_are_synced(self):
+        """
+        Test that habits losing their deleted award and objects showing a changed email of the user are synced.
+        """
+        token = self.sync()['token']
+        self.client.delete(f'/award/delete/{self.award.pk}/')
+        data = self.sync(token)
+        self.assertEqual(
+            self.get_changes(data), ([self.habits[0].pk], [], {'habits': [], 'awards': [self.award.pk]})
+        )
+        self.assertIsNone(data['habits'][0]['award'])
+
+        token = data['token']
+        self.user.email = 'renamed@gmail.com'
+        self.user.save()
+        data = self.sync(token)
+        self.assertEqual(self.get_changes(data)[0], sorted(habit.pk for habit in self.habits))
+        self.assertEqual({habit['user'] for habit in data['habits']}, {'renamed@gmail.com'})
+
+    def test_changes_are_read_through_the_updated_at_index(self):
+        """
+        Test that the changed habits are found through the (user, updated_at) index.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = (
+            Habit.objects.filter(user=self.user, updated_at__gt=timezone.now())
+            .order_by('updated_at', 'pk').explain()
+        )
+        self.assertIn('habit_user_updated_at_idx', plan)
+
+    def test_invalid_and_expired_tokens(self):
+        """
+        Test that malformed tokens are rejected and tokens older than the tombstone retention have expired.
+        """
+        response = self.client.get('/sync/?since=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'since': ['Invalid sync token.']})
+
+        token = self.sync()['token']
+        with mock.patch('config.settings.SYNC_TOMBSTONE_RETENTION', timedelta(0)):
+            response = self.client.get(f'/sync/?since={token}')
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    def test_tombstones_are_purged(self):
+        """
+        Test that tombstones older than the retention are purged.
+        """
+        self.habits[0].delete()
+        with mock.patch('config.settings.SYNC_TOMBSTONE_RETENTION', timedelta(0)):
+            self.assertEqual(task_purge_tombstones(), 1)
+
+
+class AwardTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        cache.clear()
 
         existing_user = User.objects.filter(email='test_award@gmail.com').first()
 
@@ -245,3 +1455,473 @@ class AwardTestCase(APITestCase):
             response.status_code,
             status.HTTP_204_NO_CONTENT
         )
+
+
+class HabitScheduleTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up a user with a Telegram account and a daily habit that started three days ago.
+        """
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+
+        self.user = User.objects.create(email='schedule@gmail.com', password='test', telegram_id=42)
+        self.now = timezone.now().replace(second=0, microsecond=0)
+
+        self.habit = create_habit(self.user, execution_time=self.now - timedelta(days=3, seconds=-30))
+
+    def test_next_fire_at_is_maintained_on_save(self):
+        """
+        Test that the next reminder time is the nearest upcoming occurrence and follows frequency changes.
+        """
+        self.assertEqual(self.habit.next_fire_at, self.now)
+
+        self.habit.frequency = 2
+        self.habit.save(update_fields=['frequency'])
+        self.habit.refresh_from_db()
+
+        self.assertEqual(self.habit.next_fire_at, self.now + timedelta(days=1))
+
+    def test_occurrences_keep_local_time_across_dst(self):
+        """
+        Test that a habit recurs at the same local time of its user when the UTC offset changes.
+        """
+        new_york = ZoneInfo('America/New_York')
+        execution_time = datetime(2026, 3, 7, 8, 0, tzinfo=new_york)
+
+        occurrence = get_next_occurrence(execution_time, 1, datetime(2026, 3, 9, tzinfo=dt_timezone.utc), new_york)
+
+        self.assertEqual(occurrence, datetime(2026, 3, 9, 12, 0, tzinfo=dt_timezone.utc))
+        self.assertEqual(occurrence.astimezone(new_york).hour, 8)
+
+    def test_schedule_is_rebuilt_on_timezone_change(self):
+        """
+        Test that the reminder times of a user's habits are recalculated when the user changes the time zone.
+        """
+        Habit.objects.filter(pk=self.habit.pk).update(next_fire_at=None)
+
+        self.user.timezone = 'America/New_York'
+        self.user.save()
+        self.habit.refresh_from_db()
+
+        self.assertEqual(self.habit.next_fire_at, self.now)
+
+    def test_non_recurring_habit_is_not_scheduled(self):
+        """
+        Test that a habit with zero frequency never gets a reminder time.
+        """
+        self.habit.frequency = 0
+        self.habit.save()
+
+        self.assertIsNone(self.habit.next_fire_at)
+
+    @mock.patch('habits.tasks.TelegramDispatcher.dispatch', return_value=DispatchReport())
+    def test_task_sends_due_habits_and_advances_schedule(self, dispatch):
+        """
+        Test that the task notifies only habits due within the next minute and moves them to the next occurrence.
+        """
+        create_habit(
+            self.user, place="later_place", execution_time=self.now + timedelta(hours=1), action="read_a_book",
+            time_to_complete=60,
+        )
+
+        task_send_notification()
+
+        [(chat_id, text)] = dispatch.call_args.args[0]
+        self.assertEqual(chat_id, 42)
+        self.assertIn('run_in_gym', text)
+
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.next_fire_at, self.now + timedelta(days=1))
+
+    @mock.patch('habits.tasks.TelegramDispatcher.dispatch', return_value=DispatchReport())
+    def test_occurrence_is_sent_once(self, dispatch):
+        """
+        Test that an occurrence recorded in the delivery ledger is not sent again by an overlapping task.
+        """
+        due_before = (self.now + timedelta(minutes=1)).isoformat()
+        occurrence = self.habit.next_fire_at
+
+        task_send_notification_chunk(self.habit.pk, self.habit.pk, due_before)
+        Habit.objects.filter(pk=self.habit.pk).update(next_fire_at=occurrence)
+        task_send_notification_chunk(self.habit.pk, self.habit.pk, due_before)
+
+        self.assertEqual([len(call.args[0]) for call in dispatch.call_args_list], [1])
+        self.assertTrue(NotificationDelivery.objects.filter(habit=self.habit, occurrence=occurrence).exists())
+
+    @mock.patch('habits.tasks.task_drain_notification_outbox.delay')
+    def test_reminders_read_before_a_change_are_skipped(self, drain):
+        """
+        Test that a reminder whose habit was rescheduled after it had been read neither is queued nor overwrites the
+        new reminder time.
+        """
+        reminders = list(iter_due_reminders(self.habit.pk, self.habit.pk, self.now + timedelta(minutes=1), 10))
+        rescheduled_at = self.now + timedelta(hours=2)
+        Habit.objects.filter(pk=self.habit.pk).update(next_fire_at=rescheduled_at)
+
+        self.assertEqual(queue_reminders(reminders), {'reminders': 0, 'queued': 0})
+        self.habit.refresh_from_db()
+        self.assertEqual(self.habit.next_fire_at, rescheduled_at)
+        self.assertFalse(NotificationDelivery.objects.filter(habit=self.habit).exists())
+
+    @mock.patch('habits.tasks.task_drain_notification_outbox.delay')
+    def test_chunk_query_count_does_not_depend_on_habit_count(self, drain):
+        """
+        Test that a chunk fetches habits with their users and awards in one query and writes them back in bulk.
+        """
+        award = Award.objects.create(user=self.user, reward='a cake')
+        for action in ('read_a_book', 'drink_water'):
+            create_habit(
+                self.user, award=award, execution_time=self.now + timedelta(seconds=10), action=action,
+                time_to_complete=60,
+            )
+        last_pk = Habit.objects.latest('pk').pk
+
+        # select, savepoint, row locks, ledger claim, outbox insert, next_fire_at update, savepoint release
+        with self.assertNumQueries(7):
+            task_send_notification_chunk(self.habit.pk, last_pk, (self.now + timedelta(minutes=1)).isoformat())
+
+        drain.assert_called_once()
+        texts = NotificationOutbox.objects.filter(chat_id=42).values_list('text', flat=True)
+        self.assertEqual(len(texts), 3)
+        self.assertEqual(sum('a cake' in text for text in texts), 2)
+
+    @mock.patch('habits.tasks.TelegramDispatcher.dispatch')
+    def test_drain_marks_outbox_messages(self, dispatch):
+        """
+        Test that the drainer marks delivered messages as sent, reschedules retryable failures
+        and dead-letters permanent ones.
+        """
+        outcomes = {
+            'delivered': SendOutcome(SendOutcome.DELIVERED),
+            'rate_limited': SendOutcome(SendOutcome.RETRYABLE, retry_after=120, error='429: Too Many Requests'),
+            'blocked': SendOutcome(SendOutcome.PERMANENT, error='403: Forbidden: bot was blocked by the user'),
+        }
+        dispatch.side_effect = lambda messages: DispatchReport(
+            sent=1, failed=2, outcomes=[outcomes[text] for chat_id, text in messages]
+        )
+        NotificationOutbox.objects.bulk_create([NotificationOutbox(chat_id=42, text=text) for text in outcomes])
+
+        result = task_drain_notification_outbox()
+
+        self.assertEqual(result['sent'], 1)
+        self.assertEqual(dispatch.call_count, 1)
+        messages = {message.text: message for message in NotificationOutbox.objects.all()}
+        self.assertEqual(messages['delivered'].status, NotificationOutbox.SENT)
+        self.assertEqual(messages['rate_limited'].status, NotificationOutbox.PENDING)
+        self.assertEqual(messages['rate_limited'].attempts, 1)
+        self.assertGreaterEqual(messages['rate_limited'].available_at, self.now + timedelta(seconds=120))
+        self.assertEqual(messages['blocked'].status, NotificationOutbox.DEAD)
+        self.assertIn('blocked', messages['blocked'].last_error)
+
+    def test_claim_returns_only_new_occurrences(self):
+        """
+        Test that the ledger reports only the occurrences that were not recorded before.
+        """
+        first, second = (self.habit.pk, self.now), (self.habit.pk, self.now + timedelta(days=1))
+
+        self.assertEqual(NotificationDelivery.objects.claim([first]), {first})
+        self.assertEqual(NotificationDelivery.objects.claim([first, second]), {second})
+
+    @mock.patch('config.settings.NOTIFICATION_CHUNK_SIZE', 2)
+    @mock.patch('habits.tasks.TelegramDispatcher.dispatch', return_value=DispatchReport(sent=1))
+    def test_task_fans_out_chunks(self, dispatch):
+        """
+        Test that due habits are split into chunks sent by separate subtasks.
+        """
+        for action in ('read_a_book', 'drink_water'):
+            create_habit(
+                self.user, execution_time=self.now + timedelta(seconds=10), action=action, time_to_complete=60
+            )
+
+        self.assertEqual(task_send_notification(), 2)
+        self.assertEqual(dispatch.call_count, 2)
+        self.assertEqual(sum(len(call.args[0]) for call in dispatch.call_args_list), 3)
+
+    @mock.patch('config.settings.NOTIFICATION_DIGEST', True)
+    @mock.patch('habits.tasks.TelegramDispatcher.dispatch', return_value=DispatchReport(sent=1))
+    def test_digest_mode_coalesces_reminders_of_a_user(self, dispatch):
+        """
+        Test that in digest mode all habits of a user due within the window are sent as a single message.
+        """
+        create_habit(
+            self.user, place="later_place", execution_time=self.now + timedelta(minutes=10), action="read_a_book",
+            time_to_complete=60,
+        )
+
+        self.assertEqual(task_send_notification(), 1)
+
+        [(chat_id, text)] = dispatch.call_args.args[0]
+        self.assertEqual(chat_id, 42)
+        self.assertTrue(text.startswith('Reminders (2)'))
+        self.assertIn('run_in_gym', text)
+        self.assertIn('read_a_book', text)
+
+    def test_digests_respect_item_and_length_limits(self):
+        """
+        Test that digests are capped by the number of reminders and split at the message length limit.
+        """
+        reminders = [
+            Reminder(pk, self.now, self.now, 1, 'a' * 50, 'place', 60, 42, dt_timezone.utc, None) for pk in range(5)
+        ]
+
+        by_items = list(render_digests(reminders, max_items=2, max_length=4096))
+        by_length = list(render_digests(reminders, max_items=10, max_length=300))
+
+        self.assertEqual(len(by_items), 3)
+        self.assertTrue(all(chat_id == 42 for chat_id, text in by_items + by_length))
+        self.assertTrue(all(len(text) <= 300 for chat_id, text in by_length))
+        self.assertEqual(sum(text.count('To Do:') for chat_id, text in by_length), 5)
+
+    @mock.patch('config.settings.NOTIFICATION_SCHEDULER', 'wheel')
+    @mock.patch('habits.tasks.publish_schedule_changes')
+    @mock.patch('habits.tasks.TelegramDispatcher.dispatch', return_value=DispatchReport(sent=1))
+    def test_wheel_scheduler_enqueues_due_habits(self, dispatch, publish):
+        """
+        Test that the timing wheel scheduler enqueues a habit at its due second and publishes its next occurrence.
+        """
+        clock = mock.Mock(return_value=self.now.timestamp() - 5)
+        scheduler = WheelScheduler(enqueue=task_send_habit_notifications, clock=clock)
+        scheduler.load()
+
+        self.assertEqual(task_send_notification(), 0)
+        self.assertEqual(scheduler.tick(), 0)
+
+        clock.return_value = self.now.timestamp()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(scheduler.tick(), 1)
+
+        self.assertEqual(NotificationOutbox.objects.get().chat_id, 42)
+        [habit] = publish.call_args.args[0]
+        self.assertEqual((habit.pk, habit.next_fire_at), (self.habit.pk, self.now + timedelta(days=1)))
+
+    def test_wheel_scheduler_sweeps_overdue_habits(self):
+        """
+        Test that a habit left overdue without being in the wheel is enqueued by the next sweep of the database.
+        """
+        enqueue = mock.Mock()
+        clock = mock.Mock(return_value=self.now.timestamp() + 30)
+        scheduler = WheelScheduler(enqueue=enqueue, clock=clock)
+        self.assertEqual(scheduler.tick(), 0)
+
+        clock.return_value = self.now.timestamp() + 90
+        self.assertEqual(scheduler.tick(), 1)
+        self.assertEqual(enqueue.call_args.args[0], [self.habit.pk])
+        self.assertEqual(scheduler.tick(), 0)
+
+    @mock.patch('config.settings.NOTIFICATION_SCHEDULER', 'wheel')
+    @mock.patch('habits.signals.publish_schedule_changes')
+    def test_habit_changes_are_published_to_wheel_scheduler(self, publish):
+        """
+        Test that saved and deleted habits are published to the timing wheel scheduler after the commit.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.frequency = 2
+            self.habit.save()
+        [habit] = publish.call_args.args[0]
+        self.assertEqual(habit.next_fire_at, self.now + timedelta(days=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.habit.delete()
+        [habit] = publish.call_args.args[0]
+        self.assertIsNone(habit.next_fire_at)
+
+        scheduler = WheelScheduler(enqueue=mock.Mock())
+        scheduler.apply_changes(json.dumps([[1, self.now.isoformat()], [2, None]]))
+        self.assertIn(1, scheduler.wheel)
+        self.assertNotIn(2, scheduler.wheel)
+
+
+class TimingWheelTestCase(TestCase):
+
+    def test_timers_expire_at_their_second(self):
+        """
+        Test that timers of every level cascade down and expire exactly at their second.
+        """
+        wheel = TimingWheel(1000)
+        delays = {'second': 5, 'minute': 125, 'hour': 2 * 3600 + 7, 'day': 3 * 86400 + 11}
+        for key, delay in delays.items():
+            wheel.schedule(key, 1000 + delay)
+
+        expired = {}
+        for now in range(1001, 1000 + 3 * 86400 + 12):
+            for key, timestamp in wheel.advance(now):
+                expired[key] = now
+
+        self.assertEqual(expired, {key: 1000 + delay for key, delay in delays.items()})
+        self.assertEqual(len(wheel), 0)
+
+    def test_overflow_and_cancel(self):
+        """
+        Test that timers beyond the top level are kept, and that cancelled or overdue timers are handled.
+        """
+        wheel = TimingWheel(0, sizes=(4, 4))
+        wheel.schedule('far', 40)
+        wheel.schedule('cancelled', 3)
+        wheel.schedule('moved', 2)
+        wheel.schedule('moved', 30)
+        wheel.cancel('cancelled')
+        wheel.schedule('overdue', -10)
+
+        self.assertEqual(wheel.advance(0), [('overdue', -10)])
+        self.assertEqual(wheel.advance(29), [])
+        self.assertEqual(wheel.advance(30), [('moved', 30)])
+        self.assertEqual(wheel.advance(39), [])
+        self.assertEqual(wheel.advance(45), [('far', 40)])
+
+
+class FakeTelegramAPIHandler(BaseHTTPRequestHandler):
+    """
+    Local stand-in for the Telegram Bot API that records every sent message.
+    """
+
+    def do_POST(self):
+        length = int(self.headers['Content-Length'])
+        data = parse_qs(self.rfile.read(length).decode())
+        self.server.received.append((data['chat_id'][0], data['text'][0]))
+        self.server.received_at.append(time.monotonic())
+
+        status_code, payload = self.server.responses.get(data['chat_id'][0], (200, {'ok': True}))
+        body = json.dumps(payload).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TelegramDispatcherTestCase(TestCase):
+
+    def setUp(self):
+        """
+        Start a local Telegram Bot API stand-in and point TelegramNotificationBot at it.
+        """
+        cache.clear()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeTelegramAPIHandler)
+        self.server.received = []
+        self.server.received_at = []
+        self.server.responses = {}
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        url = f'http://127.0.0.1:{self.server.server_port}/bot'
+        url_patcher = mock.patch.object(TelegramNotificationBot, 'URL', url)
+        url_patcher.start()
+        self.addCleanup(url_patcher.stop)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def test_dispatch_sends_all_messages(self):
+        """
+        Test that a batch is delivered to the API and reported.
+        """
+        messages = [(chat_id, f'message {chat_id}') for chat_id in range(20)]
+
+        report = TelegramDispatcher(workers=4, global_rate=1000).dispatch(messages)
+
+        self.assertEqual(report.sent, 20)
+        self.assertEqual(report.failed, 0)
+        self.assertEqual(len(report.latencies), 20)
+        self.assertGreater(report.throughput, 0)
+        self.assertCountEqual(self.server.received, [(str(chat_id), text) for chat_id, text in messages])
+
+    def assertSpaced(self, interval):
+        """
+        Asserts that the messages reached the API at least `interval` seconds apart, give or take the timer jitter.
+        """
+        received_at = sorted(self.server.received_at)
+        gaps = [later - earlier for earlier, later in zip(received_at, received_at[1:])]
+        self.assertGreaterEqual(min(gaps), interval * 0.8)
+
+    def test_dispatch_respects_chat_rate_limit(self):
+        """
+        Test that messages to the same chat are spaced according to the per-chat limit.
+        """
+        started_at = time.monotonic()
+
+        report = TelegramDispatcher(workers=4, global_rate=1000, chat_rate=10).dispatch([(1, 'a'), (1, 'b'), (1, 'c')])
+
+        self.assertEqual(report.sent, 3)
+        self.assertGreaterEqual(time.monotonic() - started_at, 0.2)
+        self.assertSpaced(0.1)
+
+    def test_rate_limits_are_shared_by_dispatchers(self):
+        """
+        Test that parallel dispatchers, e.g. outbox drainers on different workers, share the global and per-chat
+        limits instead of each sending at the full rate.
+        """
+        for messages, rates in (
+                ([(1, 'a'), (1, 'b')], {'global_rate': 1000, 'chat_rate': 10}),
+                ([(1, 'a'), (2, 'b')], {'global_rate': 10, 'chat_rate': 1000}),
+        ):
+            with self.subTest(rates=rates):
+                cache.clear()
+                self.server.received_at = []
+                threads = [
+                    threading.Thread(target=TelegramDispatcher(workers=2, **rates).dispatch, args=(messages,))
+                    for _ in range(2)
+                ]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+
+                self.assertEqual(len(self.server.received_at), 4)
+                self.assertSpaced(0.1)
+
+    def test_token_bucket_reserves_spaced_tokens_across_threads(self):
+        """
+        Test that tokens reserved by concurrent threads are released at least 1 / rate seconds apart, never before
+        the requested moment, and that reserving does not wait for them.
+        """
+        bucket = SharedTokenBucket('test:bucket', 1000)
+        not_before = time.time() + 0.5
+        reserved = []
+        threads = [
+            threading.Thread(target=lambda: reserved.extend(bucket.reserve(not_before) for _ in range(500)))
+            for _ in range(5)
+        ]
+        started_at = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertLess(time.time() - started_at, 0.5)
+        reserved.sort()
+        self.assertGreaterEqual(reserved[0], not_before)
+        self.assertGreaterEqual(min(later - earlier for earlier, later in zip(reserved, reserved[1:])), 0.00099)
+        self.assertLess(reserved[-1], not_before + 2.6)
+
+    def test_dispatch_classifies_failures(self):
+        """
+        Test that rate limiting and server errors are retryable while a blocked bot is a permanent failure.
+        """
+        self.server.responses = {
+            '1': (429, {'ok': False, 'description': 'Too Many Requests', 'parameters': {'retry_after': 7}}),
+            '2': (502, {'ok': False, 'description': 'Bad Gateway'}),
+            '3': (403, {'ok': False, 'description': 'Forbidden: bot was blocked by the user'}),
+        }
+
+        report = TelegramDispatcher(workers=3, global_rate=1000).dispatch([(1, 'a'), (2, 'b'), (3, 'c'), (4, 'd')])
+
+        self.assertEqual((report.sent, report.failed), (1, 3))
+        rate_limited, server_error, blocked, delivered = report.outcomes
+        self.assertEqual((rate_limited.status, rate_limited.retry_after), (SendOutcome.RETRYABLE, 7))
+        self.assertEqual(server_error.status, SendOutcome.RETRYABLE)
+        self.assertEqual(blocked.status, SendOutcome.PERMANENT)
+        self.assertTrue(delivered.is_sent)
+
+    def test_timeout_is_retryable(self):
+        """
+        Test that a destination that does not answer in time does not hold the worker and is retried later.
+        """
+        with mock.patch.object(TelegramNotificationBot, 'TIMEOUT', (0.5, 0.01)), \
+                mock.patch.object(FakeTelegramAPIHandler, 'do_POST', lambda handler: time.sleep(0.2)):
+            report = TelegramDispatcher(workers=1, global_rate=1000).dispatch([(1, 'a')])
+
+        self.assertEqual(report.outcomes[0].status, SendOutcome.RETRYABLE)
@@ -1,8 +1,11 @@
 from django.urls import path
 
 from habits.api_views.habit import HabitListAPIView, HabitCreateAPIView, HabitUpdateAPIView, HabitDestroyAPIView, \
-    HabitPublicListAPIView
-from habits.api_views.award import AwardListAPIView, AwardCreateAPIView, AwardUpdateAPIView, AwardDestroyAPIView
+    HabitPublicListAPIView, HabitBulkAPIView, HabitExportAPIView, HabitImportAPIView, HabitAsyncListAPIView, \
+    HabitAsyncRetrieveAPIView
+from habits.api_views.award import AwardListAPIView, AwardCreateAPIView, AwardUpdateAPIView, AwardDestroyAPIView, \
+    AwardBulkAPIView, AwardExportAPIView, AwardAsyncListAPIView, AwardAsyncRetrieveAPIView
+from habits.api_views.sync import SyncAPIView
 from habits.apps import HabitsConfig
 
 app_name = HabitsConfig.name
@@ -13,9 +16,20 @@ urlpatterns = [
     path('habit/create/', HabitCreateAPIView.as_view(), name='habit_create'),
     path('habit/update/<int:pk>/', HabitUpdateAPIView.as_view(), name='habit_update'),
     path('habit/delete/<int:pk>/', HabitDestroyAPIView.as_view(), name='habit_delete'),
+    path('habit/bulk/', HabitBulkAPIView.as_view(), name='habit_bulk'),
+    path('habit/export/', HabitExportAPIView.as_view(), name='habit_export'),
+    path('habit/import/', HabitImportAPIView.as_view(), name='habit_import'),
+    path('habit/async/list/', HabitAsyncListAPIView.as_view(), name='habit_async_list'),
+    path('habit/async/<int:pk>/', HabitAsyncRetrieveAPIView.as_view(), name='habit_async_retrieve'),
 
     path('award/list/', AwardListAPIView.as_view(), name='award_list'),
     path('award/create/', AwardCreateAPIView.as_view(), name='award_create'),
     path('award/update/<int:pk>/', AwardUpdateAPIView.as_view(), name='award_update'),
     path('award/delete/<int:pk>/', AwardDestroyAPIView.as_view(), name='award_delete'),
+    path('award/bulk/', AwardBulkAPIView.as_view(), name='award_bulk'),
+    path('award/export/', AwardExportAPIView.as_view(), name='award_export'),
+    path('award/async/list/', AwardAsyncListAPIView.as_view(), name='award_async_list'),
+    path('award/async/<int:pk>/', AwardAsyncRetrieveAPIView.as_view(), name='award_async_retrieve'),
+
+    path('sync/', SyncAPIView.as_view(), name='sync'),
 ]
\ No newline at end of file
@@ -13,4 +13,4 @@ class UserAdmin(admin.ModelAdmin):
 
     """
 
-    list_display = ('pk', 'email', 'first_name', 'last_name', 'phone', 'country',)
\ No newline at end of file
+    list_display = ('pk', 'email', 'first_name', 'last_name', 'phone', 'country', 'timezone',)
\ No newline at end of file
@@ -0,0 +1,142 @@
+"""
+Authentication
+
+Resolves the users of JSON web tokens from a short-lived cache of the few fields requests need instead of querying
+the database on every request. The cached fields are dropped whenever a user is saved or deleted.
+"""
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from config import settings
+
+# Fields of an authenticated user kept in the cache, the password hash and the rest of the row are not
+AUTH_USER_FIELDS = ('pk', 'email', 'is_active', 'is_superuser', 'timezone', 'telegram_id')
+
+
+def get_auth_user_key(user_id):
+    """
+    Builds the cache key of the fields of an authenticated user.
+    """
+    return f'users:auth_user:{user_id}'
+
+
+def invalidate_auth_user(user_id):
+    """
+    Drops the cached fields of a user, the next request of the user reads them from the database again.
+    """
+    cache.delete(get_auth_user_key(user_id))
+
+
+def get_auth_user_values(user):
+    """
+    Returns the cached fields of a user.
+
+    If tokens are revoked on password changes, the digest of the password hash the tokens carry is kept as well.
+    """
+    values = {name: getattr(user, name) for name in AUTH_USER_FIELDS}
+    if api_settings.CHECK_REVOKE_TOKEN:
+        values['password_digest'] = get_md5_hash_password(user.password)
+    return values
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication reading the user of the token from the cache for `AUTH_USER_CACHE_TIMEOUT` seconds.
+
+    Only a cache miss queries the database, so authenticated requests usually cost no authentication queries.
+    The cache holds the `AUTH_USER_FIELDS` only, the user of a request is a User loaded from them as if it had been
+    read from the default database with the other fields deferred, so reading any of those queries the row.
+    The user is checked the same way as by JWTAuthentication: inactive users and, if enabled, tokens issued
+    before a password change are rejected.
+    """
+
+    def get_user(self, validated_token):
+        """
+        Returns the user of the validated token, from the cache if possible.
+
+        Args:
+            validated_token (Token): Validated access token.
+
+        Returns:
+            User: The user the token was issued for.
+        """
+        user_id = self.get_user_id(validated_token)
+        key = get_auth_user_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            values = get_auth_user_values(user)
+            cache.set(key, values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        return self.check_user(values, validated_token)
+
+    async def aauthenticate(self, request):
+        """
+        Asynchronous version of `authenticate` for async views, which run outside of DRF.
+
+        Returns:
+            tuple: The user and the validated token, or None if the request has no token.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        """
+        Asynchronous version of `get_user`.
+        """
+        user_id = self.get_user_id(validated_token)
+        key = get_auth_user_key(user_id)
+        values = await cache.aget(key)
+        if values is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            values = get_auth_user_values(user)
+            await cache.aset(key, values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+        return self.check_user(values, validated_token)
+
+    @staticmethod
+    def get_user_id(validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    def check_user(self, values, validated_token):
+        """
+        Rejects inactive users and, if enabled, tokens issued before the last password change.
+
+        Args:
+            values (dict): Cached fields of the user.
+            validated_token (Token): Validated access token.
+
+        Returns:
+            User: User loaded from the cached fields, with the other fields deferred.
+        """
+        if not values['is_active']:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != values.get('password_digest'):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        loaded = {self.user_model._meta.pk.attname if name == 'pk' else name: values[name] for name in AUTH_USER_FIELDS}
+        field_names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in loaded]
+        return self.user_model.from_db(DEFAULT_DB_ALIAS, field_names, [loaded[name] for name in field_names])
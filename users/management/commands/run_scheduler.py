@@ -0,0 +1,26 @@
+from django.core.management import BaseCommand
+
+from habits.scheduler import WheelScheduler
+from habits.tasks import task_send_habit_notifications
+
+
+class Command(BaseCommand):
+    """
+    Management command for running the timing wheel scheduler of habit reminders.
+
+    Requires `NOTIFICATION_SCHEDULER = 'wheel'`, so that habit changes are published to the scheduler and
+    celery beat stops planning the reminders itself. Should be restarted after the rebuild_schedule command.
+    """
+
+    help = 'Runs the timing wheel scheduler enqueueing habit reminders at the second they are due'
+
+    def handle(self, *args, **options):
+        """
+        Handle the command execution.
+        """
+
+        scheduler = WheelScheduler(enqueue=lambda habit_ids, due_before: task_send_habit_notifications.delay(
+            habit_ids, due_before
+        ))
+        self.stdout.write('The scheduler has been started')
+        scheduler.run()
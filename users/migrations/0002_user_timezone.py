@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-18 09:48
+
+from django.db import migrations
+import timezone_field.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='timezone',
+            field=timezone_field.fields.TimeZoneField(default='Europe/Moscow', verbose_name='часовой пояс'),
+        ),
+    ]
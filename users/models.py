@@ -1,5 +1,8 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from timezone_field import TimeZoneField
+
+from config import settings
 
 NULLABLE = {'blank': True, 'null': True}
 
@@ -16,6 +19,7 @@ class User(AbstractUser):
         phone (CharField): User's phone number.
         country (CharField): User's country.
         telegram_id (PositiveIntegerField): User's Telegram ID.
+        timezone (TimeZoneField): User's time zone, habits recur at the same local time in it.
 
     Constants:
         NULLABLE (dict): Specifies the settings for nullable fields.
@@ -32,6 +36,7 @@ class User(AbstractUser):
     phone = models.CharField(max_length=40, verbose_name='телефон', **NULLABLE)
     country = models.CharField(max_length=50, verbose_name='страна', **NULLABLE)
     telegram_id = models.PositiveIntegerField(default=None, verbose_name='telegram id', **NULLABLE)
+    timezone = TimeZoneField(default=settings.TIME_ZONE, verbose_name='часовой пояс')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from timezone_field.rest_framework import TimeZoneSerializerField
 
 from users.models import User
 
@@ -8,10 +9,13 @@ class UserSerializer(serializers.ModelSerializer):
     Serializer for the User model.
 
     Attributes:
+    timezone (TimeZoneSerializerField): Represents the user's time zone by its IANA name.
     Meta (class): Holds metadata configurations for the serializer.
         model (User): Specifies the User model to serialize.
         fields (tuple): Specifies the fields to include in the serialization.
     """
+    timezone = TimeZoneSerializerField(required=False)
+
     class Meta:
         model = User
-        fields = ('pk', 'email', 'first_name', 'last_name', 'phone', 'country', 'avatar', 'telegram_id',)
+        fields = ('pk', 'email', 'first_name', 'last_name', 'phone', 'country', 'avatar', 'telegram_id', 'timezone',)
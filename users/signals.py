@@ -0,0 +1,17 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.authentication import invalidate_auth_user
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_auth_user_on_change(sender, instance, **kwargs):
+    """
+    Drops the cached row of a changed or deleted user once the change is committed.
+    """
+    transaction.on_commit(partial(invalidate_auth_user, instance.pk))
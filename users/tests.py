@@ -1,11 +1,15 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
-from rest_framework.test import APITestCase
 from rest_framework_simplejwt.tokens import AccessToken
 
+from config.testing import LocalAPITestCase
+from users.authentication import AUTH_USER_FIELDS, CachedJWTAuthentication, get_auth_user_key
 from users.models import User
 
 
-class UserTestCase(APITestCase):
+class UserTestCase(LocalAPITestCase):
     """
     Test case for User model API endpoints.
 
@@ -18,6 +22,7 @@ class UserTestCase(APITestCase):
 
         Creates a User object and generates an access token for authorization.
         """
+        cache.clear()
         self.user = User.objects.create(
             email="user@example.com",
             first_name="string",
@@ -68,7 +73,8 @@ class UserTestCase(APITestCase):
                     "phone": self.user.phone,
                     "country": self.user.country,
                     "avatar": None,
-                    "telegram_id": self.user.telegram_id
+                    "telegram_id": self.user.telegram_id,
+                    "timezone": "Europe/Moscow"
                 }
             ]
         )
@@ -100,3 +106,81 @@ class UserTestCase(APITestCase):
 
         response = self.client.delete(f'/users/{self.user.pk}/')
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class CachedJWTAuthenticationTestCase(LocalAPITestCase):
+
+    def setUp(self):
+        """
+        Set up a user authenticated with an access token and an empty cache.
+        """
+        cache.clear()
+        self.user = User.objects.create(email='cached@example.com')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+
+    def count_user_queries(self, url='/award/list/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return sum('FROM "users_user"' in query['sql'] for query in queries.captured_queries)
+
+    def test_user_is_read_from_the_cache(self):
+        """
+        Test that only the first request of a user queries the user row.
+        """
+        self.assertEqual(self.count_user_queries(), 1)
+        self.assertEqual(self.count_user_queries(), 0)
+
+    def test_cached_user_holds_no_password(self):
+        """
+        Test that only the needed fields of the user are cached and the user of a request is built from them.
+        """
+        self.user.set_password('secret')
+        self.user.save()
+        self.count_user_queries()
+        self.assertEqual(set(cache.get(get_auth_user_key(self.user.pk))), set(AUTH_USER_FIELDS))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/award/create/', {'reward': 'reward'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['user'], self.user.email)
+        self.assertFalse(any('FROM "users_user"' in query['sql'] for query in queries.captured_queries))
+
+    def test_cached_user_is_loaded_with_deferred_fields(self):
+        """
+        Test that the user built from the cache is a loaded user of the default database whose uncached fields are
+        read on access.
+        """
+        self.count_user_queries()
+        user = CachedJWTAuthentication().get_user(AccessToken.for_user(self.user))
+        self.assertFalse(user._state.adding)
+        self.assertEqual(user._state.db, 'default')
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertNotIn('email', user.get_deferred_fields())
+
+        with self.assertNumQueries(1):
+            self.assertEqual(user.password, self.user.password)
+
+    def test_cached_user_is_dropped_on_save(self):
+        """
+        Test that a saved user is read from the database again, so deactivation takes effect immediately.
+        """
+        self.count_user_queries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+
+        self.assertIsNone(cache.get(get_auth_user_key(self.user.pk)))
+        self.assertEqual(self.client.get('/award/list/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_cached_user_is_dropped_on_delete(self):
+        """
+        Test that the token of a deleted user is rejected.
+        """
+        self.count_user_queries()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+
+        self.assertEqual(self.client.get('/award/list/').status_code, status.HTTP_401_UNAUTHORIZED)